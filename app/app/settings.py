@@ -43,6 +43,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "core",
     "rest_framework",
     "rest_framework.authtoken",
@@ -147,8 +148,53 @@ AUTH_USER_MODEL = "core.User"
 
 REST_FRAMEWORK = {
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
+    "DEFAULT_PAGINATION_CLASS": "recipe.pagination.KeysetPagination",
+    "PAGE_SIZE": 100,
 }
 
+# Cache
+# https://docs.djangoproject.com/en/4.0/topics/cache/
+
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.environ.get("CACHE_LOCATION", ""),
+    }
+}
+
+# Seconds a cached list response may be served before it's rebuilt.
+RECIPE_CACHE_TIMEOUT = int(os.environ.get("RECIPE_CACHE_TIMEOUT", 300))
+
+# Render recipe lists from plain rows instead of DRF serializers.
+RECIPE_LIST_FAST_PATH = bool(int(os.environ.get("RECIPE_LIST_FAST_PATH", 0)))
+
+# Widths, in pixels, of the resized copies made of each uploaded recipe image.
+RECIPE_IMAGE_WIDTHS = (320, 640, 1280)
+
+# Formats of those copies, best first; the ones Pillow cannot write are skipped.
+RECIPE_IMAGE_FORMATS = ("avif", "webp", "jpeg")
+
+# Processes making the copies off the request; 0 makes them in the request.
+RECIPE_IMAGE_WORKERS = int(os.environ.get("RECIPE_IMAGE_WORKERS", 1))
+
+# Store recipe images once per distinct content, named by its SHA-256.
+RECIPE_IMAGE_CONTENT_ADDRESSED = bool(
+    int(os.environ.get("RECIPE_IMAGE_CONTENT_ADDRESSED", 1))
+)
+
+# Largest image, in bytes, the resumable uploads accept.
+RECIPE_UPLOAD_MAX_SIZE = int(os.environ.get("RECIPE_UPLOAD_MAX_SIZE", 50 * 1024 * 1024))
+
+# Largest chunk of an upload sent per request; stays under the proxy's 10M.
+RECIPE_UPLOAD_CHUNK_SIZE = int(
+    os.environ.get("RECIPE_UPLOAD_CHUNK_SIZE", 8 * 1024 * 1024)
+)
+
+# Seconds an unfinished upload is kept before it is dropped.
+RECIPE_UPLOAD_EXPIRY = int(os.environ.get("RECIPE_UPLOAD_EXPIRY", 24 * 60 * 60))
+
 SPECTACULAR_SETTINGS = {
     "COMPONENT_SPLIT_REQUEST": True,
 }
@@ -0,0 +1,39 @@
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations, transaction
+from django.db.models import Max
+
+BATCH_SIZE = 10000
+
+
+def backfill_search_vector(apps, schema_editor):
+    """Fill the search vector of existing recipes, one committed batch at a time."""
+    Recipe = apps.get_model('core', 'Recipe')
+    vector = SearchVector('title', weight='A', config='english') + SearchVector(
+        'description', weight='B', config='english'
+    )
+    last_id = Recipe.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+
+    for start in range(0, last_id + 1, BATCH_SIZE):
+        with transaction.atomic():  # short transactions keep row locks brief.
+            Recipe.objects.filter(
+                id__gte=start, id__lt=start + BATCH_SIZE
+            ).update(search_vector=vector)
+
+
+class Migration(migrations.Migration):
+
+    atomic = False  # commit per batch and build the index without locking writes.
+
+    dependencies = [
+        ('core', '0009_recipe_search_vector'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_search_vector, migrations.RunPython.noop),
+        AddIndexConcurrently(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='core_recipe_search_gin'),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 4.0.10 on 2026-10-16 23:14
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def merge_duplicate_names(apps, schema_editor):
+    """Fold tags/ingredients sharing a user and name into the oldest one."""
+    Recipe = apps.get_model('core', 'Recipe')
+
+    for relation_name in ('tags', 'ingredients'):
+        relation = Recipe._meta.get_field(relation_name)
+        model = relation.related_model
+        through = relation.remote_field.through
+        target = relation.m2m_reverse_field_name()  # "tag" or "ingredient"
+
+        duplicates = (
+            model.objects.values('user_id', 'name')
+            .annotate(keep=Min('id'), copies=Count('id'))
+            .filter(copies__gt=1)
+        )
+        for duplicate in duplicates:
+            merged = model.objects.filter(
+                user_id=duplicate['user_id'], name=duplicate['name']
+            ).exclude(id=duplicate['keep'])
+            links = through.objects.filter(**{f'{target}_id__in': merged})
+
+            through.objects.bulk_create(
+                [
+                    through(recipe_id=recipe_id, **{f'{target}_id': duplicate['keep']})
+                    for recipe_id in links.values_list('recipe_id', flat=True)
+                ],
+                ignore_conflicts=True,
+            )
+            links.delete()
+            merged.delete()
+
+    # fire the deferred foreign key checks now, so the constraints below can
+    # alter the tables within this same transaction.
+    schema_editor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_user_data_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_names, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('user', 'name'), name='core_ingredient_unique_user_name'),
+        ),
+        migrations.AddConstraint(
+            model_name='tag',
+            constraint=models.UniqueConstraint(fields=('user', 'name'), name='core_tag_unique_user_name'),
+        ),
+    ]
@@ -0,0 +1,95 @@
+# Generated by Django 4.0.10 on 2026-10-16 23:42
+
+from django.db import migrations, models
+
+# (link table, counted table, link column) for tags and ingredients.
+COUNTED_LINKS = [
+    ('core_recipe_tags', 'core_tag', 'tag_id'),
+    ('core_recipe_ingredients', 'core_ingredient', 'ingredient_id'),
+]
+
+# Statement level, so a bulk insert or delete of links costs one UPDATE per
+# statement. Rows are locked in id order first: concurrent writers sharing
+# tags queue up instead of deadlocking.
+COUNT_TRIGGER = """
+CREATE FUNCTION {links}_count_update() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP <> 'INSERT' THEN
+        PERFORM 1 FROM {counted} WHERE id IN (SELECT {column} FROM old_links)
+            ORDER BY id FOR UPDATE;
+        UPDATE {counted} t SET recipe_count = t.recipe_count - o.total
+            FROM (SELECT {column}, count(*) AS total FROM old_links
+                  GROUP BY {column}) o
+            WHERE t.id = o.{column};
+    END IF;
+    IF TG_OP <> 'DELETE' THEN
+        PERFORM 1 FROM {counted} WHERE id IN (SELECT {column} FROM new_links)
+            ORDER BY id FOR UPDATE;
+        UPDATE {counted} t SET recipe_count = t.recipe_count + n.total
+            FROM (SELECT {column}, count(*) AS total FROM new_links
+                  GROUP BY {column}) n
+            WHERE t.id = n.{column};
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER {links}_count_insert
+    AFTER INSERT ON {links} REFERENCING NEW TABLE AS new_links
+    FOR EACH STATEMENT EXECUTE FUNCTION {links}_count_update();
+CREATE TRIGGER {links}_count_update
+    AFTER UPDATE ON {links} REFERENCING OLD TABLE AS old_links NEW TABLE AS new_links
+    FOR EACH STATEMENT EXECUTE FUNCTION {links}_count_update();
+CREATE TRIGGER {links}_count_delete
+    AFTER DELETE ON {links} REFERENCING OLD TABLE AS old_links
+    FOR EACH STATEMENT EXECUTE FUNCTION {links}_count_update();
+
+-- raw inserts, like the importer's name merge, leave the column out.
+ALTER TABLE {counted} ALTER COLUMN recipe_count SET DEFAULT 0;
+
+UPDATE {counted} t SET recipe_count = c.total
+    FROM (SELECT {column}, count(*) AS total FROM {links} GROUP BY {column}) c
+    WHERE t.id = c.{column};
+"""
+
+DROP_COUNT_TRIGGER = """
+DROP TRIGGER {links}_count_insert ON {links};
+DROP TRIGGER {links}_count_update ON {links};
+DROP TRIGGER {links}_count_delete ON {links};
+DROP FUNCTION {links}_count_update();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_tag_ingredient_unique_user_name'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingredient',
+            name='recipe_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='recipe_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ] + [
+        migrations.RunSQL(
+            sql=COUNT_TRIGGER.format(links=links, counted=counted, column=column),
+            reverse_sql=DROP_COUNT_TRIGGER.format(links=links),
+        )
+        for links, counted, column in COUNTED_LINKS
+    ] + [
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=models.Index(fields=['user', '-recipe_count', 'name'], name='core_ingredient_user_usage_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['user', '-recipe_count', 'name'], name='core_tag_user_usage_idx'),
+        ),
+    ]
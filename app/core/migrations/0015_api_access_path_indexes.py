@@ -0,0 +1,89 @@
+# Generated by Django 4.0.10 on 2026-10-17 00:09
+
+from django.conf import settings
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import BtreeGinExtension
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Each link table column is the leading column of a composite index, the
+# unique (recipe_id, target_id) one or the (target_id, recipe_id) one of
+# 0008, so its single column index only costs writes.
+LINK_COLUMNS = [
+    ('core_recipe_tags', 'recipe_id'),
+    ('core_recipe_tags', 'tag_id'),
+    ('core_recipe_ingredients', 'recipe_id'),
+    ('core_recipe_ingredients', 'ingredient_id'),
+]
+
+
+def drop_link_column_indexes(apps, schema_editor):
+    """Drop the single column indexes Django made for the link foreign keys."""
+    introspection = schema_editor.connection.introspection
+    with schema_editor.connection.cursor() as cursor:
+        for table, column in LINK_COLUMNS:
+            constraints = introspection.get_constraints(cursor, table)
+            for name, info in constraints.items():
+                if (
+                    info['index']
+                    and not info['unique']
+                    and not info['primary_key']
+                    and info['columns'] == [column]
+                ):
+                    schema_editor.execute(
+                        f'DROP INDEX {schema_editor.quote_name(name)}'
+                    )
+
+
+def create_link_column_indexes(apps, schema_editor):
+    for table, column in LINK_COLUMNS:
+        schema_editor.execute(
+            f'CREATE INDEX {table}_{column}_idx ON {table} ({column})'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_tag_ingredient_recipe_count'),
+    ]
+
+    operations = [
+        BtreeGinExtension(),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['user', '-id'], name='core_recipe_user_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ingredient',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['user', 'name'], name='core_ingredient_user_name_trgm', opclasses=['int8_ops', 'gin_trgm_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['user', 'name'], name='core_tag_user_name_trgm', opclasses=['int8_ops', 'gin_trgm_ops']),
+        ),
+        migrations.RemoveIndex(
+            model_name='ingredient',
+            name='core_ingredient_name_trgm',
+        ),
+        migrations.RemoveIndex(
+            model_name='tag',
+            name='core_tag_name_trgm',
+        ),
+        migrations.AlterField(
+            model_name='ingredient',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='tag',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(drop_link_column_indexes, create_link_column_indexes),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 4.0.10 on 2026-10-17 00:41
+
+from django.db import migrations, models
+
+# The recipe side of the ingredient links, counted like 0014 counts the
+# ingredient side. These triggers fire after those (triggers fire in name
+# order), so every writer locks ingredients first, then recipes.
+INGREDIENT_COUNT_TRIGGER = """
+CREATE FUNCTION core_recipe_ingredients_ingredient_count_update() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP <> 'INSERT' THEN
+        PERFORM 1 FROM core_recipe WHERE id IN (SELECT recipe_id FROM old_links)
+            ORDER BY id FOR UPDATE;
+        UPDATE core_recipe r SET ingredient_count = r.ingredient_count - o.total
+            FROM (SELECT recipe_id, count(*) AS total FROM old_links
+                  GROUP BY recipe_id) o
+            WHERE r.id = o.recipe_id;
+    END IF;
+    IF TG_OP <> 'DELETE' THEN
+        PERFORM 1 FROM core_recipe WHERE id IN (SELECT recipe_id FROM new_links)
+            ORDER BY id FOR UPDATE;
+        UPDATE core_recipe r SET ingredient_count = r.ingredient_count + n.total
+            FROM (SELECT recipe_id, count(*) AS total FROM new_links
+                  GROUP BY recipe_id) n
+            WHERE r.id = n.recipe_id;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER core_recipe_ingredients_ingredient_count_insert
+    AFTER INSERT ON core_recipe_ingredients REFERENCING NEW TABLE AS new_links
+    FOR EACH STATEMENT EXECUTE FUNCTION core_recipe_ingredients_ingredient_count_update();
+CREATE TRIGGER core_recipe_ingredients_ingredient_count_update
+    AFTER UPDATE ON core_recipe_ingredients REFERENCING OLD TABLE AS old_links NEW TABLE AS new_links
+    FOR EACH STATEMENT EXECUTE FUNCTION core_recipe_ingredients_ingredient_count_update();
+CREATE TRIGGER core_recipe_ingredients_ingredient_count_delete
+    AFTER DELETE ON core_recipe_ingredients REFERENCING OLD TABLE AS old_links
+    FOR EACH STATEMENT EXECUTE FUNCTION core_recipe_ingredients_ingredient_count_update();
+
+-- the importer's COPY leaves the column out.
+ALTER TABLE core_recipe ALTER COLUMN ingredient_count SET DEFAULT 0;
+
+UPDATE core_recipe r SET ingredient_count = c.total
+    FROM (SELECT recipe_id, count(*) AS total FROM core_recipe_ingredients
+          GROUP BY recipe_id) c
+    WHERE r.id = c.recipe_id;
+"""
+
+DROP_INGREDIENT_COUNT_TRIGGER = """
+DROP TRIGGER core_recipe_ingredients_ingredient_count_insert ON core_recipe_ingredients;
+DROP TRIGGER core_recipe_ingredients_ingredient_count_update ON core_recipe_ingredients;
+DROP TRIGGER core_recipe_ingredients_ingredient_count_delete ON core_recipe_ingredients;
+DROP FUNCTION core_recipe_ingredients_ingredient_count_update();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_api_access_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='ingredient_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunSQL(
+            sql=INGREDIENT_COUNT_TRIGGER,
+            reverse_sql=DROP_INGREDIENT_COUNT_TRIGGER,
+        ),
+    ]
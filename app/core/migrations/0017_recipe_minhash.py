@@ -0,0 +1,127 @@
+# Generated by Django 4.0.10 on 2026-10-17 00:57
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+# 64 hashes, banded in pairs: two recipes of Jaccard similarity s share at
+# least one of the 32 band hashes with probability 1 - (1 - s^2)^32, which
+# is 95% at s = 0.3 and 1.3% at s = 0.02.
+SIGNATURE_SIZE = 64
+BAND_ROWS = 2
+
+# Tags and ingredients hash as even and odd features so their ids never
+# collide. The signature keeps the least hash of the features per seed.
+MINHASH_FUNCTIONS = """
+CREATE FUNCTION core_recipe_minhash(recipe bigint) RETURNS bigint[] AS $$
+    SELECT array_agg(m ORDER BY k) FROM (
+        SELECT k, min(hashint8extended(f, k)) AS m
+        FROM (SELECT tag_id * 2 AS f FROM core_recipe_tags
+                  WHERE recipe_id = recipe
+              UNION ALL
+              SELECT ingredient_id * 2 + 1 FROM core_recipe_ingredients
+                  WHERE recipe_id = recipe) fs
+        CROSS JOIN generate_series(1, {size}) k
+        GROUP BY k) s
+$$ LANGUAGE sql STABLE;
+
+CREATE FUNCTION core_recipe_lsh_bands(signature bigint[]) RETURNS bigint[] AS $$
+    SELECT array_agg(
+        hash_array_extended(ARRAY[b] || signature[b * {rows} + 1 : (b + 1) * {rows}], 0)
+        ORDER BY b)
+    FROM generate_series(0, {size} / {rows} - 1) b
+    WHERE signature IS NOT NULL
+$$ LANGUAGE sql IMMUTABLE;
+
+-- rehash every recipe whose links a statement changed. These triggers fire
+-- after the counters, so recipes are still locked last, in id order.
+CREATE FUNCTION core_recipe_minhash_update() RETURNS trigger AS $$
+DECLARE
+    recipes bigint[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        SELECT array_agg(DISTINCT recipe_id) INTO recipes FROM new_links;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT array_agg(DISTINCT recipe_id) INTO recipes FROM old_links;
+    ELSE
+        SELECT array_agg(recipe_id) INTO recipes FROM (
+            SELECT recipe_id FROM old_links UNION SELECT recipe_id FROM new_links
+        ) changed;
+    END IF;
+    PERFORM 1 FROM core_recipe WHERE id = ANY(recipes) ORDER BY id FOR UPDATE;
+    UPDATE core_recipe r SET minhash = s.signature,
+            lsh_bands = core_recipe_lsh_bands(s.signature)
+        FROM (SELECT id, core_recipe_minhash(id) AS signature
+              FROM unnest(recipes) AS id) s
+        WHERE r.id = s.id;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+""".format(size=SIGNATURE_SIZE, rows=BAND_ROWS)
+
+MINHASH_TRIGGER = """
+CREATE TRIGGER {links}_minhash_insert
+    AFTER INSERT ON {links} REFERENCING NEW TABLE AS new_links
+    FOR EACH STATEMENT EXECUTE FUNCTION core_recipe_minhash_update();
+CREATE TRIGGER {links}_minhash_update
+    AFTER UPDATE ON {links} REFERENCING OLD TABLE AS old_links NEW TABLE AS new_links
+    FOR EACH STATEMENT EXECUTE FUNCTION core_recipe_minhash_update();
+CREATE TRIGGER {links}_minhash_delete
+    AFTER DELETE ON {links} REFERENCING OLD TABLE AS old_links
+    FOR EACH STATEMENT EXECUTE FUNCTION core_recipe_minhash_update();
+"""
+
+DROP_MINHASH_TRIGGER = """
+DROP TRIGGER {links}_minhash_insert ON {links};
+DROP TRIGGER {links}_minhash_update ON {links};
+DROP TRIGGER {links}_minhash_delete ON {links};
+"""
+
+DROP_MINHASH_FUNCTIONS = """
+DROP FUNCTION core_recipe_minhash_update();
+DROP FUNCTION core_recipe_lsh_bands(bigint[]);
+DROP FUNCTION core_recipe_minhash(bigint);
+"""
+
+BACKFILL_MINHASH = """
+UPDATE core_recipe SET minhash = core_recipe_minhash(id);
+UPDATE core_recipe SET lsh_bands = core_recipe_lsh_bands(minhash);
+"""
+
+LINK_TABLES = ['core_recipe_tags', 'core_recipe_ingredients']
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_recipe_ingredient_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='lsh_bands',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), editable=False, null=True, size=None),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='minhash',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.BigIntegerField(), editable=False, null=True, size=None),
+        ),
+        migrations.RunSQL(
+            sql=MINHASH_FUNCTIONS,
+            reverse_sql=DROP_MINHASH_FUNCTIONS,
+        ),
+    ] + [
+        migrations.RunSQL(
+            sql=MINHASH_TRIGGER.format(links=links),
+            reverse_sql=DROP_MINHASH_TRIGGER.format(links=links),
+        )
+        for links in LINK_TABLES
+    ] + [
+        migrations.RunSQL(sql=BACKFILL_MINHASH, reverse_sql=migrations.RunSQL.noop),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['user', 'lsh_bands'], name='core_recipe_user_lsh_gin', opclasses=['int8_ops', 'array_ops']),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.0.10 on 2026-10-17 02:10
+
+from django.db import migrations, models
+
+# the importer's COPY leaves the column out.
+IMAGE_DERIVATIVES_DEFAULT = """
+ALTER TABLE core_recipe ALTER COLUMN image_derivatives SET DEFAULT '{}'::jsonb;
+"""
+
+DROP_IMAGE_DERIVATIVES_DEFAULT = """
+ALTER TABLE core_recipe ALTER COLUMN image_derivatives DROP DEFAULT;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_recipe_price_time_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_derivatives',
+            field=models.JSONField(default=dict, editable=False),
+        ),
+        migrations.RunSQL(
+            sql=IMAGE_DERIVATIVES_DEFAULT,
+            reverse_sql=DROP_IMAGE_DERIVATIVES_DEFAULT,
+        ),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 4.0.10 on 2026-10-17 02:32
+
+import core.models
+import core.storage
+from django.db import migrations, models
+
+# A blob is referenced by the recipes whose image it is. An update counts
+# its rows once out of the old image and once into the new one, which cancel
+# out for the many updates leaving the image alone (the counts and signatures
+# other triggers keep), so those never touch a blob row.
+IMAGE_REF_COUNT_TRIGGER = """
+CREATE FUNCTION core_recipe_image_ref_count_update() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE core_imageblob b SET ref_count = b.ref_count + n.total
+            FROM (SELECT image, count(*) AS total FROM new_recipes
+                  WHERE image <> '' GROUP BY image) n
+            WHERE b.name = n.image;
+    ELSIF TG_OP = 'DELETE' THEN
+        UPDATE core_imageblob b SET ref_count = b.ref_count - o.total
+            FROM (SELECT image, count(*) AS total FROM old_recipes
+                  WHERE image <> '' GROUP BY image) o
+            WHERE b.name = o.image;
+    ELSE
+        UPDATE core_imageblob b SET ref_count = b.ref_count + c.delta
+            FROM (SELECT image, sum(delta) AS delta FROM (
+                      SELECT image, 1 AS delta FROM new_recipes WHERE image <> ''
+                      UNION ALL
+                      SELECT image, -1 FROM old_recipes WHERE image <> ''
+                  ) changes GROUP BY image) c
+            WHERE b.name = c.image AND c.delta <> 0;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER core_recipe_image_ref_count_insert
+    AFTER INSERT ON core_recipe REFERENCING NEW TABLE AS new_recipes
+    FOR EACH STATEMENT EXECUTE FUNCTION core_recipe_image_ref_count_update();
+CREATE TRIGGER core_recipe_image_ref_count_update
+    AFTER UPDATE ON core_recipe REFERENCING OLD TABLE AS old_recipes NEW TABLE AS new_recipes
+    FOR EACH STATEMENT EXECUTE FUNCTION core_recipe_image_ref_count_update();
+CREATE TRIGGER core_recipe_image_ref_count_delete
+    AFTER DELETE ON core_recipe REFERENCING OLD TABLE AS old_recipes
+    FOR EACH STATEMENT EXECUTE FUNCTION core_recipe_image_ref_count_update();
+"""
+
+DROP_IMAGE_REF_COUNT_TRIGGER = """
+DROP TRIGGER core_recipe_image_ref_count_insert ON core_recipe;
+DROP TRIGGER core_recipe_image_ref_count_update ON core_recipe;
+DROP TRIGGER core_recipe_image_ref_count_delete ON core_recipe;
+DROP FUNCTION core_recipe_image_ref_count_update();
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_image_upload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageBlob',
+            fields=[
+                ('name', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('size', models.PositiveBigIntegerField()),
+                ('ref_count', models.PositiveIntegerField(default=0, editable=False)),
+            ],
+            bases=(core.models.DerivedFieldsMixin, models.Model),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(null=True, storage=core.storage.RecipeImageStorage(), upload_to=core.models.recipe_image_file_path),
+        ),
+        migrations.RunSQL(
+            sql=IMAGE_REF_COUNT_TRIGGER,
+            reverse_sql=DROP_IMAGE_REF_COUNT_TRIGGER,
+        ),
+    ]
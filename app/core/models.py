@@ -7,12 +7,17 @@ import os
 from django.conf import settings
 from collections import UserDict
 from django.db import models
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.contrib.auth.models import (
     AbstractBaseUser,
     BaseUserManager,
     PermissionsMixin,
 )
 
+from core.storage import recipe_image_storage
+
 
 def recipe_image_file_path(instance, filename):
     """Generate file path for new recipe image."""
@@ -49,6 +54,19 @@ class UserManager(BaseUserManager):
 
         return user
 
+    def get_data_version(self, user_id):
+        """Return the current version of the user's recipe data."""
+        return self.filter(pk=user_id).values_list("data_version", flat=True).get()
+
+    def bump_data_version(self, *user_ids):
+        """Mark the users' recipes, tags or ingredients as changed.
+
+        Saves and deletes through the ORM call this from their signals.
+        Writes that send none, such as bulk statements, raw SQL and COPY,
+        call it themselves, in the transaction of the write.
+        """
+        self.filter(pk__in=user_ids).update(data_version=models.F("data_version") + 1)
+
 
 class User(AbstractBaseUser, PermissionsMixin):
     """User in the system."""
@@ -57,18 +75,44 @@ class User(AbstractBaseUser, PermissionsMixin):
     name = models.CharField(max_length=255)
     is_active = models.BooleanField(default=True)  # whether the user is active or not.
     is_staff = models.BooleanField(default=False)  # whether the user is staff or not.
+    data_version = models.BigIntegerField(
+        default=0
+    )  # bumped on every change to the user's recipes, tags or ingredients.
 
     objects = UserManager()  # the object manager for this model.
 
     USERNAME_FIELD = "email"  # the field that is used to log in.
 
 
-class Recipe(models.Model):
+class DerivedFieldsMixin:
+    """Leave the columns derived behind the model's back out of model updates.
+
+    Database triggers and background jobs keep them. Saving a loaded row
+    would otherwise write back the values it was read with, undoing what
+    they did since.
+    """
+
+    derived_fields = ()
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and not args and "update_fields" not in kwargs:
+            deferred = self.get_deferred_fields()
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.derived_fields
+                and field.attname not in deferred
+            ]
+        super().save(*args, **kwargs)
+
+
+class Recipe(DerivedFieldsMixin, models.Model):
     """Recipe Object."""
 
     user = models.ForeignKey(
-        settings.AUTH_USER_MODEL, on_delete=models.CASCADE
-    )  # the user that owns the recipe.
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, db_index=False
+    )  # the user that owns the recipe, indexed with the id below.
     title = models.CharField(max_length=255)
     description = models.TextField(blank=True, null=True)
     time_minutes = models.IntegerField(blank=True, null=True)
@@ -84,32 +128,151 @@ class Recipe(models.Model):
     )  # the ingredient(s) that are associated with the recipe.
 
     image = models.ImageField(
-        null=True, upload_to=recipe_image_file_path
+        null=True, upload_to=recipe_image_file_path, storage=recipe_image_storage
     )  # We are specifying the path where the image will be uploaded.
+    search_vector = SearchVectorField(
+        null=True, editable=False
+    )  # weighted title + description, maintained by a database trigger.
+    ingredient_count = models.PositiveIntegerField(
+        default=0, editable=False
+    )  # ingredients it uses, kept by triggers on the link table.
+    minhash = ArrayField(
+        models.BigIntegerField(), null=True, editable=False
+    )  # MinHash signature of its tag and ingredient sets, kept by triggers.
+    lsh_bands = ArrayField(
+        models.BigIntegerField(), null=True, editable=False
+    )  # a hash per band of the signature, looked up to find similar recipes.
+
+    image_derivatives = models.JSONField(
+        default=dict, editable=False
+    )  # {format: {width: name}} of the resized copies of the image.
+
+    derived_fields = ("ingredient_count", "minhash", "lsh_bands", "image_derivatives")
+
+    class Meta:
+        indexes = [
+            GinIndex(fields=["search_vector"], name="core_recipe_search_gin"),
+            models.Index(
+                fields=["user", "-id"], name="core_recipe_user_recent_idx"
+            ),  # serves the user's lists, newest first.
+            models.Index(
+                fields=["user", "price", "id"], name="core_recipe_user_price_idx"
+            ),  # serves the price ranges and orderings of the user's lists.
+            models.Index(
+                fields=["user", "time_minutes", "id"], name="core_recipe_user_time_idx"
+            ),  # and the cooking time ones.
+            GinIndex(
+                fields=["user", "lsh_bands"],
+                name="core_recipe_user_lsh_gin",
+                opclasses=["int8_ops", "array_ops"],
+            ),  # serves the band lookups of the user's similar recipes.
+        ]
 
     def __str__(self):
         return self.title
 
 
-class Tag(models.Model):
+class Tag(DerivedFieldsMixin, models.Model):
     """Tag to be used for a filtering recipes."""
 
     name = models.CharField(max_length=255)
     user = models.ForeignKey(
-        settings.AUTH_USER_MODEL, on_delete=models.CASCADE
-    )  # the user that owns the tag.
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, db_index=False
+    )  # the user that owns the tag, indexed with the name below.
+    recipe_count = models.PositiveIntegerField(
+        default=0, editable=False
+    )  # recipes using it, kept by triggers on the link table.
+
+    derived_fields = ("recipe_count",)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "name"], name="core_tag_unique_user_name"
+            )  # also the index behind the user's lists ordered by name.
+        ]
+        indexes = [
+            GinIndex(
+                fields=["user", "name"],
+                name="core_tag_user_name_trgm",
+                opclasses=["int8_ops", "gin_trgm_ops"],
+            ),  # serves the fuzzy typeahead on the user's names.
+            models.Index(
+                fields=["user", "-recipe_count", "name"],
+                name="core_tag_user_usage_idx",
+            ),  # serves the user's lists ordered by usage.
+        ]
 
     def __str__(self):
         return self.name
 
 
-class Ingredient(models.Model):
+class Ingredient(DerivedFieldsMixin, models.Model):
     """Ingredient to be used in a recipe."""
 
     name = models.CharField(max_length=255)
     user = models.ForeignKey(
-        settings.AUTH_USER_MODEL, on_delete=models.CASCADE
-    )  # the user that owns the ingredient.
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, db_index=False
+    )  # the user that owns the ingredient, indexed with the name below.
+    recipe_count = models.PositiveIntegerField(
+        default=0, editable=False
+    )  # recipes using it, kept by triggers on the link table.
+
+    derived_fields = ("recipe_count",)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "name"], name="core_ingredient_unique_user_name"
+            )  # also the index behind the user's lists ordered by name.
+        ]
+        indexes = [
+            GinIndex(
+                fields=["user", "name"],
+                name="core_ingredient_user_name_trgm",
+                opclasses=["int8_ops", "gin_trgm_ops"],
+            ),  # serves the fuzzy typeahead on the user's names.
+            models.Index(
+                fields=["user", "-recipe_count", "name"],
+                name="core_ingredient_user_usage_idx",
+            ),  # serves the user's lists ordered by usage.
+        ]
+
+    def __str__(self):
+        return self.name
+
+
+class ImageBlob(DerivedFieldsMixin, models.Model):
+    """Recipe image stored once under the digest of its content."""
+
+    name = models.CharField(max_length=255, primary_key=True)  # storage name.
+    size = models.PositiveBigIntegerField()  # bytes on disk, however shared.
+    ref_count = models.PositiveIntegerField(
+        default=0, editable=False
+    )  # recipes using it, kept by triggers on the recipes.
+
+    derived_fields = ("ref_count",)
 
     def __str__(self):
         return self.name
+
+
+class ImageUpload(models.Model):
+    """Recipe image sent in chunks, resumable until it is finished."""
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    recipe = models.ForeignKey(
+        Recipe, on_delete=models.CASCADE, related_name="image_uploads"
+    )  # the recipe the finished image replaces the image of.
+    filename = models.CharField(max_length=255)  # as sent, for its extension.
+    size = models.PositiveBigIntegerField()  # bytes the finished image has.
+    offset = models.PositiveBigIntegerField(default=0)  # bytes received so far.
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    @property
+    def partial_name(self):
+        """Return the storage name the received chunks are written to."""
+        return os.path.join("uploads/partial/", str(self.id))
+
+    def __str__(self):
+        return f"{self.filename} ({self.offset}/{self.size})"
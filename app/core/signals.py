@@ -0,0 +1,46 @@
+"""
+Signal handlers keeping the users' data version and stored files current
+"""
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from core.models import ImageUpload, Ingredient, Recipe, Tag, User
+from core.storage import recipe_image_storage
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def bump_owner_data_version(sender, instance, **kwargs):
+    """Bump the data version of the owner of a saved or deleted object."""
+    User.objects.bump_data_version(instance.user_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def bump_owner_data_version_on_links(sender, instance, action, **kwargs):
+    """Bump the data version when a recipe gains or loses tags or ingredients."""
+    if action in ("post_add", "post_remove", "post_clear"):
+        # recipes only link to their owner's tags and ingredients, so
+        # `instance` has the right owner from either side of the relation.
+        User.objects.bump_data_version(instance.user_id)
+
+
+@receiver(post_delete, sender=ImageUpload)
+def remove_partial_upload(sender, instance, **kwargs):
+    """Remove the chunks received for an upload once its deletion commits."""
+    name = instance.partial_name
+    transaction.on_commit(lambda: default_storage.delete(name))
+
+
+@receiver(post_delete, sender=Recipe)
+def release_recipe_image(sender, instance, **kwargs):
+    """Release the image of a deleted recipe once the deletion commits."""
+    if instance.image:
+        name = instance.image.name
+        transaction.on_commit(lambda: recipe_image_storage.release(name))
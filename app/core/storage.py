@@ -0,0 +1,134 @@
+"""
+File storage for recipe images
+"""
+import hashlib
+import os
+import re
+import uuid
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import connection, transaction
+from django.utils.deconstruct import deconstructible
+
+HASH_CHUNK_SIZE = 64 * 1024  # bytes hashed at a time, whatever the file size.
+BLOB_NAME = re.compile(r"(?:^|/)([0-9a-f]{2})/([0-9a-f]{2})/\1\2[0-9a-f]{60}\.\w+$")
+
+
+def file_digest(chunks):
+    """Return the hex SHA-256 of the content streamed as `chunks`."""
+    digest = hashlib.sha256()
+    for chunk in chunks:
+        digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def is_blob_name(name):
+    """Return whether `name` is a content addressed image, named by its digest."""
+    return BLOB_NAME.search(name) is not None
+
+
+def local_chunks(path):
+    """Yield the content of the local file at `path`, a chunk at a time."""
+    with open(path, "rb") as file:
+        yield from iter(lambda: file.read(HASH_CHUNK_SIZE), b"")
+
+
+@deconstructible
+class RecipeImageStorage(FileSystemStorage):
+    """Store each distinct recipe image once, named by its content.
+
+    With RECIPE_IMAGE_CONTENT_ADDRESSED, an image is stored as the SHA-256
+    of its bytes, sharded by the first two byte pairs of the digest. Uploads
+    of the same image share that blob. Its core_imageblob row counts the
+    recipes referencing it, kept by triggers on the recipes, and the blob is
+    deleted with the last of them only. Otherwise images keep the names they
+    were uploaded under.
+    """
+
+    def _save(self, name, content):
+        if not settings.RECIPE_IMAGE_CONTENT_ADDRESSED:
+            return super()._save(name, content)
+
+        blob = self.blob_name(name, file_digest(content.chunks(HASH_CHUNK_SIZE)))
+        content.seek(0)
+        if self._claim(blob, content.size):
+            # written aside and renamed, so a blob there is always whole.
+            partial = super()._save(f"{blob}.{uuid.uuid4().hex}.partial", content)
+            os.replace(self.path(partial), self.path(blob))
+
+        return blob
+
+    def adopt(self, path, name):
+        """Move the local file at `path` in as `name`; return the name stored.
+
+        The file is renamed into place, or removed when it is content
+        addressed and an identical image is stored already. Either happens
+        once the transaction commits, so a rollback leaves it where it was.
+        """
+        write = True
+        if settings.RECIPE_IMAGE_CONTENT_ADDRESSED:
+            name = self.blob_name(name, file_digest(local_chunks(path)))
+            write = self._claim(name, os.path.getsize(path))
+
+        transaction.on_commit(lambda: self._move_in(path, name, write))
+        return name
+
+    def _move_in(self, path, name, write):
+        """Rename the local file at `path` to `name`, or drop it if not `write`."""
+        if not write:
+            os.remove(path)
+            return
+
+        full_path = self.path(name)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        os.replace(path, full_path)
+
+    def blob_name(self, name, digest):
+        """Return the name the content of `digest`, uploaded as `name`, has."""
+        extension = os.path.splitext(name)[1].lower()
+        return os.path.join(
+            os.path.dirname(name), digest[:2], digest[2:4], f"{digest}{extension}"
+        )
+
+    def _claim(self, name, size):
+        """Lock the blob's row for this transaction; return if it needs writing.
+
+        The lock keeps release() from deleting the blob until the recipe
+        taking it commits, and with it the reference its triggers count.
+        A stored file of another size, cut short before blobs were written
+        aside, is written again.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO core_imageblob (name, size, ref_count)"
+                " VALUES (%s, %s, 0)"
+                " ON CONFLICT (name) DO UPDATE SET size = EXCLUDED.size",
+                [name, size],
+            )
+
+        return not self.exists(name) or self.size(name) != size
+
+    @transaction.atomic
+    def release(self, name):
+        """Delete the blob `name` and its resized copies if nothing uses it."""
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "DELETE FROM core_imageblob WHERE name = %s AND ref_count = 0",
+                [name],
+            )
+            if not cursor.rowcount:
+                return False
+
+        # under the deleted row's lock, so no upload can claim the blob meanwhile.
+        directory, filename = os.path.split(name)
+        stem = os.path.splitext(filename)[0]
+        for stored in self.listdir(directory)[1]:
+            if stored == filename or stored.startswith(f"{stem}-"):
+                self.delete(os.path.join(directory, stored))
+
+        return True
+
+
+recipe_image_storage = RecipeImageStorage()
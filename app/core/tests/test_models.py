@@ -3,6 +3,7 @@ from unittest.mock import patch
 from decimal import Decimal
 import uuid
 
+from django.db import IntegrityError, transaction
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 
@@ -78,6 +79,44 @@ class ModelTests(TestCase):
         self.assertEqual(str(recipe), recipe.title)
         print("Create recipe test: OK")
 
+    def test_recipe_search_vector_maintained(self):
+        """Test the recipe search vector follows title and description."""
+        print("Testing recipe search vector maintained...")
+        user = create_user()
+        recipe = models.Recipe.objects.create(
+            user=user,
+            title="Apple pie",
+            price=Decimal("4.00"),
+            description="Buttery crust",
+        )
+        matches = models.Recipe.objects.filter(search_vector="crust")
+        self.assertIn(recipe, matches)
+
+        recipe.description = "Crumble topping"
+        recipe.save()
+        self.assertNotIn(recipe, models.Recipe.objects.filter(search_vector="crust"))
+        print("Recipe search vector maintained test: OK")
+
+    def test_data_version_bumped_on_changes(self):
+        """Test the user's data version follows recipe, tag and link changes."""
+        print("Testing data version bumped on changes...")
+        user = create_user()
+        versions = [get_user_model().objects.get_data_version(user.pk)]
+
+        recipe = models.Recipe.objects.create(
+            user=user, title="Stew", price=Decimal("4.00")
+        )
+        versions.append(get_user_model().objects.get_data_version(user.pk))
+        tag = models.Tag.objects.create(user=user, name="Dinner")
+        versions.append(get_user_model().objects.get_data_version(user.pk))
+        recipe.tags.add(tag)
+        versions.append(get_user_model().objects.get_data_version(user.pk))
+        recipe.delete()
+        versions.append(get_user_model().objects.get_data_version(user.pk))
+
+        self.assertEqual(versions, sorted(set(versions)))  # strictly increasing.
+        print("Data version bumped on changes test: OK")
+
     def test_create_tag(self):
         """Test creating a new tag is successful."""
         print("Testing create tag...")
@@ -97,6 +136,19 @@ class ModelTests(TestCase):
         self.assertEqual(str(ingredient), ingredient.name)  # __str__ method
         print("Create ingrediente test: OK")
 
+    def test_tag_and_ingredient_names_unique_per_user(self):
+        """Test a user cannot own two tags or ingredients with one name."""
+        print("Testing tag and ingredient names unique per user...")
+        user = create_user()
+        other_user = create_user(email="other@example.com")
+
+        for model in (models.Tag, models.Ingredient):
+            model.objects.create(user=user, name="Spicy")
+            model.objects.create(user=other_user, name="Spicy")
+            with self.assertRaises(IntegrityError), transaction.atomic():
+                model.objects.create(user=user, name="Spicy")
+        print("Tag and ingredient names unique per user test: OK")
+
     @patch(
         "core.models.uuid.uuid4"
     )  # we patch the uuid4 function to return a fixed value instead of a random one.
@@ -109,3 +161,19 @@ class ModelTests(TestCase):
         )  # creating he function that creates the path
 
         self.assertEqual(file_path, f"uploads/recipe/{uuid}.jpg")
+
+    def test_image_upload_partial_name(self):
+        """Test uploads write their chunks to a file named after their id"""
+        print("Testing image upload partial name...")
+        recipe = models.Recipe.objects.create(
+            user=create_user(), title="Sample recipe", price=Decimal("5.50")
+        )
+        upload = models.ImageUpload.objects.create(
+            recipe=recipe, filename="photo.jpg", size=100
+        )
+
+        self.assertIsInstance(upload.id, uuid.UUID)
+        self.assertEqual(upload.partial_name, f"uploads/partial/{upload.id}")
+        self.assertEqual(upload.offset, 0)
+
+        print("Image upload partial name test: OK")
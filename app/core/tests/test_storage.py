@@ -0,0 +1,138 @@
+"""
+Tests for the content addressed recipe image storage.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+
+from core.models import ImageBlob, Recipe
+from core.storage import recipe_image_storage
+
+IMAGE = b"not really a jpeg, but bytes all the same"
+
+
+def create_recipe(user, title="Sample recipe"):
+    """Create and return a recipe."""
+    return Recipe.objects.create(user=user, title=title, price=Decimal("5.50"))
+
+
+class RecipeImageStorageTests(TestCase):
+    """Test storing recipe images once per distinct content."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.addCleanup(shutil.rmtree, self.media_root)
+
+        self.user = get_user_model().objects.create_user(
+            "user@example.com", "Testpass123"
+        )
+
+    def upload(self, recipe, content=IMAGE, filename="photo.JPG"):
+        """Save the content as the recipe's image, and return its name."""
+        recipe.image.save(filename, ContentFile(content))
+        return recipe.image.name
+
+    def test_identical_images_share_blob(self):
+        """Test the same content is stored once, named by its digest"""
+        print("Testing identical images share blob...")
+        digest = hashlib.sha256(IMAGE).hexdigest()
+
+        first = self.upload(create_recipe(self.user))
+        second = self.upload(create_recipe(self.user), filename="copy.jpg")
+        other = self.upload(create_recipe(self.user), content=b"other")
+
+        self.assertEqual(
+            first, f"uploads/recipe/{digest[:2]}/{digest[2:4]}/{digest}.jpg"
+        )
+        self.assertEqual(second, first)
+        self.assertNotEqual(other, first)
+        self.assertEqual(ImageBlob.objects.get(name=first).ref_count, 2)
+        self.assertEqual(
+            os.listdir(os.path.dirname(recipe_image_storage.path(first))),
+            [f"{digest}.jpg"],
+        )
+
+        print("Identical images share blob test: OK")
+
+    def test_cut_short_blob_written_again(self):
+        """Test a stored blob of the wrong size is not shared, but rewritten"""
+        print("Testing cut short blob written again...")
+        name = self.upload(create_recipe(self.user))
+        with open(recipe_image_storage.path(name), "wb") as blob:
+            blob.write(IMAGE[:5])  # as a crash mid-write would leave it.
+
+        again = self.upload(create_recipe(self.user))
+
+        self.assertEqual(again, name)
+        with open(recipe_image_storage.path(name), "rb") as blob:
+            self.assertEqual(blob.read(), IMAGE)
+        self.assertEqual(
+            os.listdir(os.path.dirname(recipe_image_storage.path(name))),
+            [os.path.basename(name)],
+        )
+
+        print("Cut short blob written again test: OK")
+
+    def test_blob_released_with_last_reference(self):
+        """Test a blob and its copies go once no recipe uses them"""
+        print("Testing blob released with last reference...")
+        first, second = create_recipe(self.user), create_recipe(self.user)
+        name = self.upload(first)
+        self.upload(second)
+        copy = name.replace(".jpg", "-320w.jpg")  # resized copies are no blobs.
+        with open(recipe_image_storage.path(copy), "wb") as resized:
+            resized.write(b"copy")
+
+        first.title = "Renamed"
+        first.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        kept = recipe_image_storage.exists(name)
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+
+        self.assertTrue(kept)
+        self.assertFalse(recipe_image_storage.exists(name))
+        self.assertFalse(recipe_image_storage.exists(copy))
+        self.assertFalse(ImageBlob.objects.exists())
+
+        print("Blob released with last reference test: OK")
+
+    def test_adopt_duplicate_drops_file(self):
+        """Test a local file identical to a stored blob is dropped, not moved"""
+        print("Testing adopt duplicate drops file...")
+        name = self.upload(create_recipe(self.user))
+        path = os.path.join(self.media_root, "received")
+        with open(path, "wb") as received:
+            received.write(IMAGE)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            adopted = recipe_image_storage.adopt(path, "uploads/recipe/other.jpg")
+
+        self.assertEqual(adopted, name)
+        self.assertFalse(os.path.exists(path))
+
+        print("Adopt duplicate drops file test: OK")
+
+    @override_settings(RECIPE_IMAGE_CONTENT_ADDRESSED=False)
+    def test_upload_names_when_not_content_addressed(self):
+        """Test images keep their upload names with the mode off"""
+        print("Testing upload names when not content addressed...")
+        first = self.upload(create_recipe(self.user))
+        second = self.upload(create_recipe(self.user))
+
+        self.assertNotEqual(first, second)
+        self.assertTrue(first.startswith("uploads/recipe/"))
+        self.assertEqual(first.count("/"), 2)
+        self.assertFalse(ImageBlob.objects.exists())
+
+        print("Upload names when not content addressed test: OK")
@@ -0,0 +1,90 @@
+"""
+Streaming export for recipe APIs
+"""
+import csv
+import io
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from core.models import Recipe
+
+EXPORT_FIELDS = ["id", "title", "description", "time_minutes", "price", "link"]
+EXPORT_RELATIONS = ("tags", "ingredients")
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_CONTENT_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def iter_recipe_rows(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield a dict per recipe, tag and ingredient names included.
+
+    The recipes are read through a server-side cursor `chunk_size` rows at a
+    time, and the names of each chunk are fetched with one query per
+    relation, so memory follows the chunk size rather than the library size.
+    """
+    rows = queryset.values(*EXPORT_FIELDS).iterator(chunk_size=chunk_size)
+
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            yield from _with_names(chunk)
+            chunk = []
+    yield from _with_names(chunk)
+
+
+def _with_names(chunk):
+    """Attach the tag and ingredient names of a chunk of recipe rows."""
+    ids = [row["id"] for row in chunk]
+    names = {name: {pk: [] for pk in ids} for name in EXPORT_RELATIONS}
+    for name in EXPORT_RELATIONS:
+        relation = getattr(Recipe, name)
+        target = relation.field.m2m_reverse_field_name()  # "tag" or "ingredient"
+        links = (
+            relation.through.objects.filter(recipe_id__in=ids)
+            .order_by(f"{target}__name")
+            .values_list("recipe_id", f"{target}__name")
+        )
+        for recipe_id, target_name in links:
+            names[name][recipe_id].append(target_name)
+
+    for row in chunk:
+        yield {**row, **{name: names[name][row["id"]] for name in EXPORT_RELATIONS}}
+
+
+def to_ndjson(rows):
+    """Render rows as newline delimited JSON, one line per recipe."""
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder) + "\n"
+
+
+def to_csv(rows):
+    """Render rows as CSV lines, joining tag and ingredient names with `;`."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    header = EXPORT_FIELDS + list(EXPORT_RELATIONS)
+    for values in _csv_values(header, rows):
+        writer.writerow(values)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def _csv_values(header, rows):
+    """Yield the header, then the CSV cells of every row."""
+    yield header
+    for row in rows:
+        yield [row[field] for field in EXPORT_FIELDS] + [
+            ";".join(row[name]) for name in EXPORT_RELATIONS
+        ]
+
+
+RENDERERS = {"ndjson": to_ndjson, "csv": to_csv}
+
+
+def export_recipes(queryset, output_format, chunk_size=EXPORT_CHUNK_SIZE):
+    """Return an iterator of text lines exporting the queryset's recipes."""
+    return RENDERERS[output_format](iter_recipe_rows(queryset, chunk_size))
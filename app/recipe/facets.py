@@ -0,0 +1,62 @@
+"""
+Faceted counts for recipe APIs
+"""
+from django.db import connection
+
+from core.models import Recipe
+
+FACET_RELATIONS = ("tags", "ingredients")
+FACET_LIMIT = 20
+
+
+def recipe_facets(user, matched, limit=FACET_LIMIT, filtered=True):
+    """Return how many recipes match and the top tags and ingredients among them.
+
+    Everything comes back from a single statement. Unfiltered, the usage
+    counters kept on tags and ingredients are read in order from their
+    (user, -recipe_count, name) index. Filtered, the matched ids are computed
+    once and their links are grouped per relation.
+    """
+    matched_sql, params = matched.order_by().values("id").query.sql_with_params()
+    params = list(params)
+    branches = ["SELECT 'count', NULL::bigint, NULL::varchar, count(*) FROM matched"]
+    for name in FACET_RELATIONS:
+        relation = getattr(Recipe, name)
+        table = relation.rel.model._meta.db_table
+        if filtered:
+            column = f"{relation.field.m2m_reverse_field_name()}_id"
+            # group the links first: names are joined to one row per group.
+            branches.append(
+                f"SELECT %s, t.id, t.name, c.total FROM {table} t"
+                f" JOIN (SELECT l.{column} AS id, count(*) AS total FROM matched m"
+                f" JOIN {relation.through._meta.db_table} l ON l.recipe_id = m.id"
+                f" GROUP BY l.{column}) c USING (id)"
+                " ORDER BY c.total DESC, t.name LIMIT %s"
+            )
+            params += [name, limit]
+        else:
+            branches.append(
+                f"SELECT %s, id, name, recipe_count::bigint FROM {table}"
+                " WHERE user_id = %s AND recipe_count > 0"
+                " ORDER BY recipe_count DESC, name LIMIT %s"
+            )
+            params += [name, user.id, limit]
+
+    union = " UNION ALL ".join(f"({branch})" for branch in branches)
+    sql = (
+        f"WITH matched AS ({matched_sql})"
+        f" SELECT * FROM ({union}) AS f (facet, id, name, total)"
+        " ORDER BY facet, total DESC, name"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+
+    facets = {"count": 0, **{name: [] for name in FACET_RELATIONS}}
+    for facet, pk, name, total in rows:
+        if facet == "count":
+            facets["count"] = total
+        else:
+            facets[facet].append({"id": pk, "name": name, "count": total})
+
+    return facets
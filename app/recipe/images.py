@@ -0,0 +1,207 @@
+"""
+Image derivatives for recipe APIs
+"""
+import logging
+import math
+import os
+import threading
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from PIL import Image, ImageOps
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+
+from core.models import Recipe
+from core.storage import is_blob_name, recipe_image_storage
+
+logger = logging.getLogger(__name__)
+
+ImageFormat = namedtuple("ImageFormat", ["extension", "mime", "options"])
+
+IMAGE_FORMATS = {  # name: how its derivatives are written, best first.
+    "avif": ImageFormat("avif", "image/avif", {"quality": 60}),
+    "webp": ImageFormat("webp", "image/webp", {"quality": 80, "method": 4}),
+    "jpeg": ImageFormat(
+        "jpg", "image/jpeg", {"quality": 82, "optimize": True, "progressive": True}
+    ),
+}
+
+EXIF_ORIENTATION = 0x0112
+TRANSPOSED_ORIENTATIONS = (5, 6, 7, 8)  # rotated a quarter turn when shown.
+
+
+def available_formats():
+    """Return the configured formats the installed Pillow can write."""
+    Image.init()
+    return [
+        name
+        for name in settings.RECIPE_IMAGE_FORMATS
+        if name.upper() in Image.SAVE and name in IMAGE_FORMATS
+    ]
+
+
+def make_derivatives(root, name, widths, formats, force=False):
+    """Write the image `name` under `root` at each width and format.
+
+    Runs in the worker processes, so it touches files only. JPEGs are
+    decoded straight at the smallest 1/2, 1/4 or 1/8 scale still covering
+    the largest width; each smaller width is then reduced from the one
+    above it rather than from the original. Images are never enlarged.
+    Copies already made of a content addressed image are reused, read
+    from the header alone, unless `force` is set. Returns
+    {format: {width: name}} of the files.
+    """
+    stem = os.path.splitext(name)[0]
+
+    with Image.open(os.path.join(root, name)) as image:
+        transposed = image.getexif().get(EXIF_ORIENTATION) in TRANSPOSED_ORIENTATIONS
+        shown = image.size[::-1] if transposed else image.size
+        widths = sorted({min(width, shown[0]) for width in widths}, reverse=True)
+        derivatives = {
+            fmt: {
+                str(width): f"{stem}-{width}w.{IMAGE_FORMATS[fmt].extension}"
+                for width in widths
+            }
+            for fmt in formats
+        }
+        if (
+            not force
+            and is_blob_name(name)
+            and all(
+                os.path.exists(os.path.join(root, derivative))
+                for copies in derivatives.values()
+                for derivative in copies.values()
+            )
+        ):
+            return derivatives
+
+        scale = widths[0] / shown[0]
+        image.draft(
+            "RGB", (math.ceil(image.width * scale), math.ceil(image.height * scale))
+        )
+        current = ImageOps.exif_transpose(image)
+
+        alpha = "A" in current.getbands() or "transparency" in current.info
+        if current.mode not in ("RGB", "RGBA"):
+            current = current.convert("RGBA" if alpha else "RGB")
+
+        for width in widths:
+            # sized from the original, so rounding never adds up down the steps.
+            height = max(1, round(shown[1] * width / shown[0]))
+            current = downscale(current, (width, height))
+            for fmt in formats:
+                path = os.path.join(root, derivatives[fmt][str(width)])
+                # JPEG has no alpha channel.
+                frame = current.convert("RGB") if fmt == "jpeg" else current
+                # written aside and renamed, so a file there is always whole.
+                partial = f"{path}.{os.getpid()}.partial"
+                frame.save(partial, fmt.upper(), **IMAGE_FORMATS[fmt].options)
+                os.replace(partial, path)
+
+    return derivatives
+
+
+def downscale(image, size):
+    """Return the image resized down to `size`."""
+    if image.size == size:
+        return image
+
+    width, height = size
+    factor = min(image.width // width, image.height // height)
+    if factor >= 2:
+        # averaging whole blocks is far cheaper than filtering, and leaves
+        # the final resample less than a halving to do.
+        image = image.reduce(factor)
+
+    return image.resize((width, height), Image.LANCZOS)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the process pool of this server process, started on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(settings.RECIPE_IMAGE_WORKERS)
+
+    return _pool
+
+
+def shutdown_pool():
+    """Wait for the scheduled derivatives, then stop the pool."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True)
+
+
+@transaction.atomic
+def replace_image(recipe, image):
+    """Give the recipe a new image; its copies are made after the commit.
+
+    The previous image is released then, deleted if no recipe shares it.
+    """
+    previous = recipe.image.name
+    recipe.image = image
+    recipe.image_derivatives = {}  # the copies of the previous image.
+    recipe.save(update_fields=["image", "image_derivatives"])
+    schedule_derivatives(recipe)
+
+    if previous and previous != recipe.image.name:
+        transaction.on_commit(lambda: recipe_image_storage.release(previous))
+
+
+def schedule_derivatives(recipe):
+    """Make the derivatives of the recipe's image once the upload commits.
+
+    They are made by the process pool, off the request, or inline when
+    RECIPE_IMAGE_WORKERS is 0. Either way they are only recorded if the
+    recipe still has that image by then.
+    """
+    job = (recipe.id, recipe.user_id, recipe.image.name)
+    transaction.on_commit(lambda: submit_derivatives(*job))
+
+
+def submit_derivatives(recipe_id, user_id, name):
+    """Make and record the derivatives of the image `name` of a recipe."""
+    job = (recipe_image_storage.location, name, settings.RECIPE_IMAGE_WIDTHS)
+    formats = available_formats()
+
+    if not settings.RECIPE_IMAGE_WORKERS:
+        record_derivatives(recipe_id, user_id, name, make_derivatives(*job, formats))
+        return
+
+    future = get_pool().submit(make_derivatives, *job, formats)
+    future.add_done_callback(
+        partial(_record_result, recipe_id, user_id, name, threading.get_ident())
+    )
+
+
+def _record_result(recipe_id, user_id, name, submitter, future):
+    """Record a finished job; runs on the pool's thread once it is done."""
+    try:
+        record_derivatives(recipe_id, user_id, name, future.result())
+    except Exception:
+        logger.exception("Making the derivatives of %s failed", name)
+    finally:
+        if threading.get_ident() != submitter:
+            connection.close()  # the connection this thread opened.
+
+
+def record_derivatives(recipe_id, user_id, name, derivatives):
+    """Store the derivatives on the recipe, unless its image changed since."""
+    updated = Recipe.objects.filter(pk=recipe_id, image=name).update(
+        image_derivatives=derivatives
+    )
+    if updated:
+        get_user_model().objects.bump_data_version(user_id)
+
+    return bool(updated)
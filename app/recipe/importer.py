@@ -0,0 +1,224 @@
+"""
+Bulk import for recipe APIs
+"""
+import csv
+import itertools
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+
+from core.models import Ingredient, Recipe, Tag
+
+IMPORT_FIELDS = ["title", "description", "time_minutes", "price", "link"]
+IMPORT_RELATIONS = {"tags": Tag, "ingredients": Ingredient}
+IMPORT_CHUNK_SIZE = 10_000
+NAME_MAX_LENGTH = Tag._meta.get_field("name").max_length
+
+
+def read_ndjson(lines):
+    """Yield (line number, row) for every non-blank NDJSON line."""
+    for number, line in enumerate(lines, 1):
+        if line.strip():
+            try:
+                yield number, json.loads(line)
+            except ValueError:
+                yield number, None  # reported as a skipped row.
+
+
+def read_csv(lines):
+    """Yield (line number, row) for every CSV record after the header.
+
+    Tag and ingredient names are `;` separated, as written by the export.
+    """
+    for number, row in enumerate(csv.DictReader(lines), 2):
+        for name in IMPORT_RELATIONS:
+            row[name] = [value for value in (row.get(name) or "").split(";") if value]
+        yield number, row
+
+
+READERS = {"ndjson": read_ndjson, "csv": read_csv}
+
+
+def _copy_value(value):
+    """Format a value for COPY's text format."""
+    if value is None:
+        return r"\N"
+
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+class _CopyBuffer:
+    """A file-like object rendering rows as COPY text as it is read."""
+
+    def __init__(self, rows):
+        self.lines = (
+            "\t".join(_copy_value(value) for value in row) + "\n" for row in rows
+        )
+
+    def read(self, size=8192):
+        """Return whole lines adding up to about `size` characters."""
+        lines, length = [], 0
+        for line in self.lines:
+            lines.append(line)
+            length += len(line)
+            if length >= size:
+                break
+
+        return "".join(lines)
+
+    readline = read
+
+
+def copy_rows(cursor, table, columns, rows):
+    """Stream rows into the table with `COPY ... FROM STDIN`."""
+    cursor.copy_expert(
+        f"COPY {table} ({', '.join(columns)}) FROM STDIN", _CopyBuffer(rows)
+    )
+
+
+class RecipeImporter:
+    """Load recipes, with tags and ingredients by name, for one user.
+
+    Every chunk runs in its own transaction:
+
+    * names not yet in the in-memory {name: id} dictionaries are copied into
+      a staging table and merged with `INSERT ... ON CONFLICT DO NOTHING`;
+    * recipe ids are reserved from the sequence in one query, so recipes and
+      their links, all new rows, are copied straight into their tables.
+    """
+
+    def __init__(self, user, chunk_size=IMPORT_CHUNK_SIZE):
+        self.user = user
+        self.chunk_size = chunk_size
+        self.names = {
+            relation: dict(model.objects.filter(user=user).values_list("name", "id"))
+            for relation, model in IMPORT_RELATIONS.items()
+        }
+        self.fields = [Recipe._meta.get_field(name) for name in IMPORT_FIELDS]
+        self.errors = []  # (line number, message) of the skipped rows.
+
+    def run(self, rows):
+        """Import (line number, row) pairs, yielding the count after each chunk."""
+        total = 0
+        rows = iter(rows)
+        while True:
+            chunk = self._clean(itertools.islice(rows, self.chunk_size))
+            if chunk is None:
+                return
+            total += self._load(chunk)
+            yield total
+
+    def _clean(self, rows):
+        """Validate a chunk against the model fields, or None past the end."""
+        chunk, seen = [], False
+        for number, row in rows:
+            seen = True
+            if not isinstance(row, dict):
+                self.errors.append((number, "Not a JSON object."))
+                continue
+            try:
+                values = [self._clean_value(field, row) for field in self.fields]
+                names = {
+                    name: self._clean_names(row, name) for name in IMPORT_RELATIONS
+                }
+            except ValidationError as error:
+                self.errors.append((number, "; ".join(error.messages)))
+                continue
+            chunk.append((values, names))
+
+        return chunk if seen else None
+
+    def _clean_value(self, field, row):
+        """Return the row's value for a recipe field, as the model accepts it."""
+        value = row.get(field.name)
+        return field.clean(None if value == "" else value, None)
+
+    def _clean_names(self, row, relation):
+        """Return the set of tag or ingredient names of a row."""
+        items = row.get(relation) or []
+        if not isinstance(items, list):
+            raise ValidationError(f"The {relation} must be a list of names.")
+
+        names = set()
+        for item in items:
+            name = item.get("name") if isinstance(item, dict) else str(item)
+            if not isinstance(name, str) or not name or len(name) > NAME_MAX_LENGTH:
+                raise ValidationError(f"Invalid {relation} name {name!r}.")
+            names.add(name)
+
+        return names
+
+    @transaction.atomic
+    def _load(self, chunk):
+        """Write a cleaned chunk and return the number of recipes it held."""
+        if not chunk:
+            return 0
+
+        with connection.cursor() as cursor:
+            for relation, model in IMPORT_RELATIONS.items():
+                self._merge_names(cursor, relation, model, chunk)
+
+            cursor.execute(
+                "SELECT nextval(pg_get_serial_sequence(%s, 'id'))"
+                " FROM generate_series(1, %s)",
+                [Recipe._meta.db_table, len(chunk)],
+            )
+            ids = [pk for pk, in cursor.fetchall()]
+
+            copy_rows(
+                cursor,
+                Recipe._meta.db_table,
+                ["id", "user_id"] + [field.column for field in self.fields],
+                ([pk, self.user.id, *values] for pk, (values, _) in zip(ids, chunk)),
+            )
+            for relation in IMPORT_RELATIONS:
+                through = getattr(Recipe, relation).through
+                target = getattr(Recipe, relation).field.m2m_reverse_field_name()
+                known = self.names[relation]
+                copy_rows(
+                    cursor,
+                    through._meta.db_table,
+                    ["recipe_id", f"{target}_id"],
+                    (
+                        (pk, known[name])
+                        for pk, (_, names) in zip(ids, chunk)
+                        for name in names[relation]
+                    ),
+                )
+
+        get_user_model().objects.bump_data_version(self.user.id)
+        return len(chunk)
+
+    def _merge_names(self, cursor, relation, model, chunk):
+        """Create the chunk's unknown names and remember their ids."""
+        known = self.names[relation]
+        missing = {name for _, names in chunk for name in names[relation]} - set(known)
+        if not missing:
+            return
+
+        table = model._meta.db_table
+        cursor.execute(
+            "CREATE TEMP TABLE IF NOT EXISTS import_names (name varchar(255))"
+            " ON COMMIT DROP"
+        )
+        cursor.execute("TRUNCATE import_names")
+        copy_rows(cursor, "import_names", ["name"], ([name] for name in missing))
+        cursor.execute(
+            f"INSERT INTO {table} (user_id, name)"
+            " SELECT %s, name FROM import_names ON CONFLICT DO NOTHING",
+            [self.user.id],
+        )
+        cursor.execute(
+            f"SELECT t.name, t.id FROM {table} t JOIN import_names USING (name)"
+            " WHERE t.user_id = %s",
+            [self.user.id],
+        )
+        known.update(cursor.fetchall())
@@ -0,0 +1,587 @@
+"""
+Django command for benchmarking the recipe APIs against a seeded dataset.
+"""
+import io
+import itertools
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+
+from PIL import Image
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count, Q
+from django.test.utils import override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe, Tag
+from recipe.facets import recipe_facets
+from recipe.images import make_derivatives, submit_derivatives
+from recipe.pagination import KeysetPagination
+from recipe.pantry import pantry_matches
+from recipe.similar import similar_recipes
+from recipe.uploads import UPLOAD_READ_SIZE, start_upload, write_chunk
+
+BATCH_SIZE = 5000
+UNCACHED = {"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}
+WORDS = (
+    "apple basil butter carrot cheese chicken chili chocolate coconut cream "
+    "curry garlic ginger honey lemon lentil mushroom noodle onion pasta "
+    "pepper pork potato prawn rice salmon soup spinach tofu tomato"
+).split()
+
+
+def analyze():
+    """Refresh planner statistics so seeded tables get realistic plans."""
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE")
+
+
+def seed_recipes(user, count):
+    """Bulk insert `count` recipes for the user and return their ids."""
+    for start in range(0, count, BATCH_SIZE):
+        Recipe.objects.bulk_create(
+            Recipe(
+                user=user,
+                title=f"{WORDS[i % len(WORDS)]} {WORDS[i * 7 % len(WORDS)]} {i}",
+                description=" ".join(WORDS[i * j % len(WORDS)] for j in (3, 11, 13)),
+                time_minutes=i % 120,
+                price=Decimal(i % 5000) / 100,
+            )
+            for i in range(start, min(start + BATCH_SIZE, count))
+        )
+
+    analyze()
+
+    return list(
+        Recipe.objects.filter(user=user).order_by("-id").values_list("id", flat=True)
+    )
+
+
+def seed_related(user, recipe_ids, relation, count, per_recipe):
+    """Bulk insert `count` tags or ingredients and link `per_recipe` to each recipe."""
+    model = relation.field.related_model
+    target = relation.field.m2m_reverse_field_name()  # "tag" or "ingredient"
+    objs = model.objects.bulk_create(
+        model(user=user, name=f"{target} {i}") for i in range(count)
+    )
+    through = relation.through
+    for start in range(0, len(recipe_ids), BATCH_SIZE):
+        through.objects.bulk_create(
+            through(
+                recipe_id=recipe_id,
+                **{f"{target}_id": objs[(i * 7 + j * 31) % count].id},
+            )
+            for i, recipe_id in enumerate(recipe_ids[start : start + BATCH_SIZE], start)
+            for j in range(per_recipe)
+        )
+    analyze()
+
+    return [obj.id for obj in objs]
+
+
+def seed_clustered(user, recipe_ids, relation, count, per_recipe, noise, rng):
+    """Like seed_related, but recipes vary a shared set of one of 500 clusters.
+
+    Every link of a recipe is swapped for a random one with chance `noise`,
+    so recipes of a cluster range from identical to barely alike.
+    """
+    model = relation.field.related_model
+    target = relation.field.m2m_reverse_field_name()
+    objs = model.objects.bulk_create(
+        model(user=user, name=f"{target} {i}") for i in range(count)
+    )
+    through = relation.through
+    for start in range(0, len(recipe_ids), BATCH_SIZE):
+        links = set()
+        for recipe_id in recipe_ids[start : start + BATCH_SIZE]:
+            cluster = rng.randrange(500)
+            for j in range(per_recipe):
+                k = rng.randrange(count) if rng.random() < noise else cluster + j * 500
+                links.add((recipe_id, objs[k % count].id))
+        through.objects.bulk_create(
+            through(recipe_id=recipe_id, **{f"{target}_id": obj_id})
+            for recipe_id, obj_id in links
+        )
+    analyze()
+
+
+def bench_pagination(command, client, user, options):
+    """Latency of a shallow and a deep recipe page, keyset against offset."""
+    page_size = options["page_size"]
+    depth = options["page"]
+    ids = seed_recipes(user, max(options["recipes"], page_size * depth))
+    url = reverse("recipe:recipe-list")
+
+    paginator = KeysetPagination()
+    paginator.base_url, paginator.ordering = url, ["-id"]
+    deep_cursor = paginator.encode_cursor(
+        Recipe(id=ids[page_size * (depth - 1) - 1]), reverse=False
+    )
+    offset = page_size * (depth - 1)
+    queryset = Recipe.objects.filter(user=user).order_by("-id")
+
+    command.measure("keyset page 1", lambda: client.get(url, {"page_size": page_size}))
+    command.measure(
+        f"keyset page {depth}",
+        lambda: client.get(deep_cursor, {"page_size": page_size}),
+    )
+    command.measure(
+        f"keyset page {depth} (ORM only)",
+        lambda: list(queryset.filter(id__lt=ids[offset - 1])[:page_size]),
+    )
+    command.measure(
+        f"offset page {depth} (ORM only)",
+        lambda: list(queryset[offset : offset + page_size]),
+    )
+
+    by_price = queryset.order_by("price", "id")
+    price, pk = by_price.values_list("price", "id")[offset - 1]
+    keyset = paginator._keyset_ranges(["price", "id"], [price, pk], set())[0]
+    command.measure(
+        f"price keyset page {depth} (ORM only)",
+        lambda: list(by_price.filter(keyset)[:page_size]),
+    )
+    command.measure(
+        f"price page {depth}, no range (ORM only)",
+        lambda: list(
+            by_price.filter(Q(price__gt=price) | Q(price=price, id__gt=pk))[:page_size]
+        ),
+    )
+
+
+def bench_filtering(command, client, user, options):
+    """Latency of tag filters as the number of requested ids grows."""
+    recipe_ids = seed_recipes(user, options["recipes"])
+    tag_ids = seed_related(user, recipe_ids, Recipe.tags, count=200, per_recipe=5)
+    url = reverse("recipe:recipe-list")
+
+    for count in (1, 10, 50, 100, 200):
+        params = {"tags": ",".join(map(str, tag_ids[:count]))}
+        for match in ("any", "all"):
+            command.measure(
+                f"{count:>3} tags, match={match}",
+                lambda: client.get(url, {**params, "match": match}),
+            )
+
+
+def bench_facets(command, client, user, options):
+    """Latency of facet counts, computed past the cache, by filter."""
+    recipe_ids = seed_recipes(user, options["recipes"])
+    tag_ids = seed_related(user, recipe_ids, Recipe.tags, count=200, per_recipe=3)
+    seed_related(user, recipe_ids, Recipe.ingredients, count=500, per_recipe=8)
+    recipes = Recipe.objects.filter(user=user)
+    tagged = recipes.filter(tags__id=tag_ids[0])
+
+    command.measure("no filter", lambda: recipe_facets(user, recipes, filtered=False))
+    command.measure("1 tag", lambda: recipe_facets(user, tagged))
+    command.measure(
+        "search lemon",
+        lambda: recipe_facets(user, recipes.filter(search_vector="lemon")),
+    )
+    command.measure(
+        "20 tag counts, one query each (ORM only)",
+        lambda: [recipes.filter(tags__id=pk).count() for pk in tag_ids[:20]],
+    )
+
+
+def bench_pantry(command, client, user, options):
+    """Latency of ranking recipes by pantry coverage, past the cache."""
+    recipe_ids = seed_recipes(user, options["recipes"])
+    ingredient_ids = seed_related(
+        user, recipe_ids, Recipe.ingredients, count=2000, per_recipe=8
+    )
+    links = Recipe.ingredients.through.objects.filter(recipe__user=user)
+    pantry = ingredient_ids[:20]
+
+    for count in (5, 20, 50):
+        have = ingredient_ids[:count]
+        command.measure(
+            f"{count:>2} ingredients, page of 20",
+            lambda: pantry_matches(user, have, 21),
+        )
+    command.measure(
+        "20 ingredients, all links grouped (ORM only)",
+        lambda: list(
+            links.values("recipe_id")
+            .annotate(
+                total=Count("id"),
+                covered=Count("id", filter=Q(ingredient_id__in=pantry)),
+            )
+            .filter(covered__gt=0)
+            .order_by("-covered")[:21]
+        ),
+    )
+
+
+def bench_similar(command, client, user, options):
+    """Recall and latency of similar recipes by band hashes, past the cache."""
+    recipe_ids = seed_recipes(user, options["recipes"])
+    rng = random.Random(0)
+    seed_clustered(user, recipe_ids, Recipe.tags, 1000, 3, 0.3, rng)
+    seed_clustered(user, recipe_ids, Recipe.ingredients, 5000, 8, 0.3, rng)
+    sample = Recipe.objects.filter(id__in=rng.sample(recipe_ids, 100))
+    k = 10
+
+    # a banded result is scored exactly, so every one at least as similar as
+    # the exact k-th result is a true top k result, ties aside.
+    found = expected = 0
+    for recipe in sample:
+        exact = similar_recipes(user, recipe, k, exact=True)
+        if exact:
+            banded = similar_recipes(user, recipe, k)
+            kth = exact[-1]["similarity"]
+            found += sum(1 for row in banded if row["similarity"] >= kth)
+            expected += len(exact)
+    command.stdout.write(f"  recall@{k} {found / max(expected, 1):.1%}")
+
+    recipe = sample[0]
+    command.measure("band hashes", lambda: similar_recipes(user, recipe, k))
+    command.measure(
+        "every recipe sharing a link (exact)",
+        lambda: similar_recipes(user, recipe, k, exact=True),
+    )
+
+
+def bench_search(command, client, user, options):
+    """Latency of ranked full-text searches of growing selectivity."""
+    seed_recipes(user, options["recipes"])
+    url = reverse("recipe:recipe-list")
+
+    for search in ("lemon", "lemon garlic", "lemon -garlic", '"chili pasta"'):
+        command.measure(
+            f"search {search}",
+            lambda: client.get(url, {"search": search}),
+        )
+
+
+def bench_typeahead(command, client, user, options):
+    """Latency of ingredient typeahead over a large per-user vocabulary."""
+    count = options["names"]
+    for start in range(0, count, BATCH_SIZE):
+        Ingredient.objects.bulk_create(
+            Ingredient(
+                user=user,
+                name=f"{WORDS[i % len(WORDS)]} {WORDS[i // 7 % len(WORDS)]} {i}",
+            )
+            for i in range(start, min(start + BATCH_SIZE, count))
+        )
+    analyze()
+    url = reverse("recipe:ingredient-list")
+
+    for search in ("to", "tom", "tomato", "tomatoe", "garlc", "pepper spin"):
+        command.measure(
+            f"q={search}",
+            lambda: client.get(url, {"q": search}),
+        )
+
+
+def bench_serializers(command, client, user, options):
+    """Rows/sec of full recipe list pages, ModelSerializer against fast path."""
+    recipe_ids = seed_recipes(user, options["recipes"])
+    seed_related(user, recipe_ids, Recipe.tags, count=200, per_recipe=3)
+    seed_related(user, recipe_ids, Recipe.ingredients, count=500, per_recipe=8)
+    url = reverse("recipe:recipe-list")
+    page_size = options["page_size"]
+
+    for fast_path in (False, True):
+        with override_settings(RECIPE_LIST_FAST_PATH=fast_path):
+            median = command.measure(
+                f"fast path={fast_path}",
+                lambda: client.get(url, {"page_size": page_size}),
+            )
+        command.stdout.write(f"    {page_size / median * 1000:,.0f} rows/sec")
+
+
+def through_writes(table):
+    """Return the rows this transaction has inserted into or deleted from a table."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT n_tup_ins + n_tup_del FROM pg_stat_xact_user_tables"
+            " WHERE relname = %s",
+            [table],
+        )
+        return cursor.fetchone()[0]
+
+
+def bench_m2m_update(command, client, user, options):
+    """Latency and link rows written swapping one tag on a recipe with fifty."""
+    recipe = Recipe.objects.get(id=seed_recipes(user, 1)[0])
+    tags = Tag.objects.bulk_create(Tag(user=user, name=f"tag {i}") for i in range(51))
+    recipe.tags.add(*tags[:50])
+    url = reverse("recipe:recipe-detail", args=[recipe.id])
+    table = Recipe.tags.through._meta.db_table
+
+    names = [{"name": tag.name} for tag in tags]
+    swaps = itertools.count()  # alternate the last tag so every run edits.
+
+    def swap_last_tag():
+        last = 49 + next(swaps) % 2
+        client.patch(url, {"tags": names[:49] + names[last : last + 1]}, format="json")
+
+    def clear_and_add():
+        last = 49 + next(swaps) % 2
+        recipe.tags.clear()
+        recipe.tags.add(*tags[:49], tags[last])
+
+    for label, func in (
+        ("PATCH 1 of 50 tags", swap_last_tag),
+        ("clear and re-add 50 tags (ORM only)", clear_and_add),
+    ):
+        before = through_writes(table)
+        command.measure(label, func)
+        written = (through_writes(table) - before) / (command.runs + 1)
+        command.stdout.write(f"    {written:,.0f} link rows written per edit")
+
+
+def bench_bulk_create(command, client, user, options):
+    """Recipes/sec created through the bulk endpoint, batch by batch."""
+    batch = options["batch"]
+    url = reverse("recipe:recipe-bulk")
+    batches = itertools.count()
+
+    def post_batch():
+        start = next(batches) * batch
+        payload = [
+            {
+                "title": f"{WORDS[i % len(WORDS)]} {i}",
+                "time_minutes": i % 120,
+                "price": f"{i % 5000 / 100:.2f}",
+                "tags": [{"name": f"tag {i * j % 200}"} for j in (1, 3, 7)],
+                "ingredients": [
+                    {"name": WORDS[i * j % len(WORDS)]} for j in range(1, 9)
+                ],
+            }
+            for i in range(start, start + batch)
+        ]
+        client.post(url, payload, format="json")
+
+    median = command.measure(f"POST {batch} recipes", post_batch)
+    command.stdout.write(f"    {batch / median * 1000:,.0f} recipes/sec")
+
+
+def seed_images(root, count, size):
+    """Write `count` camera-sized JPEGs of noise over a gradient under `root`."""
+    gradient = Image.linear_gradient("L").resize(size)
+    names = []
+    for i in range(count):
+        noise = Image.effect_noise(size, 32 + i % 32)
+        image = Image.merge("RGB", (gradient, noise, gradient.rotate(90 * i)))
+        names.append(f"photo-{i}.jpg")
+        image.save(os.path.join(root, names[-1]), "JPEG", quality=90)
+
+    return names
+
+
+def resize_from_original(root, name, widths, formats):
+    """Make JPEG derivatives the plain way: each one resized from the full decode."""
+    stem = os.path.splitext(name)[0]
+    with Image.open(os.path.join(root, name)) as image:
+        image.load()
+        for width in widths:
+            height = round(image.height * width / image.width)
+            resized = image.resize((width, height), Image.LANCZOS)
+            resized.save(os.path.join(root, f"{stem}-{width}w.jpg"), "JPEG", quality=82)
+
+
+def bench_images(command, client, user, options):
+    """Images/sec made into derivatives, in one process and across a pool."""
+    root = tempfile.mkdtemp()
+    workers = os.cpu_count()
+    try:
+        names = seed_images(root, options["images"], (4000, 3000))
+        job = (settings.RECIPE_IMAGE_WIDTHS, ["jpeg"])
+
+        def serial(func):
+            return lambda: [func(root, name, *job) for name in names]
+
+        def pooled():
+            with ProcessPoolExecutor(workers) as pool:
+                futures = [pool.submit(make_derivatives, root, n, *job) for n in names]
+                for future in futures:
+                    future.result()
+
+        for label, func, cores in (
+            ("resize from original, 1 process", serial(resize_from_original), 1),
+            ("draft and cascade, 1 process", serial(make_derivatives), 1),
+            (f"draft and cascade, {workers} processes", pooled, workers),
+        ):
+            median = command.measure(label, func)
+            rate = len(names) / median * 1000
+            command.stdout.write(
+                f"    {rate:,.1f} images/sec, {rate / cores:,.1f} per core"
+            )
+    finally:
+        shutil.rmtree(root)
+
+
+class NoiseStream:
+    """A request body of `size` bytes, made as it is read like a socket's."""
+
+    def __init__(self, size):
+        self.left = size
+        self.block = random.Random(0).randbytes(UPLOAD_READ_SIZE)
+
+    def read(self, size):
+        size = min(size, self.left, len(self.block))
+        self.left -= size
+        return self.block[:size]
+
+
+def bench_uploads(command, client, user, options):
+    """MB/s and peak memory writing resumable upload chunks as images grow."""
+    recipe = Recipe.objects.create(user=user, title="upload", price=Decimal("1.00"))
+    chunk = settings.RECIPE_UPLOAD_CHUNK_SIZE
+    root = tempfile.mkdtemp()
+    try:
+        with override_settings(MEDIA_ROOT=root):
+            for size in (16 * 2**20, 256 * 2**20):
+
+                def upload():
+                    uploaded = start_upload(recipe, "photo.jpg", size)
+                    while uploaded.offset < size:
+                        length = min(chunk, size - uploaded.offset)
+                        write_chunk(uploaded, NoiseStream(length), length)
+                    uploaded.delete()
+
+                median = command.measure(
+                    f"{size >> 20} MB in {chunk >> 20} MB chunks", upload
+                )
+                tracemalloc.start()
+                upload()
+                peak = tracemalloc.get_traced_memory()[1] / 2**10
+                tracemalloc.stop()
+                command.stdout.write(
+                    f"    {(size >> 20) / median * 1000:,.0f} MB/s,"
+                    f" peak {peak:,.0f} KB allocated"
+                )
+    finally:
+        shutil.rmtree(root)
+
+
+def disk_usage(root):
+    """Return the bytes of the files under `root`."""
+    return sum(
+        os.path.getsize(os.path.join(directory, name))
+        for directory, _, names in os.walk(root)
+        for name in names
+    )
+
+
+def bench_dedup(command, client, user, options):
+    """Latency and disk usage of re-uploading a photo, by storage mode."""
+    photo = io.BytesIO()
+    Image.effect_noise((3000, 2000), 64).convert("RGB").save(photo, "JPEG")
+    recipes = Recipe.objects.bulk_create(
+        Recipe(user=user, title=f"photo {i}", price=Decimal("1.00"))
+        for i in range(command.runs + 1)
+    )
+
+    for content_addressed in (False, True):
+        root = tempfile.mkdtemp()
+        uploads = iter(recipes)
+        try:
+            with override_settings(
+                MEDIA_ROOT=root,
+                RECIPE_IMAGE_CONTENT_ADDRESSED=content_addressed,
+                RECIPE_IMAGE_WORKERS=0,
+            ):
+
+                def upload():
+                    recipe = next(uploads)
+                    photo.seek(0)
+                    photo.name = "photo.jpg"
+                    url = reverse("recipe:recipe-upload-image", args=[recipe.id])
+                    client.post(url, {"image": photo})
+                    recipe.refresh_from_db(fields=["image"])
+                    # the commit callback, which the rolled back run never gets.
+                    submit_derivatives(recipe.id, user.id, recipe.image.name)
+
+                command.measure(
+                    f"upload and resize, content addressed={content_addressed}",
+                    upload,
+                )
+                command.stdout.write(
+                    f"    {disk_usage(root) / 2**20:,.1f} MB on disk"
+                    f" for {len(recipes)} uploads"
+                )
+        finally:
+            shutil.rmtree(root)
+
+
+SCENARIOS = {
+    "bulk_create": bench_bulk_create,
+    "dedup": bench_dedup,
+    "facets": bench_facets,
+    "filtering": bench_filtering,
+    "images": bench_images,
+    "m2m_update": bench_m2m_update,
+    "pagination": bench_pagination,
+    "pantry": bench_pantry,
+    "search": bench_search,
+    "serializers": bench_serializers,
+    "similar": bench_similar,
+    "typeahead": bench_typeahead,
+    "uploads": bench_uploads,
+}
+
+
+class Command(BaseCommand):
+    """Django command for benchmarking the recipe APIs."""
+
+    help = "Seed a throwaway dataset, time an API scenario and roll it back."
+
+    def add_arguments(self, parser):
+        parser.add_argument("scenario", choices=sorted(SCENARIOS))
+        parser.add_argument("--recipes", type=int, default=100_000)
+        parser.add_argument("--runs", type=int, default=20)
+        parser.add_argument("--page", type=int, default=1000)
+        parser.add_argument("--page-size", type=int, default=100)
+        parser.add_argument("--names", type=int, default=100_000)
+        parser.add_argument("--batch", type=int, default=1000)
+        parser.add_argument("--images", type=int, default=16)
+
+    def handle(self, *args, **options):
+        """Entry point for command."""
+        self.runs = options["runs"]
+
+        # every read is timed past the list cache, or repeats would time hits.
+        with override_settings(
+            ALLOWED_HOSTS=["testserver"], CACHES=UNCACHED
+        ), transaction.atomic():
+            user = get_user_model().objects.create_user(
+                email="benchmark@example.com", password="benchmark"
+            )
+            client = APIClient()
+            client.force_authenticate(user)
+
+            self.stdout.write(f"Running {options['scenario']}...")
+            SCENARIOS[options["scenario"]](self, client, user, options)
+
+            transaction.set_rollback(True)  # leave the database as we found it.
+
+    def measure(self, label, func):
+        """Run `func` several times, report its latency and return the median."""
+        func()  # warm up caches and connections.
+        timings = []
+        for _ in range(self.runs):
+            start = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - start) * 1000)
+
+        timings.sort()
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        median = statistics.median(timings)
+        self.stdout.write(f"  {label:<40} median {median:8.2f} ms  p95 {p95:8.2f} ms")
+
+        return median
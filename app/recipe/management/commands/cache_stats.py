@@ -0,0 +1,31 @@
+"""
+Django command for reporting the list response cache counters.
+"""
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+
+from recipe.mixins import CACHE_COUNTER_KEYS, get_cache_stats
+
+
+class Command(BaseCommand):
+    """Django command for reporting the list response cache counters."""
+
+    help = "Print the hit and miss counters of the list response cache."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reset", action="store_true", help="Zero the counters afterwards."
+        )
+
+    def handle(self, *args, **options):
+        """Entry point for command."""
+        stats = get_cache_stats()
+        total = stats["hits"] + stats["misses"]
+        ratio = stats["hits"] / total if total else 0
+
+        self.stdout.write(
+            f"hits: {stats['hits']}  misses: {stats['misses']}  hit ratio: {ratio:.1%}"
+        )
+
+        if options["reset"]:
+            cache.delete_many(CACHE_COUNTER_KEYS.values())
@@ -0,0 +1,44 @@
+"""
+Django command for exporting a user's recipes as NDJSON or CSV.
+"""
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import Recipe
+from recipe.export import EXPORT_CHUNK_SIZE, EXPORT_CONTENT_TYPES, export_recipes
+
+
+class Command(BaseCommand):
+    """Django command for exporting a user's recipes."""
+
+    help = "Stream every recipe of a user, with tags and ingredients, to a file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("email", help="Owner of the recipes to export.")
+        parser.add_argument(
+            "--format", choices=sorted(EXPORT_CONTENT_TYPES), default="ndjson"
+        )
+        parser.add_argument(
+            "--output", help="File to write to, standard output by default."
+        )
+        parser.add_argument("--chunk-size", type=int, default=EXPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        """Entry point for command."""
+        try:
+            user = get_user_model().objects.get(email=options["email"])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"No user with email {options['email']}.")
+
+        lines = export_recipes(
+            Recipe.objects.filter(user=user).order_by("-id"),
+            options["format"],
+            options["chunk_size"],
+        )
+
+        if options["output"]:
+            with open(options["output"], "w", newline="") as output:
+                output.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending="")
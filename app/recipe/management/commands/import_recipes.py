@@ -0,0 +1,61 @@
+"""
+Django command for importing recipes from NDJSON or CSV.
+"""
+import sys
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from recipe.importer import IMPORT_CHUNK_SIZE, READERS, RecipeImporter
+
+
+class Command(BaseCommand):
+    """Django command for importing recipes."""
+
+    help = "Load recipes, with tags and ingredients by name, for a user via COPY."
+
+    def add_arguments(self, parser):
+        parser.add_argument("email", help="Owner of the imported recipes.")
+        parser.add_argument("path", help="File to read, or - for standard input.")
+        parser.add_argument(
+            "--format",
+            choices=sorted(READERS),
+            help="Input format, guessed from the file extension by default.",
+        )
+        parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        """Entry point for command."""
+        try:
+            user = get_user_model().objects.get(email=options["email"])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"No user with email {options['email']}.")
+
+        path = options["path"]
+        output_format = options["format"] or (
+            "csv" if path.endswith(".csv") else "ndjson"
+        )
+        importer = RecipeImporter(user, options["chunk_size"])
+
+        source = sys.stdin if path == "-" else open(path, newline="")
+        start = time.perf_counter()
+        total = 0
+        try:
+            for total in importer.run(READERS[output_format](source)):
+                elapsed = time.perf_counter() - start
+                self.stdout.write(
+                    f"{total:,} recipes imported, {total / elapsed:,.0f} rows/sec"
+                )
+        finally:
+            if source is not sys.stdin:
+                source.close()
+
+        for number, message in importer.errors:
+            self.stderr.write(f"line {number}: skipped, {message}")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {total:,} recipes in {time.perf_counter() - start:.1f}s,"
+                f" skipped {len(importer.errors):,}."
+            )
+        )
@@ -0,0 +1,63 @@
+"""
+Django command for making the resized copies of existing recipe images.
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.models import Recipe
+from core.storage import recipe_image_storage
+from recipe.images import available_formats, make_derivatives, record_derivatives
+
+
+class Command(BaseCommand):
+    """Django command for making recipe image derivatives."""
+
+    help = "Make the resized copies of the recipe images that have none yet."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all", action="store_true", help="Remake the copies of every image."
+        )
+        parser.add_argument("--workers", type=int, default=os.cpu_count())
+
+    def handle(self, *args, **options):
+        """Entry point for command."""
+        recipes = Recipe.objects.exclude(image="").exclude(image=None)
+        if not options["all"]:
+            recipes = recipes.filter(image_derivatives={})
+        jobs = recipes.values_list("id", "user_id", "image")
+
+        formats = available_formats()
+        start = time.perf_counter()
+        total = failed = 0
+        with ProcessPoolExecutor(options["workers"]) as pool:
+            futures = {
+                pool.submit(
+                    make_derivatives,
+                    recipe_image_storage.location,
+                    name,
+                    settings.RECIPE_IMAGE_WIDTHS,
+                    formats,
+                    force=options["all"],
+                ): (recipe_id, user_id, name)
+                for recipe_id, user_id, name in jobs.iterator()
+            }
+            for future in as_completed(futures):
+                recipe_id, user_id, name = futures[future]
+                try:
+                    record_derivatives(recipe_id, user_id, name, future.result())
+                    total += 1
+                except Exception as error:
+                    failed += 1
+                    self.stderr.write(f"{name}: skipped, {error}")
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Made the copies of {total:,} images in"
+                f" {time.perf_counter() - start:.1f}s, skipped {failed:,}."
+            )
+        )
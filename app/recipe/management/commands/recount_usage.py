@@ -0,0 +1,98 @@
+"""
+Django command for repairing the trigger maintained usage counters.
+"""
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from core.models import Ingredient, Recipe, Tag
+
+RECOUNT_BATCH_SIZE = 1000
+
+# name: (counted model, counter, link table, link column) per usage counter.
+COUNTERS = {
+    "tags": (Tag, "recipe_count", Recipe.tags.through._meta.db_table, "tag_id"),
+    "ingredients": (
+        Ingredient,
+        "recipe_count",
+        Recipe.ingredients.through._meta.db_table,
+        "ingredient_id",
+    ),
+    "recipes": (
+        Recipe,
+        "ingredient_count",
+        Recipe.ingredients.through._meta.db_table,
+        "recipe_id",
+    ),
+}
+
+
+class Command(BaseCommand):
+    """Django command for repairing the trigger maintained usage counters."""
+
+    help = (
+        "Recount recipe_count of tags and ingredients and ingredient_count of"
+        " recipes, fixing any drift."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--only",
+            choices=list(COUNTERS),
+            help="Recount a single counter instead of all of them.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=RECOUNT_BATCH_SIZE,
+            help="Rows recounted per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        """Entry point for command."""
+        names = [options["only"]] if options["only"] else list(COUNTERS)
+        for name in names:
+            checked = fixed = 0
+            for batch_checked, batch_fixed in self.recount(
+                *COUNTERS[name], options["batch_size"]
+            ):
+                checked += batch_checked
+                fixed += batch_fixed
+            self.stdout.write(
+                self.style.SUCCESS(f"{name}: checked {checked}, fixed {fixed}")
+            )
+
+    def recount(self, model, field, links, column, batch_size):
+        """Yield (checked, fixed) per batch of rows, walked in id order.
+
+        Each batch locks its rows before counting, so links committed by
+        others are waited for and counted, and later ones add on top. The
+        owners of fixed rows get a new data version, dropping cached counts.
+        """
+        table = model._meta.db_table
+        last_id = 0
+        while True:
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(
+                    f"SELECT id FROM {table} WHERE id > %s"
+                    " ORDER BY id LIMIT %s FOR UPDATE",
+                    [last_id, batch_size],
+                )
+                ids = [pk for pk, in cursor.fetchall()]
+                if not ids:
+                    return
+                cursor.execute(
+                    f"UPDATE {table} t SET {field} = c.total"
+                    f" FROM (SELECT x.id, count(l.{column}) AS total"
+                    f" FROM unnest(%s::bigint[]) AS x (id)"
+                    f" LEFT JOIN {links} l ON l.{column} = x.id GROUP BY x.id) c"
+                    f" WHERE t.id = c.id AND t.{field} <> c.total"
+                    " RETURNING t.user_id",
+                    [ids],
+                )
+                owners = [user_id for user_id, in cursor.fetchall()]
+                if owners:
+                    get_user_model().objects.bump_data_version(*set(owners))
+                fixed = len(owners)
+            last_id = ids[-1]
+            yield len(ids), fixed
@@ -0,0 +1,139 @@
+"""
+View mixins for recipe APIs
+"""
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+
+def get_data_version(request):
+    """Return the data version of the requesting user, read once per request."""
+    if not hasattr(request, "_data_version"):
+        request._data_version = get_user_model().objects.get_data_version(
+            request.user.pk
+        )
+
+    return request._data_version
+
+
+def request_fingerprint(request):
+    """Hash what a read depends on: user, data version, URL and media type."""
+    key = ":".join(
+        [
+            str(request.user.pk),
+            str(get_data_version(request)),
+            request.build_absolute_uri(),
+            request.accepted_media_type,
+        ]
+    )
+
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+
+
+class ConditionalGetMixin:
+    """Tag reads with a strong ETag and answer 304 when the client is current.
+
+    The ETag hashes the user's data version together with the request, so
+    checking it costs one lookup by primary key and no serialization at all.
+    """
+
+    def list(self, request, *args, **kwargs):
+        return self._conditional_get(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._conditional_get(super().retrieve, request, *args, **kwargs)
+
+    def get_etag(self, request):
+        """Return the ETag of what this request would render right now."""
+        return quote_etag(request_fingerprint(request))
+
+    def _conditional_get(self, handler, request, *args, **kwargs):
+        """Short-circuit to 304 when If-None-Match holds the current ETag."""
+        # read the version before the data, so a concurrent write can only
+        # make the ETag older than the body, never newer.
+        etag = self.get_etag(request)
+        client_etags = parse_etags(request.headers.get("If-None-Match", ""))
+
+        if etag in client_etags or ("*" in client_etags and self._resolves()):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = handler(request, *args, **kwargs)
+
+        if response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            response["ETag"] = etag
+            patch_vary_headers(response, ("Accept", "Authorization"))
+
+        return response
+
+    def _resolves(self):
+        """Return whether `*` matches: a detail read of an object the user sees.
+
+        get_object() raises the 404 of a missing or foreign object, so `*`
+        never answers 304 for it. Lists always exist, so `*` is ignored there.
+        """
+        if not self.detail:
+            return False
+
+        self.get_object()
+        return True
+
+
+class CachedListMixin:
+    """Serve list responses from the cache until the user's data changes.
+
+    Entries are keyed by the request fingerprint, which embeds the user's data
+    version, so a write makes every older entry of that user unreachable and
+    they simply expire. Works with any backend of Django's cache framework.
+    """
+
+    cache_key_prefix = "recipe-api"
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, "list", super().list, *args, **kwargs)
+
+    def cached_response(self, request, kind, handler, *args, **kwargs):
+        """Return the cached data of this `kind` of read, or call the handler."""
+        key = f"{self.cache_key_prefix}:{kind}:{request_fingerprint(request)}"
+        data = cache.get(key)
+
+        if data is not None:
+            record_cache_access(hit=True)
+            response = Response(data)
+        else:
+            record_cache_access(hit=False)
+            response = handler(request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                cache.set(key, response.data, settings.RECIPE_CACHE_TIMEOUT)
+
+        response["X-Cache"] = "HIT" if data is not None else "MISS"
+        return response
+
+
+CACHE_COUNTER_KEYS = {
+    True: f"{CachedListMixin.cache_key_prefix}:hits",
+    False: f"{CachedListMixin.cache_key_prefix}:misses",
+}
+
+
+def record_cache_access(hit):
+    """Count a list cache hit or miss in the shared cache."""
+    key = CACHE_COUNTER_KEYS[hit]
+    cache.add(key, 0, timeout=None)  # incr() needs the key to exist.
+    try:
+        cache.incr(key)
+    except ValueError:  # evicted between add() and incr().
+        cache.add(key, 1, timeout=None)
+
+
+def get_cache_stats():
+    """Return the list cache hit and miss counters."""
+    return {
+        "hits": cache.get(CACHE_COUNTER_KEYS[True], 0),
+        "misses": cache.get(CACHE_COUNTER_KEYS[False], 0),
+    }
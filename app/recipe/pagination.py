@@ -0,0 +1,239 @@
+"""
+Pagination for recipe APIs
+"""
+import base64
+import binascii
+import json
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Opaque cursor pagination keyed on the queryset ordering.
+
+    The cursor stores the ordering values of the row at the edge of the page,
+    so every page is a `WHERE (ordering) > (position) LIMIT n` that walks the
+    index from where the previous one stopped. It never counts and never
+    offsets, which keeps page 1000 as cheap as page 1.
+    """
+
+    cursor_query_param = "cursor"
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = "page_size"
+    max_page_size = 1000
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset)
+
+        position, reverse = self.decode_cursor(request)
+        ordering = self._invert(self.ordering) if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+
+        ranges = [Q()]
+        if position is not None:
+            nullable = self._nullable_fields(queryset)
+            ranges = self._keyset_ranges(ordering, position, nullable)
+
+        # fetch one extra row to know if there is anything past this page,
+        # reading the next range only when one runs out before that.
+        results = []
+        for keyset in ranges:
+            try:
+                rows = queryset.filter(keyset)[: self.page_size + 1 - len(results)]
+                results += list(rows)
+            except (TypeError, ValueError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+            if len(results) > self.page_size:
+                break
+
+        has_more = len(results) > self.page_size
+        self.page = results[: self.page_size]
+
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+                "results": data,
+            }
+        )
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        """Return the page size requested by the client, within bounds."""
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+
+        return max(1, min(page_size, self.max_page_size))
+
+    def get_ordering(self, queryset):
+        """Return the queryset ordering, made total by a trailing `id`."""
+        ordering = list(queryset.query.order_by)
+        if not any(field.lstrip("-") in ("id", "pk") for field in ordering):
+            ordering.append("id")  # ties on the other fields need a tiebreaker.
+
+        return ordering
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def encode_cursor(self, instance, reverse):
+        """Return a link whose cursor points at the given row."""
+        if isinstance(instance, dict):  # a values() row.
+            position = [instance[field.lstrip("-")] for field in self.ordering]
+        else:
+            position = [getattr(instance, field.lstrip("-")) for field in self.ordering]
+        payload = json.dumps({"p": position, "r": int(reverse)}, cls=DjangoJSONEncoder)
+        cursor = base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request):
+        """Return the (position, reverse) pair stored in the request cursor."""
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None, False
+
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+            position, reverse = payload["p"], bool(payload["r"])
+        except (TypeError, ValueError, KeyError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        return position, reverse
+
+    def _invert(self, ordering):
+        """Flip the direction of every field in the ordering."""
+        return [
+            field[1:] if field.startswith("-") else f"-{field}" for field in ordering
+        ]
+
+    def _nullable_fields(self, queryset):
+        """Return the names of the ordering's model fields that allow NULL."""
+        nullable = set()
+        for field in self.ordering:
+            try:
+                if queryset.model._meta.get_field(field.lstrip("-")).null:
+                    nullable.add(field.lstrip("-"))
+            except FieldDoesNotExist:  # an annotation, such as a search rank.
+                pass
+
+        return nullable
+
+    def _keyset_ranges(self, ordering, position, nullable):
+        """Split the rows past the position into index ranges, in order.
+
+        Postgres sorts NULL after every value, so past a value of the leading
+        field come the greater values and then the NULLs. Each is a range of
+        an index led by that field, which one OR over both could not use.
+        """
+        name, value = ordering[0].lstrip("-"), position[0]
+        descending = ordering[0].startswith("-")
+        rest = self._keyset_filter(ordering[1:], position[1:], nullable)
+
+        if value is None:
+            ranges = [Q(**{f"{name}__isnull": True}) & rest]
+            if descending:
+                ranges.append(Q(**{f"{name}__isnull": False}))
+            return ranges
+
+        past = Q(**{f"{name}__{'lt' if descending else 'gt'}": value})
+        if ordering[1:]:
+            past |= Q(**{name: value}) & rest
+        # bound the range on the leading field alone, where the index starts.
+        ranges = [Q(**{f"{name}__{'lte' if descending else 'gte'}": value}) & past]
+        if name in nullable and not descending:
+            ranges.append(Q(**{f"{name}__isnull": True}))
+        return ranges
+
+    def _keyset_filter(self, ordering, position, nullable):
+        """Build `(a, b, c) > (x, y, z)` honouring directions and NULLs."""
+        conditions = []
+        equal = Q()
+        for field, value in zip(ordering, position):
+            name = field.lstrip("-")
+            descending = field.startswith("-")
+            if value is None:
+                if descending:  # every value sorts before NULL backwards.
+                    conditions.append(equal & Q(**{f"{name}__isnull": False}))
+                equal &= Q(**{f"{name}__isnull": True})
+                continue
+
+            past = Q(**{f"{name}__{'lt' if descending else 'gt'}": value})
+            if name in nullable and not descending:
+                past |= Q(**{f"{name}__isnull": True})
+            conditions.append(equal & past)
+            equal &= Q(**{name: value})
+
+        return reduce(or_, conditions) if conditions else Q(pk__in=[])
+
+
+class RankedPagination(KeysetPagination):
+    """Keyset pagination of rows ranked by a query of their own.
+
+    The view hands over a `fetch(position, limit)` that returns rows in the
+    given ordering, starting past the position, so cursors look and work
+    like the list's. Rankings page forwards only.
+    """
+
+    def paginate_rows(self, fetch, ordering, request):
+        """Return the page of rows the request's cursor points at."""
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.ordering = ordering
+
+        position, reverse = self.decode_cursor(request)
+        if reverse:
+            raise NotFound(self.invalid_cursor_message)
+        try:
+            results = fetch(position, self.page_size + 1)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+        self.page = results[: self.page_size]
+        self.has_next, self.has_previous = len(results) > self.page_size, False
+
+        return self.page
@@ -0,0 +1,64 @@
+"""
+Pantry coverage for recipe APIs
+"""
+from django.db import connection
+
+from core.models import Ingredient, Recipe
+
+PANTRY_ORDERING = ["-coverage", "-covered", "-id"]
+PANTRY_COLUMNS = ["id", "title", "time_minutes", "price", "link"]
+
+
+def pantry_matches(user, have, limit, position=None):
+    """Return the user's recipes ranked by the share of ingredients in `have`.
+
+    Only the links of the pantry ingredients are read: grouping them gives
+    how many ingredients of each recipe are covered, and the trigger
+    maintained `ingredient_count` of the recipe how many it needs. Missing
+    ingredients are listed for the returned rows only. Rows come in
+    PANTRY_ORDERING, starting past `position` when one is given; a position
+    that is not numbers raises TypeError or ValueError.
+    """
+    links = Recipe.ingredients.through._meta.db_table
+    ingredients = Ingredient._meta.db_table
+    recipes = Recipe._meta.db_table
+    columns = ", ".join(f"r.{name}" for name in PANTRY_COLUMNS)
+    have = list(have)
+    params = [user.id, have, user.id]
+    after = ""
+    if position is not None:
+        # every key descends, so the rows past the position compare lower.
+        after = "WHERE (coverage, covered, id) < (%s, %s, %s)"
+        coverage, covered, pk = position
+        params += [float(coverage), int(covered), int(pk)]
+    params += [limit, have]
+
+    sql = (
+        "WITH ranked AS (SELECT c.recipe_id AS id, c.covered,"
+        # a drifted counter must neither divide by zero nor cover over 100%.
+        " c.covered::float8 / GREATEST(r.ingredient_count, c.covered) AS coverage"
+        # one index lookup per pantry ingredient, then grouped by recipe.
+        f" FROM (SELECT l.recipe_id, count(*) AS covered FROM {ingredients} i"
+        f" CROSS JOIN LATERAL (SELECT recipe_id FROM {links}"
+        " WHERE ingredient_id = i.id) l"
+        " WHERE i.user_id = %s AND i.id = ANY(%s)"
+        " GROUP BY l.recipe_id) c"
+        # and one primary key lookup per matched recipe: the LIMIT keeps the
+        # planner from hashing the user's whole library instead.
+        f" CROSS JOIN LATERAL (SELECT ingredient_count FROM {recipes}"
+        " WHERE id = c.recipe_id AND user_id = %s LIMIT 1) r),"
+        f" page AS (SELECT * FROM ranked {after}"
+        " ORDER BY coverage DESC, covered DESC, id DESC LIMIT %s)"
+        f" SELECT {columns}, page.covered, page.coverage,"
+        " COALESCE(m.missing, '[]') FROM page"
+        f" JOIN {recipes} r ON r.id = page.id"
+        " LEFT JOIN LATERAL (SELECT json_agg(json_build_object('id', i.id,"
+        " 'name', i.name) ORDER BY i.name) AS missing"
+        f" FROM {links} l JOIN {ingredients} i ON i.id = l.ingredient_id"
+        " WHERE l.recipe_id = page.id AND l.ingredient_id <> ALL(%s)) m ON true"
+        " ORDER BY page.coverage DESC, page.covered DESC, page.id DESC"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        names = PANTRY_COLUMNS + ["covered", "coverage", "missing"]
+        return [dict(zip(names, row)) for row in cursor.fetchall()]
@@ -2,12 +2,40 @@
 Serializers for recipe APIs
 """
 
+import os
+
+from PIL import Image
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
 
-from core.models import Recipe, Tag, Ingredient
+from core.models import ImageUpload, Recipe, Tag, Ingredient
+from core.storage import recipe_image_storage
+from recipe.images import IMAGE_FORMATS, replace_image
+
+BULK_BATCH_SIZE = 5000  # rows per INSERT when writing many at once.
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class UniqueNameMixin:
+    """Reject renaming a tag or ingredient to a name its owner already uses."""
+
+    def validate_name(self, value):
+        if self.instance is not None:
+            taken = (
+                type(self.instance)
+                .objects.filter(user_id=self.instance.user_id, name=value)
+                .exclude(pk=self.instance.pk)
+            )
+            if taken.exists():
+                raise serializers.ValidationError("This name is already in use.")
+
+        return value
+
+
+class IngredientSerializer(UniqueNameMixin, serializers.ModelSerializer):
     """Serializer for ingredients"""
 
     class Meta:
@@ -16,7 +44,7 @@ class IngredientSerializer(serializers.ModelSerializer):
         read_only_fields = ["id"]
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(UniqueNameMixin, serializers.ModelSerializer):
     """Serializer for tag objects."""
 
     class Meta:
@@ -25,7 +53,70 @@ class TagSerializer(serializers.ModelSerializer):
         read_only_fields = ["id"]
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class IngredientUsageSerializer(IngredientSerializer):
+    """Serializer for ingredients listed with their usage."""
+
+    class Meta(IngredientSerializer.Meta):
+        fields = IngredientSerializer.Meta.fields + ["recipe_count"]
+
+
+class TagUsageSerializer(TagSerializer):
+    """Serializer for tags listed with their usage."""
+
+    class Meta(TagSerializer.Meta):
+        fields = TagSerializer.Meta.fields + ["recipe_count"]
+
+
+class DynamicFieldsMixin:
+    """Let the caller narrow down the fields a serializer renders."""
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class RecipeListSerializer(serializers.ListSerializer):
+    """Create many recipes with a handful of bulk statements.
+
+    The recipes go in with one insert, the tags and ingredients of every item
+    are resolved together by name, and all links share one insert per
+    relation, so the cost grows with the payload size, not with round trips.
+    """
+
+    @transaction.atomic
+    def create(self, validated_data):
+        """Create the recipes and link their tags and ingredients."""
+        tags = [item.pop("tags", []) for item in validated_data]
+        ingredients = [item.pop("ingredients", []) for item in validated_data]
+        recipes = Recipe.objects.bulk_create(
+            [Recipe(**item) for item in validated_data], batch_size=BULK_BATCH_SIZE
+        )
+
+        for relation, model, items in (
+            (Recipe.tags, Tag, tags),
+            (Recipe.ingredients, Ingredient, ingredients),
+        ):
+            ids = self.child._get_or_create_named(
+                model, [item for per_recipe in items for item in per_recipe]
+            )
+            self.child._link(
+                relation,
+                [
+                    (recipe.id, ids[item["name"]])
+                    for recipe, per_recipe in zip(recipes, items)
+                    for item in per_recipe
+                ],
+            )
+
+        user = self.context["request"].user
+        get_user_model().objects.bump_data_version(user.id)
+        return recipes
+
+
+class RecipeSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     """Serializer for the recipe object."""
 
     tags = TagSerializer(
@@ -37,33 +128,78 @@ class RecipeSerializer(serializers.ModelSerializer):
         model = Recipe
         fields = ["id", "title", "time_minutes", "price", "link", "tags", "ingredients"]
         read_only_fields = ["id"]  # We don't want to change the id field.
+        list_serializer_class = RecipeListSerializer  # bulk creates.
 
-    def _get_or_create_tags(self, tags, recipe):
-        """Handle getting or creating tags."""
-
+    def _get_or_create_named(self, model, items):
+        """Return {name: id} of the user's objects, creating the missing ones."""
         auth_user = self.context["request"].user  # We get the authenticated user.
+        names = {item["name"] for item in items}
+        if not names:
+            return {}
+
+        existing = model.objects.filter(user=auth_user, name__in=names)
+        ids = dict(existing.values_list("name", "id"))
+        missing = names - ids.keys()
+        if missing:
+            # a concurrent request may insert the same names first; the unique
+            # (user, name) constraint turns those rows into no-ops, not duplicates.
+            model.objects.bulk_create(
+                [model(user=auth_user, name=name) for name in missing],
+                ignore_conflicts=True,
+            )
+            ids.update(
+                model.objects.filter(user=auth_user, name__in=missing).values_list(
+                    "name", "id"
+                )
+            )
 
-        # We are looping through the tags and creating them.
-        for tag in tags:
-            tag_obj, created = Tag.objects.get_or_create(
-                user=auth_user,
-                **tag,  # This equals to name=tag["name"], but we use this for future proofing.
+        return ids
+
+    def _link(self, relation, links):
+        """Insert the through-table rows for (recipe id, target id) pairs at once."""
+        links = list(links)
+        if not links:
+            return
+
+        through = relation.through._meta
+        target = relation.field.m2m_reverse_field_name()  # "tag" or "ingredient"
+        recipe_ids, target_ids = zip(*links)
+        # unnest() turns two id arrays into rows, so any number of links is one
+        # statement with two parameters and no model instances to build.
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {through.db_table} (recipe_id, {target}_id)"
+                " SELECT * FROM unnest(%s::bigint[], %s::bigint[])"
+                " ON CONFLICT DO NOTHING",
+                [list(recipe_ids), list(target_ids)],
             )
-            recipe.tags.add(tag_obj)
 
-    def _get_or_create_ingredients(self, ingredients, recipe):
-        """Handle getting or creating ingredients."""
+    def _set_links(self, relation, recipe, ids):
+        """Link the recipe to exactly the ids, writing only the changed rows."""
+        target = relation.field.m2m_reverse_field_name()
+        links = relation.through.objects.filter(recipe_id=recipe.id)
+        current = set(links.values_list(f"{target}_id", flat=True))
+        ids = set(ids)
 
-        auth_user = self.context["request"].user
+        removed = current - ids
+        if removed:
+            links.filter(**{f"{target}_id__in": removed}).delete()
+        self._link(relation, [(recipe.id, pk) for pk in ids - current])
 
-        for ingredient in ingredients:
-            ingredient_obj, created = Ingredient.objects.get_or_create(
-                user=auth_user,  # created is a boolean that tells us if the object was created or not.
-                **ingredient,
-            )
-            recipe.ingredients.add(ingredient_obj)
+    def _get_or_create_tags(self, tags, recipe):
+        """Handle getting or creating tags."""
+        ids = self._get_or_create_named(Tag, tags).values()
+        self._link(Recipe.tags, [(recipe.id, pk) for pk in ids])
+
+    def _get_or_create_ingredients(self, ingredients, recipe):
+        """Handle getting or creating ingredients."""
+        ids = self._get_or_create_named(Ingredient, ingredients).values()
+        self._link(Recipe.ingredients, [(recipe.id, pk) for pk in ids])
 
     # This method lets us overried the recipe serializer.
+    # NOTE: bulk link inserts send no m2m signals; the recipe save in the same
+    # transaction is what bumps the owner's data version.
+    @transaction.atomic
     def create(self, validated_data):
         """Create a recipe."""
         tags = validated_data.pop(
@@ -77,18 +213,21 @@ class RecipeSerializer(serializers.ModelSerializer):
         self._get_or_create_ingredients(ingredients, recipe)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         """Update a recipe."""
         tags = validated_data.pop("tags", None)
         ingredients = validated_data.pop("ingredients", None)
 
+        # diff against the current links rather than clear and re-add them, so
+        # unchanged rows are neither deleted nor rewritten.
         if tags is not None:
-            instance.tags.clear()
-            self._get_or_create_tags(tags, instance)
+            ids = self._get_or_create_named(Tag, tags).values()
+            self._set_links(Recipe.tags, instance, ids)
 
         if ingredients is not None:
-            instance.ingredients.clear()
-            self._get_or_create_ingredients(ingredients, instance)
+            ids = self._get_or_create_named(Ingredient, ingredients).values()
+            self._set_links(Recipe.ingredients, instance, ids)
 
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
@@ -100,8 +239,195 @@ class RecipeSerializer(serializers.ModelSerializer):
 class RecipeDetailSerializer(RecipeSerializer):
     """Serializer for the recipe detail view."""
 
+    image_derivatives = serializers.SerializerMethodField()
+
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + [
+            "description",
+            "image",
+            "image_derivatives",
+        ]
+
+    @extend_schema_field({"type": "object", "additionalProperties": {"type": "string"}})
+    def get_image_derivatives(self, obj):
+        """Return a `srcset` of the resized copies of the image per MIME type."""
+        request = self.context.get("request")
+        srcsets = {}
+        for fmt, files in obj.image_derivatives.items():
+            candidates = []
+            for width in sorted(files, key=int):
+                url = recipe_image_storage.url(files[width])
+                if request is not None:
+                    url = request.build_absolute_uri(url)
+                candidates.append(f"{url} {width}w")
+            srcsets[IMAGE_FORMATS[fmt].mime] = ", ".join(candidates)
+
+        return srcsets
+
+
+class PantryRecipeSerializer(RecipeSerializer):
+    """Serializer for recipes ranked by how much of them a pantry covers."""
+
+    coverage = serializers.FloatField(read_only=True)
+    missing = IngredientSerializer(many=True, read_only=True)
+
     class Meta(RecipeSerializer.Meta):
-        fields = RecipeSerializer.Meta.fields + ["description", "image"]
+        fields = ["id", "title", "time_minutes", "price", "link", "coverage", "missing"]
+
+
+class SimilarRecipeSerializer(RecipeSerializer):
+    """Serializer for recipes ranked by similarity to another recipe."""
+
+    similarity = serializers.FloatField(read_only=True)
+
+    class Meta(RecipeSerializer.Meta):
+        fields = ["id", "title", "time_minutes", "price", "link", "similarity"]
+
+
+class RecipeBulkUpdateListSerializer(serializers.ListSerializer):
+    """Apply many partial recipe updates with one UPDATE per set of fields.
+
+    `instance` is the queryset of recipes the items may target. Items that
+    change the same fields share a single `UPDATE ... FROM (VALUES ...)`.
+    """
+
+    def to_internal_value(self, data):
+        """Validate the items, then check each id once against the queryset."""
+        items = super().to_internal_value(data)
+        ids = [item["id"] for item in items]
+        found = set(self.instance.filter(id__in=ids).values_list("id", flat=True))
+
+        errors, seen = [], set()
+        for pk in ids:
+            if pk not in found:
+                errors.append({"id": ["Recipe not found."]})
+            elif pk in seen:
+                errors.append({"id": ["Recipe listed more than once."]})
+            else:
+                errors.append({})
+            seen.add(pk)
+        if any(errors):
+            raise serializers.ValidationError(errors)
+
+        return items
+
+    @transaction.atomic
+    def update(self, instance, validated_data):
+        """Write the updates and return the ids of the updated recipes."""
+        groups = {}
+        for item in validated_data:
+            fields = tuple(sorted(name for name in item if name != "id"))
+            groups.setdefault(fields, []).append(item)
+
+        user = self.context["request"].user
+        for fields, items in groups.items():
+            if fields:
+                self._update_rows(user, fields, items)
+
+        get_user_model().objects.bump_data_version(user.id)
+        return [item["id"] for item in validated_data]
+
+    def _update_rows(self, user, fields, items):
+        """Run one `UPDATE ... FROM (VALUES ...)` setting `fields` per item."""
+        qn = connection.ops.quote_name
+        model_fields = [Recipe._meta.get_field(name) for name in fields]
+        columns = ", ".join(qn(field.column) for field in model_fields)
+        assignments = ", ".join(
+            f"{qn(field.column)} = v.{qn(field.column)}::{field.db_type(connection)}"
+            for field in model_fields
+        )
+        row = f"({', '.join(['%s'] * (len(fields) + 1))})"
+
+        params = []
+        for item in items:
+            params.append(item["id"])
+            params.extend(
+                field.get_db_prep_save(item[field.name], connection)
+                for field in model_fields
+            )
+        params.append(user.id)
+
+        table = qn(Recipe._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {table} SET {assignments}"
+                f" FROM (VALUES {', '.join([row] * len(items))}) AS v (id, {columns})"
+                f" WHERE {table}.id = v.id::bigint AND {table}.user_id = %s",
+                params,
+            )
+
+
+class RecipeBulkUpdateSerializer(serializers.ModelSerializer):
+    """Serializer for one item of a bulk partial update."""
+
+    id = serializers.IntegerField()  # picks the recipe to update.
+
+    class Meta:
+        model = Recipe
+        fields = ["id", "title", "time_minutes", "price", "link", "description"]
+        list_serializer_class = RecipeBulkUpdateListSerializer
+
+    def validate(self, attrs):
+        """Require the id even though the other fields are partial."""
+        if "id" not in attrs:
+            raise serializers.ValidationError({"id": ["This field is required."]})
+
+        return attrs
+
+
+class RecipeRowsSerializer:
+    """Fast read path rendering `values()` rows exactly like RecipeSerializer.
+
+    Columns are copied straight from the rows and each nested relation is a
+    single query for the whole page, skipping DRF's per-field machinery.
+    """
+
+    def __init__(self, rows, fields):
+        self.rows = rows
+        self.fields = fields
+
+    @property
+    def data(self):
+        declared = RecipeSerializer._declared_fields
+        related = {
+            name: self._fetch_related(name, declared[name].child.Meta.fields)
+            for name in self.fields
+            if name in declared
+        }
+
+        data = []
+        for row in self.rows:
+            item = {}
+            for name in self.fields:
+                if name in related:
+                    item[name] = related[name].get(row["id"], [])
+                elif name == "price":
+                    # numeric(5, 2) comes back with its scale, as DRF renders it.
+                    item[name] = format(row[name], "f")
+                else:
+                    item[name] = row[name]
+            data.append(item)
+
+        return data
+
+    def _fetch_related(self, name, fields):
+        """Return {recipe id: [nested dicts]} for the rows, in one query."""
+        relation = getattr(Recipe, name)
+        target = relation.field.m2m_reverse_field_name()  # "tag" or "ingredient"
+        columns = [f"{target}_id" if f == "id" else f"{target}__{f}" for f in fields]
+        links = (
+            relation.through.objects.filter(
+                recipe_id__in=[row["id"] for row in self.rows]
+            )
+            .order_by("recipe_id", f"{target}_id")
+            .values_list("recipe_id", *columns)
+        )
+
+        related = {}
+        for recipe_id, *values in links:
+            related.setdefault(recipe_id, []).append(dict(zip(fields, values)))
+
+        return related
 
 
 class RecipeImageSerializer(serializers.ModelSerializer):
@@ -116,3 +442,35 @@ class RecipeImageSerializer(serializers.ModelSerializer):
                 "required": True,
             }
         }
+
+    def update(self, instance, validated_data):
+        """Replace the image; its resized copies are made after the commit."""
+        replace_image(instance, validated_data["image"])
+        return instance
+
+
+class ImageUploadSerializer(serializers.ModelSerializer):
+    """Serializer for resumable recipe image uploads."""
+
+    class Meta:
+        model = ImageUpload
+        fields = ["id", "filename", "size", "offset"]
+        read_only_fields = ["id", "offset"]
+        extra_kwargs = {"size": {"min_value": 1}}
+
+    def validate_filename(self, value):
+        """Require the extension of an image format Pillow reads."""
+        extension = os.path.splitext(value)[1].lower()
+        if extension not in Image.registered_extensions():
+            raise serializers.ValidationError("Not an image file name.")
+
+        return value
+
+    def validate_size(self, value):
+        """Reject images larger than the uploads accept."""
+        if value > settings.RECIPE_UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(
+                f"Ensure this value is at most {settings.RECIPE_UPLOAD_MAX_SIZE}."
+            )
+
+        return value
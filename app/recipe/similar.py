@@ -0,0 +1,63 @@
+"""
+Similar recipes for recipe APIs
+"""
+from django.db import connection
+
+from core.models import Recipe
+
+SIMILAR_COLUMNS = ["id", "title", "time_minutes", "price", "link"]
+
+
+def similar_recipes(user, recipe, limit, exact=False):
+    """Return the user's recipes ranked by Jaccard similarity to `recipe`.
+
+    Similarity is taken over the union of the tag and ingredient sets. Only
+    the recipes sharing a band hash with `recipe` are scored, found through
+    the (user, lsh_bands) index; MinHash makes a recipe likelier to share a
+    band the more similar it is. `exact` scores every recipe sharing a tag or
+    an ingredient instead, which is what the bands approximate.
+    """
+    tags = Recipe.tags.through._meta.db_table
+    ingredients = Recipe.ingredients.through._meta.db_table
+    recipes = Recipe._meta.db_table
+    columns = ", ".join(f"r.{name}" for name in SIMILAR_COLUMNS)
+    # tags and ingredients have their own id sequences, so keep them apart.
+    features = (
+        f"SELECT tag_id * 2 AS f FROM {tags} WHERE recipe_id = {{recipe}}"
+        f" UNION ALL SELECT ingredient_id * 2 + 1 FROM {ingredients}"
+        " WHERE recipe_id = {recipe}"
+    )
+    params = [recipe.id, recipe.id]
+    if exact:
+        candidates = (
+            f"SELECT recipe_id AS id FROM {tags} WHERE tag_id IN"
+            f" (SELECT tag_id FROM {tags} WHERE recipe_id = %s)"
+            f" UNION SELECT recipe_id FROM {ingredients} WHERE ingredient_id IN"
+            f" (SELECT ingredient_id FROM {ingredients} WHERE recipe_id = %s)"
+        )
+        params += [recipe.id, recipe.id]
+    else:
+        candidates = f"SELECT id FROM {recipes} WHERE user_id = %s AND lsh_bands && %s"
+        params += [user.id, recipe.lsh_bands or []]
+    params += [recipe.id, user.id, limit]
+
+    sql = (
+        f"WITH target AS ({features.format(recipe='%s')}),"
+        f" candidates AS ({candidates}),"
+        # the links of one candidate at a time, matched against the target's:
+        # the planner cannot tell how few candidates there are, and would
+        # rather hash every link of the table.
+        " scored AS (SELECT c.id, count(t.f)::float8"
+        " / (count(*) + (SELECT count(*) FROM target) - count(t.f))"
+        " AS similarity FROM candidates c"
+        f" CROSS JOIN LATERAL ({features.format(recipe='c.id')}) cf"
+        " LEFT JOIN target t USING (f)"
+        " WHERE c.id <> %s GROUP BY c.id HAVING count(t.f) > 0)"
+        f" SELECT {columns}, s.similarity FROM scored s"
+        f" JOIN {recipes} r ON r.id = s.id WHERE r.user_id = %s"
+        " ORDER BY s.similarity DESC, r.id DESC LIMIT %s"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        names = SIMILAR_COLUMNS + ["similarity"]
+        return [dict(zip(names, row)) for row in cursor.fetchall()]
@@ -0,0 +1,22 @@
+"""
+Helpers shared by the recipe API tests.
+"""
+from decimal import Decimal
+
+from core.models import Ingredient, Recipe, Tag
+
+
+def create_recipe(user, title, tags=(), ingredients=()):
+    """Create a recipe linked to the user's tags and ingredients of those names."""
+    recipe = Recipe.objects.create(user=user, title=title, price=Decimal("1.00"))
+    recipe.tags.add(
+        *(Tag.objects.get_or_create(user=user, name=name)[0] for name in tags)
+    )
+    recipe.ingredients.add(
+        *(
+            Ingredient.objects.get_or_create(user=user, name=name)[0]
+            for name in ingredients
+        )
+    )
+
+    return recipe
@@ -0,0 +1,186 @@
+"""
+Tests for the recipe export API and command.
+"""
+import csv
+import gc
+import io
+import json
+import tracemalloc
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe, Tag
+
+from recipe.export import export_recipes
+
+EXPORT_URL = reverse("recipe:recipe-export")
+
+
+def create_user(email="user@example.com", password="testpass123"):
+    """Create and return a new user."""
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+def create_recipes(user, count, start=0):
+    """Bulk create `count` recipes carrying two tags and an ingredient each."""
+    recipes = Recipe.objects.bulk_create(
+        Recipe(
+            user=user,
+            title=f"Recipe {i}",
+            time_minutes=i % 60,
+            price=Decimal("4.50"),
+            description="Sample description",
+        )
+        for i in range(start, start + count)
+    )
+    tags = [
+        Tag.objects.get_or_create(user=user, name=name)[0]
+        for name in ("Dinner", "Vegan")
+    ]
+    salt = Ingredient.objects.get_or_create(user=user, name="Salt")[0]
+    Recipe.tags.through.objects.bulk_create(
+        Recipe.tags.through(recipe=recipe, tag=tag)
+        for recipe in recipes
+        for tag in tags
+    )
+    Recipe.ingredients.through.objects.bulk_create(
+        Recipe.ingredients.through(recipe=recipe, ingredient=salt)
+        for recipe in recipes
+    )
+
+    return recipes
+
+
+class PrivateExportApiTests(TestCase):
+    """Test the authenticated recipe export."""
+
+    def setUp(self):
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _lines(self, response):
+        """Join the streamed chunks of a response and split its lines."""
+        return b"".join(response.streaming_content).decode().splitlines()
+
+    def test_export_recipes_ndjson(self):
+        """Test exporting the user's recipes as NDJSON, newest first."""
+        print("Testing export recipes as NDJSON...")
+        recipes = create_recipes(self.user, 3)
+        create_recipes(create_user(email="other@example.com"), 2)
+
+        response = self.client.get(EXPORT_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        rows = [json.loads(line) for line in self._lines(response)]
+        self.assertEqual([row["id"] for row in rows], [r.id for r in recipes[::-1]])
+        self.assertEqual(rows[0]["title"], "Recipe 2")
+        self.assertEqual(rows[0]["price"], "4.50")
+        self.assertEqual(rows[0]["tags"], ["Dinner", "Vegan"])
+        self.assertEqual(rows[0]["ingredients"], ["Salt"])
+
+        print("Test export recipes as NDJSON: OK")
+
+    def test_export_recipes_csv(self):
+        """Test exporting the user's recipes as CSV with a header."""
+        print("Testing export recipes as CSV...")
+        create_recipes(self.user, 2)
+
+        response = self.client.get(EXPORT_URL, {"as": "csv"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "text/csv")
+        rows = list(csv.DictReader(self._lines(response)))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0]["title"], "Recipe 1")
+        self.assertEqual(rows[0]["tags"], "Dinner;Vegan")
+
+        print("Test export recipes as CSV: OK")
+
+    def test_export_recipes_filtered(self):
+        """Test the export honours the list filters."""
+        print("Testing export recipes filtered...")
+        create_recipes(self.user, 2)
+        recipe = Recipe.objects.create(
+            user=self.user, title="Plain", price=Decimal("1.00")
+        )
+        lunch = Tag.objects.create(user=self.user, name="Lunch")
+        recipe.tags.add(lunch)
+
+        response = self.client.get(EXPORT_URL, {"tags": lunch.id})
+
+        rows = [json.loads(line) for line in self._lines(response)]
+        self.assertEqual([row["id"] for row in rows], [recipe.id])
+        self.assertEqual(rows[0]["ingredients"], [])
+
+        print("Test export recipes filtered: OK")
+
+    def test_export_recipes_invalid_format_error(self):
+        """Test an unknown export format is rejected."""
+        print("Testing export recipes invalid format...")
+
+        response = self.client.get(EXPORT_URL, {"as": "xml"})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        print("Test export recipes invalid format: OK")
+
+
+class ExportCommandTests(TestCase):
+    """Test the export_recipes command."""
+
+    def setUp(self):
+        self.user = create_user()
+
+    def test_export_recipes_command(self):
+        """Test the command streams the user's recipes to stdout."""
+        print("Testing export recipes command...")
+        create_recipes(self.user, 5)
+        out = io.StringIO()
+
+        call_command("export_recipes", self.user.email, "--chunk-size=2", stdout=out)
+
+        rows = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual(len(rows), 5)
+        self.assertTrue(all(row["tags"] == ["Dinner", "Vegan"] for row in rows))
+
+        print("Test export recipes command: OK")
+
+    def _export_peak(self, chunk_size):
+        """Return the peak traced memory of exporting the user's recipes."""
+        queryset = Recipe.objects.filter(user=self.user).order_by("-id")
+        # collect first and not during the export: a full collection empties
+        # the interpreter's free lists, and refilling them would be counted
+        # whenever one happened to start while the export runs.
+        gc.collect()
+        gc.disable()
+        tracemalloc.start()
+        try:
+            for _ in export_recipes(queryset, "ndjson", chunk_size):
+                pass
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+            gc.enable()
+
+    def test_export_memory_flat(self):
+        """Test export memory follows the chunk size, not the library size."""
+        print("Testing export memory stays flat...")
+        create_recipes(self.user, 500)
+        self._export_peak(100)  # warm up lazily built state.
+        small_peak = self._export_peak(100)
+
+        create_recipes(self.user, 4500, start=500)
+        large_peak = self._export_peak(100)
+
+        self.assertLess(large_peak, small_peak * 1.5)
+
+        print("Test export memory stays flat: OK")
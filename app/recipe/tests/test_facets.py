@@ -0,0 +1,147 @@
+"""
+Tests for the recipe facets API.
+"""
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Tag
+from recipe.tests.helpers import create_recipe
+
+FACETS_URL = reverse("recipe:recipe-facets")
+
+
+def create_user(email="user@example.com", password="testpass123"):
+    """Create and return a new user."""
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+def facet_counts(facets):
+    """Return the [(name, count)] of a tags or ingredients facet."""
+    return [(item["name"], item["count"]) for item in facets]
+
+
+class PrivateFacetsApiTests(TestCase):
+    """Test the authenticated recipe facets."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        create_recipe(self.user, "Lemon chicken", ["Dinner", "Quick"], ["Lemon"])
+        create_recipe(self.user, "Lemon tart", ["Dessert"], ["Lemon", "Butter"])
+        create_recipe(self.user, "Chicken curry", ["Dinner"], ["Rice"])
+        create_recipe(self.user, "Plain rice", [], ["Rice"])
+        create_recipe(create_user(email="other@example.com"), "Soup", ["Dinner"])
+
+    def test_facets_unfiltered(self):
+        """Test the counts over all of the user's recipes, most used first."""
+        print("Testing facets unfiltered...")
+
+        with self.assertNumQueries(2):  # the data version and the facets.
+            response = self.client.get(FACETS_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 4)
+        self.assertEqual(
+            facet_counts(response.data["tags"]),
+            [("Dinner", 2), ("Dessert", 1), ("Quick", 1)],
+        )
+        self.assertEqual(
+            facet_counts(response.data["ingredients"]),
+            [("Lemon", 2), ("Rice", 2), ("Butter", 1)],
+        )
+
+        print("Test facets unfiltered: OK")
+
+    def test_facets_filtered_by_tags(self):
+        """Test the counts follow the tag filter of the list."""
+        print("Testing facets filtered by tags...")
+        dinner = Tag.objects.get(user=self.user, name="Dinner")
+
+        with self.assertNumQueries(2):
+            response = self.client.get(FACETS_URL, {"tags": dinner.id})
+
+        self.assertEqual(response.data["count"], 2)
+        self.assertEqual(
+            facet_counts(response.data["tags"]), [("Dinner", 2), ("Quick", 1)]
+        )
+        self.assertEqual(
+            facet_counts(response.data["ingredients"]), [("Lemon", 1), ("Rice", 1)]
+        )
+
+        print("Test facets filtered by tags: OK")
+
+    def test_facets_filtered_by_search_and_ingredients(self):
+        """Test the search and ingredient filters narrow the counts too."""
+        print("Testing facets filtered by search and ingredients...")
+        lemon = Ingredient.objects.get(user=self.user, name="Lemon")
+
+        by_search = self.client.get(FACETS_URL, {"search": "chicken"})
+        by_ingredient = self.client.get(FACETS_URL, {"ingredients": lemon.id})
+
+        self.assertEqual(by_search.data["count"], 2)
+        self.assertEqual(
+            facet_counts(by_search.data["ingredients"]), [("Lemon", 1), ("Rice", 1)]
+        )
+        self.assertEqual(by_ingredient.data["count"], 2)
+        self.assertEqual(
+            facet_counts(by_ingredient.data["tags"]),
+            [("Dessert", 1), ("Dinner", 1), ("Quick", 1)],
+        )
+
+        print("Test facets filtered by search and ingredients: OK")
+
+    def test_facets_limit(self):
+        """Test limit caps the tags and ingredients, not the recipe count."""
+        print("Testing facets limit...")
+
+        response = self.client.get(FACETS_URL, {"limit": 1})
+
+        self.assertEqual(response.data["count"], 4)
+        self.assertEqual(facet_counts(response.data["tags"]), [("Dinner", 2)])
+        self.assertEqual(len(response.data["ingredients"]), 1)
+
+        print("Test facets limit: OK")
+
+    def test_facets_invalid_limit_error(self):
+        """Test a limit that is not an integer is rejected."""
+        print("Testing facets invalid limit...")
+
+        response = self.client.get(FACETS_URL, {"limit": "many"})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        print("Test facets invalid limit: OK")
+
+    def test_facets_cached_until_data_changes(self):
+        """Test a repeated request is served from the cache until a write."""
+        print("Testing facets cached until the data changes...")
+        self.client.get(FACETS_URL)
+
+        cached = self.client.get(FACETS_URL)
+        create_recipe(self.user, "Lemon water", [], ["Lemon"])
+        fresh = self.client.get(FACETS_URL)
+
+        self.assertEqual(cached["X-Cache"], "HIT")
+        self.assertEqual(fresh["X-Cache"], "MISS")
+        self.assertEqual(fresh.data["count"], 5)
+
+        print("Test facets cached until the data changes: OK")
+
+    def test_facets_not_modified(self):
+        """Test a client holding the current ETag gets a 304."""
+        print("Testing facets not modified...")
+        etag = self.client.get(FACETS_URL)["ETag"]
+
+        response = self.client.get(FACETS_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        print("Test facets not modified: OK")
@@ -0,0 +1,301 @@
+"""
+Tests for the resized copies of recipe images.
+"""
+import io
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+from unittest.mock import patch
+
+from PIL import Image
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import ImageBlob, Recipe
+from recipe.images import record_derivatives, shutdown_pool
+
+EXIF_ORIENTATION = 0x0112
+
+
+def image_upload_url(recipe_id):
+    """Create and return an image upload URL."""
+    return reverse("recipe:recipe-upload-image", args=[recipe_id])
+
+
+def detail_url(recipe_id):
+    """Create and return a recipe detail URL."""
+    return reverse("recipe:recipe-detail", args=[recipe_id])
+
+
+def bulk_delete_url(*recipe_ids):
+    """Create and return the URL bulk deleting recipes."""
+    ids = ",".join(str(recipe_id) for recipe_id in recipe_ids)
+    return f"{reverse('recipe:recipe-bulk')}?ids={ids}"
+
+
+def create_user(email="user@example.com", password="testpass123"):
+    """Create and return a new user."""
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+def jpeg_file(size, orientation=None):
+    """Return an in-memory JPEG of the size, with an EXIF orientation if given."""
+    image = Image.new("RGB", size, (200, 120, 40))
+    exif = Image.Exif()
+    if orientation is not None:
+        exif[EXIF_ORIENTATION] = orientation
+
+    upload = io.BytesIO()
+    image.save(upload, format="JPEG", exif=exif.tobytes())
+    upload.name = "photo.jpg"
+    upload.seek(0)
+    return upload
+
+
+class MediaRootMixin:
+    """Upload into a temporary MEDIA_ROOT, removed after each test."""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.media_root = tempfile.mkdtemp()
+        media = override_settings(
+            MEDIA_ROOT=self.media_root, RECIPE_IMAGE_FORMATS=("jpeg",)
+        )
+        media.enable()
+        self.addCleanup(media.disable)
+        self.addCleanup(shutil.rmtree, self.media_root)
+
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user, title="Soup", price=Decimal("1.00")
+        )
+
+    def derivative_sizes(self, recipe):
+        """Return {width: (width, height)} of the recipe's JPEG copies on disk."""
+        sizes = {}
+        for width, name in recipe.image_derivatives["jpeg"].items():
+            with Image.open(os.path.join(self.media_root, name)) as image:
+                sizes[int(width)] = image.size
+
+        return sizes
+
+
+@override_settings(RECIPE_IMAGE_WORKERS=0)
+class InlineImageDerivativesTests(MediaRootMixin, TestCase):
+    """Test the copies made in the request, once the upload commits."""
+
+    def upload(self, upload):
+        """Upload the image and run the callbacks of its commit."""
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                image_upload_url(self.recipe.id), {"image": upload}
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.recipe.refresh_from_db()
+
+    def test_upload_makes_srcset(self):
+        """Test the detail lists a srcset of copies no wider than the image."""
+        print("Testing upload makes srcset...")
+        self.upload(jpeg_file((1000, 600)))
+
+        response = self.client.get(detail_url(self.recipe.id))
+
+        self.assertEqual(
+            self.derivative_sizes(self.recipe),
+            {320: (320, 192), 640: (640, 384), 1000: (1000, 600)},
+        )
+        stem = os.path.splitext(self.recipe.image.url)[0]
+        self.assertEqual(
+            response.data["image_derivatives"],
+            {
+                "image/jpeg": ", ".join(
+                    f"http://testserver{stem}-{width}w.jpg {width}w"
+                    for width in (320, 640, 1000)
+                )
+            },
+        )
+
+        print("Test upload makes srcset: OK")
+
+    def test_upload_follows_exif_orientation(self):
+        """Test copies of a rotated photo are sized the way it is shown."""
+        print("Testing upload follows exif orientation...")
+        self.upload(jpeg_file((600, 400), orientation=6))
+
+        self.assertEqual(
+            self.derivative_sizes(self.recipe), {320: (320, 480), 400: (400, 600)}
+        )
+
+        print("Test upload follows exif orientation: OK")
+
+    def test_new_upload_replaces_derivatives(self):
+        """Test copies of a replaced image are neither kept nor recorded."""
+        print("Testing new upload replaces derivatives...")
+        self.upload(jpeg_file((400, 400)))
+        first = self.recipe.image.name
+
+        response = self.client.post(
+            image_upload_url(self.recipe.id), {"image": jpeg_file((800, 800))}
+        )
+        self.recipe.refresh_from_db()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.recipe.image_derivatives, {})
+
+        recorded = record_derivatives(
+            self.recipe.id, self.user.id, first, {"jpeg": {"320": "stale.jpg"}}
+        )
+        self.recipe.refresh_from_db()
+
+        self.assertFalse(recorded)
+        self.assertEqual(self.recipe.image_derivatives, {})
+
+        print("Test new upload replaces derivatives: OK")
+
+    def test_recipe_update_keeps_derivatives(self):
+        """Test saving other fields leaves the recorded copies alone."""
+        print("Testing recipe update keeps derivatives...")
+        self.upload(jpeg_file((400, 400)))
+        derivatives = self.recipe.image_derivatives
+
+        response = self.client.patch(detail_url(self.recipe.id), {"title": "Stew"})
+        self.recipe.refresh_from_db()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.recipe.image_derivatives, derivatives)
+
+        print("Test recipe update keeps derivatives: OK")
+
+    def test_duplicate_upload_reuses_derivatives(self):
+        """Test the same image on another recipe reuses its blob and copies."""
+        print("Testing duplicate upload reuses derivatives...")
+        self.upload(jpeg_file((500, 300)))
+        other = Recipe.objects.create(user=self.user, title="Stew", price=1)
+
+        with patch("recipe.images.downscale") as downscale:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(
+                    image_upload_url(other.id), {"image": jpeg_file((500, 300))}
+                )
+        other.refresh_from_db()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        downscale.assert_not_called()
+        self.assertEqual(other.image.name, self.recipe.image.name)
+        self.assertEqual(other.image_derivatives, self.recipe.image_derivatives)
+
+        print("Test duplicate upload reuses derivatives: OK")
+
+    def test_bulk_delete_releases_image(self):
+        """Test bulk deleting every use of an image deletes it and its copies."""
+        print("Testing bulk delete releases image...")
+        self.upload(jpeg_file((400, 400)))
+        other = Recipe.objects.create(user=self.user, title="Stew", price=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                image_upload_url(other.id), {"image": jpeg_file((400, 400))}
+            )
+        name = self.recipe.image.name
+        copies = self.recipe.image_derivatives["jpeg"].values()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(bulk_delete_url(self.recipe.id, other.id))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(ImageBlob.objects.exists())
+        for stored in [name, *copies]:
+            self.assertFalse(os.path.exists(os.path.join(self.media_root, stored)))
+
+        print("Test bulk delete releases image: OK")
+
+    def test_replaced_image_released(self):
+        """Test replacing the only use of an image deletes it and its copies."""
+        print("Testing replaced image released...")
+        self.upload(jpeg_file((400, 400)))
+        first = self.recipe.image.name
+        copies = self.recipe.image_derivatives["jpeg"].values()
+
+        self.upload(jpeg_file((800, 800)))
+
+        self.assertNotEqual(self.recipe.image.name, first)
+        for name in [first, *copies]:
+            self.assertFalse(os.path.exists(os.path.join(self.media_root, name)))
+
+        print("Test replaced image released: OK")
+
+    def test_command_backfills_missing_derivatives(self):
+        """Test the command makes the copies only of images still without."""
+        print("Testing command backfills missing derivatives...")
+        response = self.client.post(  # its commit callbacks never run.
+            image_upload_url(self.recipe.id), {"image": jpeg_file((500, 300))}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        stdout = io.StringIO()
+
+        call_command("make_image_derivatives", workers=1, stdout=stdout)
+        call_command("make_image_derivatives", workers=1, stdout=stdout)
+        self.recipe.refresh_from_db()
+
+        self.assertEqual(
+            self.derivative_sizes(self.recipe), {320: (320, 192), 500: (500, 300)}
+        )
+        self.assertIn("Made the copies of 1 images", stdout.getvalue())
+        self.assertIn("Made the copies of 0 images", stdout.getvalue())
+
+        print("Test command backfills missing derivatives: OK")
+
+    def test_command_all_remakes_derivatives(self):
+        """Test --all remakes the copies that are there already."""
+        print("Testing command all remakes derivatives...")
+        self.upload(jpeg_file((500, 300)))
+        stale = os.path.join(
+            self.media_root, self.recipe.image_derivatives["jpeg"]["320"]
+        )
+        with open(stale, "wb") as copy:
+            copy.write(b"stale")
+
+        call_command("make_image_derivatives", "--all", workers=1, stdout=io.StringIO())
+        self.recipe.refresh_from_db()
+
+        self.assertEqual(
+            self.derivative_sizes(self.recipe), {320: (320, 192), 500: (500, 300)}
+        )
+
+        print("Test command all remakes derivatives: OK")
+
+
+@override_settings(RECIPE_IMAGE_WORKERS=1)
+class PooledImageDerivativesTests(MediaRootMixin, TransactionTestCase):
+    """Test the copies made by the process pool, off the request."""
+
+    def test_upload_makes_derivatives_in_pool(self):
+        """Test the pool's copies are recorded and bump the data version."""
+        print("Testing upload makes derivatives in pool...")
+        response = self.client.post(
+            image_upload_url(self.recipe.id), {"image": jpeg_file((700, 500))}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        version = get_user_model().objects.get(id=self.user.id).data_version
+
+        shutdown_pool()  # waits for the job and its recording.
+        self.recipe.refresh_from_db()
+
+        self.assertEqual(
+            self.derivative_sizes(self.recipe),
+            {320: (320, 229), 640: (640, 457), 700: (700, 500)},
+        )
+        self.assertGreater(
+            get_user_model().objects.get(id=self.user.id).data_version, version
+        )
+
+        print("Test upload makes derivatives in pool: OK")
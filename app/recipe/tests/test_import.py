@@ -0,0 +1,151 @@
+"""
+Tests for the recipe import command.
+"""
+import io
+import json
+import os
+import tempfile
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from core.models import Ingredient, Recipe, Tag
+
+
+def create_user(email="user@example.com", password="testpass123"):
+    """Create and return a new user."""
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+class ImportCommandTests(TestCase):
+    """Test the import_recipes command."""
+
+    def setUp(self):
+        self.user = create_user()
+
+    def _import(self, content, suffix=".ndjson", *args):
+        """Write the content to a file, import it and return (stdout, stderr)."""
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        self.addCleanup(os.remove, path)
+        with os.fdopen(fd, "w") as source:
+            source.write(content)
+
+        out, err = io.StringIO(), io.StringIO()
+        call_command(
+            "import_recipes", self.user.email, path, *args, stdout=out, stderr=err
+        )
+        return out.getvalue(), err.getvalue()
+
+    def test_import_recipes_ndjson(self):
+        """Test importing recipes and linking tags and ingredients by name."""
+        print("Testing import recipes from NDJSON...")
+        dinner = Tag.objects.create(user=self.user, name="Dinner")
+        other_user = create_user(email="other@example.com")
+        Tag.objects.create(user=other_user, name="Vegan")
+        rows = [
+            {
+                "title": "Lentil soup",
+                "description": "Hearty\tand\nwarm",
+                "time_minutes": 0,
+                "price": "4.50",
+                "tags": ["Dinner", "Vegan"],
+                "ingredients": ["Lentils", "Salt"],
+            },
+            {
+                "title": "Salted caramel",
+                "price": "2.00",
+                "tags": [{"name": "Vegan"}],
+                "ingredients": ["Salt", "Salt"],
+            },
+        ]
+        content = "".join(json.dumps(row) + "\n" for row in rows)
+        version = get_user_model().objects.get_data_version(self.user.pk)
+
+        out, err = self._import(content, ".ndjson", "--chunk-size=1")
+
+        self.assertIn("rows/sec", out)
+        self.assertEqual(err, "")
+        self.assertGreater(
+            get_user_model().objects.get_data_version(self.user.pk), version
+        )
+        soup = Recipe.objects.get(user=self.user, title="Lentil soup")
+        self.assertEqual(soup.description, "Hearty\tand\nwarm")
+        self.assertEqual((soup.time_minutes, soup.price), (0, Decimal("4.50")))
+        self.assertIsNone(Recipe.objects.get(title="Salted caramel").link)
+        self.assertEqual(
+            set(soup.tags.values_list("id", flat=True)),
+            {dinner.id, Tag.objects.get(user=self.user, name="Vegan").id},
+        )
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(Ingredient.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(Recipe.ingredients.through.objects.count(), 3)
+        self.assertIn(soup, Recipe.objects.filter(search_vector="lentil"))
+
+        print("Test import recipes from NDJSON: OK")
+
+    def test_import_recipes_csv(self):
+        """Test importing recipes from CSV in several chunks."""
+        print("Testing import recipes from CSV...")
+        lines = ["title,description,time_minutes,price,link,tags,ingredients"]
+        lines += [f"Recipe {i},,{i},1.25,,Lunch;Quick,Bread" for i in range(5)]
+
+        self._import("\n".join(lines) + "\n", ".csv", "--chunk-size=2")
+
+        recipes = Recipe.objects.filter(user=self.user)
+        self.assertEqual(recipes.count(), 5)
+        self.assertIsNone(recipes.get(title="Recipe 3").description)
+        self.assertEqual(Recipe.tags.through.objects.count(), 10)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+
+        print("Test import recipes from CSV: OK")
+
+    def test_import_recipes_skips_invalid_rows(self):
+        """Test invalid rows are skipped and reported by line."""
+        print("Testing import recipes skips invalid rows...")
+        content = "\n".join(
+            [
+                json.dumps({"title": "Good", "price": "1.00"}),
+                json.dumps({"price": "1.00"}),
+                json.dumps({"title": "Pricey", "price": "100000"}),
+                "{not json",
+                json.dumps({"title": "Long tag", "price": "1.00", "tags": ["x" * 300]}),
+                json.dumps({"title": "Tag text", "price": "1.00", "tags": "vegan"}),
+                json.dumps({"title": "No name", "price": "1.00", "tags": [{"a": 1}]}),
+            ]
+        )
+
+        out, err = self._import(content)
+
+        self.assertEqual(
+            list(Recipe.objects.values_list("title", flat=True)), ["Good"]
+        )
+        for number in (2, 3, 4, 5, 6, 7):
+            self.assertIn(f"line {number}:", err)
+        self.assertIn("skipped 6", out)
+        self.assertFalse(Tag.objects.exists())
+
+        print("Test import recipes skips invalid rows: OK")
+
+    def test_import_recipes_round_trips_export(self):
+        """Test an export imports into another user's identical library."""
+        print("Testing import recipes round trips the export...")
+        recipe = Recipe.objects.create(
+            user=self.user, title="Curry", price=Decimal("8.00"), time_minutes=30
+        )
+        recipe.tags.add(Tag.objects.create(user=self.user, name="Spicy"))
+        exported = io.StringIO()
+        call_command("export_recipes", self.user.email, stdout=exported)
+        self.user = create_user(email="copy@example.com")
+
+        self._import(exported.getvalue())
+
+        copy = Recipe.objects.get(user=self.user)
+        self.assertEqual(
+            (copy.title, copy.price, copy.time_minutes),
+            (recipe.title, recipe.price, recipe.time_minutes),
+        )
+        self.assertEqual(list(copy.tags.values_list("name", flat=True)), ["Spicy"])
+
+        print("Test import recipes round trips the export: OK")
@@ -65,7 +65,7 @@ class PrivateIngredientsApiTests(TestCase):
         serializer = IngredientSerializer(ingredients, many=True)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data, serializer.data)
+        self.assertEqual(response.data["results"], serializer.data)
 
         print("Test retrieving ingredients: OK")
 
@@ -84,9 +84,9 @@ class PrivateIngredientsApiTests(TestCase):
         response = self.client.get(INGREDIENTS_URL)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]["name"], ingredient.name)
-        self.assertEqual(response.data[0]["id"], ingredient.id)
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertEqual(response.data["results"][0]["name"], ingredient.name)
+        self.assertEqual(response.data["results"][0]["id"], ingredient.id)
 
         print("Test that ingredients for the authenticated user are returned: OK")
 
@@ -141,8 +141,8 @@ class PrivateIngredientsApiTests(TestCase):
         serializer1 = IngredientSerializer(ingredient1)
         serializer2 = IngredientSerializer(ingredient2)
 
-        self.assertIn(serializer1.data, response.data)
-        self.assertNotIn(serializer2.data, response.data)
+        self.assertIn(serializer1.data, response.data["results"])
+        self.assertNotIn(serializer2.data, response.data["results"])
 
         print("Test listing ingredients by those assigned to recipes: OK")
 
@@ -171,6 +171,62 @@ class PrivateIngredientsApiTests(TestCase):
 
         response = self.client.get(INGREDIENTS_URL, {"assigned_only": 1})
 
-        self.assertEqual(len(response.data), 1)
+        self.assertEqual(len(response.data["results"]), 1)
 
         print("Test filtering ingredients by assigned returns unique items: OK")
+
+    def test_ingredients_with_counts_by_usage(self):
+        """Test ingredients listed with their usage, most used first"""
+
+        print("Test ingredients with counts by usage.")
+        salt = Ingredient.objects.create(user=self.user, name="Salt")
+        eggs = Ingredient.objects.create(user=self.user, name="Eggs")
+        Ingredient.objects.create(user=self.user, name="Kale")
+        for title in ["Omelette", "Fried eggs"]:
+            recipe = Recipe.objects.create(
+                title=title, price=Decimal("2.00"), user=self.user
+            )
+            recipe.ingredients.add(salt, eggs)
+        crisps = Recipe.objects.create(
+            title="Crisps", price=Decimal("1.00"), user=self.user
+        )
+        crisps.ingredients.add(salt)
+
+        response = self.client.get(INGREDIENTS_URL, {"ordering": "-recipe_count"})
+
+        rows = [(i["name"], i["recipe_count"]) for i in response.data["results"]]
+        self.assertEqual(rows, [("Salt", 3), ("Eggs", 2), ("Kale", 0)])
+
+        print("Test ingredients with counts by usage: OK")
+
+    def test_typeahead_ingredients(self):
+        """Test typeahead returns prefix and fuzzy matches, best first"""
+
+        print("Test typeahead ingredients.")
+        tomato = Ingredient.objects.create(user=self.user, name="Tomato")
+        cherry = Ingredient.objects.create(user=self.user, name="Cherry tomatoes")
+        Ingredient.objects.create(user=self.user, name="Salt")
+        other_user = create_user(email="user2@example.com")
+        Ingredient.objects.create(user=other_user, name="Tomato")
+
+        response = self.client.get(INGREDIENTS_URL, {"q": "tomatoe"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        ids = [ingredient["id"] for ingredient in response.data]
+        self.assertEqual(ids, [cherry.id, tomato.id])
+
+        print("Test typeahead ingredients: OK")
+
+    def test_typeahead_ingredients_limit(self):
+        """Test typeahead returns at most `limit` matches"""
+
+        print("Test typeahead ingredients limit.")
+        for name in ["Garlic", "Garlic powder", "Garlic salt"]:
+            Ingredient.objects.create(user=self.user, name=name)
+
+        response = self.client.get(INGREDIENTS_URL, {"q": "garl", "limit": 2})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 2)
+
+        print("Test typeahead ingredients limit: OK")
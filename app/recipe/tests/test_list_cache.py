@@ -0,0 +1,169 @@
+"""
+Tests for the list response cache.
+"""
+from decimal import Decimal
+from io import StringIO
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingredient
+
+RECIPES_URL = reverse("recipe:recipe-list")
+TAGS_URL = reverse("recipe:tag-list")
+INGREDIENTS_URL = reverse("recipe:ingredient-list")
+
+
+def detail_url(recipe_id):
+    """Create and return a recipe detail URL."""
+    return reverse("recipe:recipe-detail", args=[recipe_id])
+
+
+def create_user(email="user@example.com", password="Testpass123"):
+    """Helper function to create a new user."""
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+def create_recipe(user, **params):
+    """Helper function to create a new recipe."""
+    defaults = {"title": "Sample recipe", "time_minutes": 10, "price": Decimal("5.20")}
+    defaults.update(params)
+
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class ListCacheTests(TestCase):
+    """Test caching of the list endpoints."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_list_recipes_served_from_cache(self):
+        """Test a repeated list request is a hit costing one query."""
+        print("Testing list recipes served from cache...")
+        recipe = create_recipe(user=self.user)
+        recipe.tags.add(Tag.objects.create(user=self.user, name="Dinner"))
+
+        first = self.client.get(RECIPES_URL)
+        with self.assertNumQueries(1):  # the data version.
+            second = self.client.get(RECIPES_URL)
+
+        self.assertEqual(first["X-Cache"], "MISS")
+        self.assertEqual(second["X-Cache"], "HIT")
+        self.assertEqual(second.content, first.content)
+
+        print("Test list recipes served from cache: OK")
+
+    def test_list_recipes_cache_invalidated_by_writes(self):
+        """Test creating, updating and deleting recipes invalidates the cache."""
+        print("Testing list recipes cache invalidated by writes...")
+        self.client.get(RECIPES_URL)
+
+        payload = {"title": "Soup", "price": "4.00", "tags": [{"name": "Lunch"}]}
+        recipe_id = self.client.post(RECIPES_URL, payload, format="json").data["id"]
+        response = self.client.get(RECIPES_URL)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(len(response.data["results"]), 1)
+
+        self.client.patch(detail_url(recipe_id), {"title": "Stew"})
+        response = self.client.get(RECIPES_URL)
+        self.assertEqual(response.data["results"][0]["title"], "Stew")
+
+        self.client.delete(detail_url(recipe_id))
+        response = self.client.get(RECIPES_URL)
+        self.assertEqual(response.data["results"], [])
+
+        print("Test list recipes cache invalidated by writes: OK")
+
+    def test_list_cache_keyed_by_query(self):
+        """Test different query params are cached separately."""
+        print("Testing list cache keyed by query...")
+        create_recipe(user=self.user)
+        self.client.get(RECIPES_URL)
+
+        response = self.client.get(RECIPES_URL, {"fields": "id"})
+
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(set(response.data["results"][0]), {"id"})
+
+        print("Test list cache keyed by query: OK")
+
+    def test_list_cache_limited_to_user(self):
+        """Test users never see each other's cached lists."""
+        print("Testing list cache limited to user...")
+        create_recipe(user=self.user)
+        self.client.get(RECIPES_URL)
+
+        other_client = APIClient()
+        other_client.force_authenticate(create_user(email="user2@example.com"))
+        response = other_client.get(RECIPES_URL)
+
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.data["results"], [])
+
+        print("Test list cache limited to user: OK")
+
+    def test_tags_and_ingredients_cache_invalidated(self):
+        """Test tag and ingredient lists follow renames and deletes."""
+        print("Testing tags and ingredients cache invalidated...")
+        tag = Tag.objects.create(user=self.user, name="Dinner")
+        ingredient = Ingredient.objects.create(user=self.user, name="Salt")
+        self.client.get(TAGS_URL)
+        self.client.get(INGREDIENTS_URL)
+
+        self.client.patch(reverse("recipe:tag-detail", args=[tag.id]), {"name": "Tea"})
+        self.client.delete(reverse("recipe:ingredient-detail", args=[ingredient.id]))
+
+        tags = self.client.get(TAGS_URL)
+        ingredients = self.client.get(INGREDIENTS_URL)
+        self.assertEqual(tags["X-Cache"], "MISS")
+        self.assertEqual(tags.data["results"][0]["name"], "Tea")
+        self.assertEqual(ingredients.data["results"], [])
+
+        print("Test tags and ingredients cache invalidated: OK")
+
+    def test_cache_stats_command(self):
+        """Test the cache_stats command reports hits and misses."""
+        print("Testing cache stats command...")
+        self.client.get(TAGS_URL)
+        self.client.get(TAGS_URL)
+        self.client.get(TAGS_URL)
+
+        out = StringIO()
+        call_command("cache_stats", "--reset", stdout=out)
+        self.assertIn("hits: 2  misses: 1", out.getvalue())
+
+        out = StringIO()
+        call_command("cache_stats", stdout=out)
+        self.assertIn("hits: 0  misses: 0", out.getvalue())
+
+        print("Test cache stats command: OK")
+
+
+class FileBasedListCacheTests(ListCacheTests):
+    """Run the list cache tests against the file-based cache backend."""
+
+    def setUp(self):
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        file_cache = override_settings(
+            CACHES={
+                "default": {
+                    "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                    "LOCATION": cache_dir.name,
+                }
+            }
+        )
+        file_cache.enable()
+        self.addCleanup(file_cache.disable)
+
+        super().setUp()
@@ -0,0 +1,149 @@
+"""
+Tests for the recipe pantry API.
+"""
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe
+from recipe.tests.helpers import create_recipe
+
+PANTRY_URL = reverse("recipe:recipe-pantry")
+
+
+def create_user(email="user@example.com", password="testpass123"):
+    """Create and return a new user."""
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+def pantry_ids(user, *names):
+    """Return the comma separated ids of the user's ingredients of those names."""
+    ids = Ingredient.objects.filter(user=user, name__in=names).values_list(
+        "id", flat=True
+    )
+    return ",".join(map(str, ids))
+
+
+class PrivatePantryApiTests(TestCase):
+    """Test the authenticated recipe pantry ranking."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        create_recipe(self.user, "Omelette", ingredients=["Egg", "Butter"])
+        create_recipe(
+            self.user, "Pancakes", ingredients=["Egg", "Flour", "Milk", "Butter"]
+        )
+        create_recipe(self.user, "Toast", ingredients=["Bread", "Butter"])
+        create_recipe(self.user, "Salad", ingredients=["Lettuce", "Tomato"])
+
+    def test_pantry_ranks_by_coverage(self):
+        """Test recipes come best covered first, listing what they miss."""
+        print("Testing pantry ranks by coverage...")
+        have = pantry_ids(self.user, "Egg", "Butter", "Milk")
+
+        with self.assertNumQueries(2):  # the data version and the ranking.
+            response = self.client.get(PANTRY_URL, {"have": have})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data["results"]
+        self.assertEqual(
+            [(r["title"], r["coverage"]) for r in results],
+            [("Omelette", 1.0), ("Pancakes", 0.75), ("Toast", 0.5)],
+        )
+        self.assertEqual(results[0]["missing"], [])
+        self.assertEqual([i["name"] for i in results[1]["missing"]], ["Flour"])
+        self.assertEqual([i["name"] for i in results[2]["missing"]], ["Bread"])
+
+        print("Test pantry ranks by coverage: OK")
+
+    def test_pantry_pages_forward(self):
+        """Test the next cursor continues the ranking where the page ended."""
+        print("Testing pantry pages forward...")
+        have = pantry_ids(self.user, "Egg", "Butter", "Milk")
+
+        first = self.client.get(PANTRY_URL, {"have": have, "page_size": 2})
+        second = self.client.get(first.data["next"])
+
+        titles = [r["title"] for r in first.data["results"] + second.data["results"]]
+        self.assertEqual(titles, ["Omelette", "Pancakes", "Toast"])
+        self.assertIsNone(first.data["previous"])
+        self.assertIsNone(second.data["next"])
+
+        print("Test pantry pages forward: OK")
+
+    def test_pantry_ties_break_by_covered_then_newest(self):
+        """Test equal coverage ranks more covered, then newer, recipes first."""
+        print("Testing pantry ties...")
+        create_recipe(
+            self.user, "Egg toast", ingredients=["Egg", "Bread", "Butter", "Milk"]
+        )
+        have = pantry_ids(self.user, "Egg", "Butter")
+
+        response = self.client.get(PANTRY_URL, {"have": have})
+
+        self.assertEqual(
+            [r["title"] for r in response.data["results"]],
+            ["Omelette", "Egg toast", "Pancakes", "Toast"],
+        )
+
+        print("Test pantry ties: OK")
+
+    def test_pantry_follows_ingredient_changes(self):
+        """Test coverage follows ingredients being added to a recipe."""
+        print("Testing pantry follows ingredient changes...")
+        toast = Recipe.objects.get(title="Toast")
+        toast.ingredients.add(Ingredient.objects.create(user=self.user, name="Jam"))
+        have = pantry_ids(self.user, "Bread", "Butter")
+
+        response = self.client.get(PANTRY_URL, {"have": have})
+
+        toast = response.data["results"][0]
+        self.assertEqual(toast["coverage"], 2 / 3)
+        self.assertEqual([i["name"] for i in toast["missing"]], ["Jam"])
+
+        print("Test pantry follows ingredient changes: OK")
+
+    def test_pantry_limited_to_user(self):
+        """Test other users' ingredients and recipes are never matched."""
+        print("Testing pantry limited to user...")
+        other_user = create_user(email="other@example.com")
+        create_recipe(other_user, "Other omelette", ingredients=["Egg"])
+        have = pantry_ids(other_user, "Egg")
+
+        response = self.client.get(PANTRY_URL, {"have": have})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["results"], [])
+
+        print("Test pantry limited to user: OK")
+
+    def test_pantry_invalid_have_error(self):
+        """Test a missing or malformed list of ingredients is rejected."""
+        print("Testing pantry invalid have...")
+
+        missing = self.client.get(PANTRY_URL)
+        malformed = self.client.get(PANTRY_URL, {"have": "1,egg"})
+
+        self.assertEqual(missing.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(malformed.status_code, status.HTTP_400_BAD_REQUEST)
+
+        print("Test pantry invalid have: OK")
+
+    def test_pantry_invalid_cursor_error(self):
+        """Test a tampered cursor is answered with a 404."""
+        print("Testing pantry invalid cursor...")
+        have = pantry_ids(self.user, "Egg")
+
+        response = self.client.get(PANTRY_URL, {"have": have, "cursor": "garbage"})
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        print("Test pantry invalid cursor: OK")
@@ -0,0 +1,258 @@
+"""
+Query plan regression tests for the recipe, tag and ingredient APIs.
+"""
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe, Tag
+
+RECIPES_URL = reverse("recipe:recipe-list")
+TAGS_URL = reverse("recipe:tag-list")
+INGREDIENTS_URL = reverse("recipe:ingredient-list")
+PANTRY_URL = reverse("recipe:recipe-pantry")
+
+USERS = 20
+RECIPES_PER_USER = 1000  # every library spans many pages of 100.
+TAGS_PER_USER = 1000
+INGREDIENTS_PER_USER = 2000
+
+# the tables that grow with every user's library.
+LIBRARY_TABLES = {
+    Recipe._meta.db_table,
+    Tag._meta.db_table,
+    Ingredient._meta.db_table,
+    Recipe.tags.through._meta.db_table,
+    Recipe.ingredients.through._meta.db_table,
+}
+
+WORDS = (
+    "apple basil butter carrot cheese chicken chili chocolate coconut cream "
+    "curry garlic ginger honey lemon lentil mushroom noodle onion pasta "
+    "pepper pork potato prawn rice salmon soup spinach tofu tomato"
+).split()
+
+
+def seed_libraries(user_ids):
+    """Give every user a library, their rows interleaved as they would be."""
+    words = "(%(words)s)[1 + g * {} %% 30] || ' ' || (%(words)s)[1 + g * {} %% 30]"
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "INSERT INTO core_recipe (user_id, title, description, time_minutes, price)"
+            f" SELECT u, {words.format(1, 7)}, {words.format(3, 11)},"
+            " g %% 120, (g %% 5000) / 100.0"
+            " FROM generate_series(1, %(recipes)s) g, unnest(%(users)s) u"
+            " ORDER BY g, u",
+            {"words": WORDS, "recipes": RECIPES_PER_USER, "users": user_ids},
+        )
+        for target, count, per_recipe in (
+            ("tag", TAGS_PER_USER, 3),
+            ("ingredient", INGREDIENTS_PER_USER, 6),
+        ):
+            cursor.execute(
+                f"INSERT INTO core_{target} (user_id, name)"
+                f" SELECT u, '{target} ' || g"
+                " FROM generate_series(1, %s) g, unnest(%s) u",
+                [count, user_ids],
+            )
+            cursor.execute(
+                f"INSERT INTO core_recipe_{target}s (recipe_id, {target}_id)"
+                " SELECT r.id, t.id FROM core_recipe r"
+                " CROSS JOIN generate_series(1, %s) k"
+                f" JOIN core_{target} t ON t.user_id = r.user_id"
+                f" AND t.name = '{target} ' || (1 + (r.id * 7 + k * 31) %% %s)"
+                " ON CONFLICT DO NOTHING",
+                [per_recipe, count],
+            )
+        # check the deferred link foreign keys now, once, rather than again
+        # at the end of every test.
+        cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        cursor.execute("SET CONSTRAINTS ALL DEFERRED")
+        cursor.execute("ANALYZE")
+
+
+def plan_nodes(plan):
+    """Yield a plan node and all of the nodes below it."""
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from plan_nodes(child)
+
+
+class QueryPlanTests(TestCase):
+    """Test every API read is served by an index over a multi-user dataset.
+
+    A plan fails when it sequentially scans a table that grows with the
+    users' libraries, or sorts half or more of the user's library instead
+    of reading it in order from an index. Incremental sorts, which only
+    order the ties of an index ordered prefix, are fine.
+
+    Sequential scans are disabled while explaining: at the size of a test
+    database some are honestly cheaper, so one left in a plan means that
+    no index can serve the query at all.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        users = get_user_model().objects.bulk_create(
+            get_user_model()(email=f"user{i}@example.com", password="!")
+            for i in range(USERS)
+        )
+        seed_libraries([user.id for user in users])
+        cls.user = users[USERS // 2]
+        cls.tags = list(
+            Tag.objects.filter(user=cls.user)
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+        cls.ingredients = list(
+            Ingredient.objects.filter(user=cls.user)
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assertPlansUseIndexes(self, url, params=None, library=RECIPES_PER_USER):
+        """EXPLAIN every query a GET runs and return the response."""
+        cache.clear()  # so the queries run rather than a cached response.
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        for query in queries.captured_queries:
+            with connection.cursor() as cursor:
+                cursor.execute("SET enable_seqscan = off; SET random_page_cost = 1.1")
+                try:
+                    cursor.execute(f"EXPLAIN (ANALYZE, FORMAT JSON) {query['sql']}")
+                    plan = cursor.fetchone()[0][0]["Plan"]  # decoded by the driver.
+                finally:
+                    cursor.execute("RESET enable_seqscan; RESET random_page_cost")
+            for node in plan_nodes(plan):
+                self.assertFalse(
+                    node["Node Type"] == "Seq Scan"
+                    and node["Relation Name"] in LIBRARY_TABLES,
+                    f"sequential scan of {node.get('Relation Name')}"
+                    f" for {url} {params}:\n{query['sql']}",
+                )
+                self.assertLess(
+                    node.get("Rows Removed by Filter", 0),
+                    library // 2,
+                    f"{node['Node Type']} filtering out rows for {url} {params}:\n"
+                    f"{query['sql']}",
+                )
+                self.assertFalse(
+                    node["Node Type"] == "Sort" and node["Plan Rows"] >= library // 2,
+                    f"sort of {node['Plan Rows']} rows for {url} {params}:\n"
+                    f"{query['sql']}",
+                )
+
+        return response
+
+    def test_recipe_list_plans(self):
+        """Test the recipe list pages and filters use indexes."""
+        print("Testing recipe list query plans...")
+        tag, other_tag = self.tags[:2]
+        for params in (
+            {},
+            {"page_size": 10},
+            {"fields": "id,title,price"},
+            {"tags": tag},
+            {"tags": f"{tag},{other_tag}", "match": "all"},
+            {"ingredients": self.ingredients[0]},
+            {"search": "chili pasta"},
+        ):
+            response = self.assertPlansUseIndexes(RECIPES_URL, params)
+
+        response = self.assertPlansUseIndexes(RECIPES_URL, {"page_size": 10})
+        self.assertPlansUseIndexes(response.data["next"])
+
+        print("Test recipe list query plans: OK")
+
+    def test_recipe_range_and_ordering_plans(self):
+        """Test price and time ranges and orderings, deep pages included."""
+        print("Testing recipe range and ordering query plans...")
+        for params in (
+            {"price_max": "10"},
+            {"time_max": 30},
+            {"price_min": "5", "price_max": "10", "ordering": "price"},
+            {"ordering": "-price"},
+            {"ordering": "time_minutes"},
+            {"ordering": "-time_minutes,price"},
+            {"ordering": "price,time_minutes,-id"},
+        ):
+            self.assertPlansUseIndexes(RECIPES_URL, params)
+
+        # past the first, a page must start from an index range: filtering
+        # out the rows before it, or sorting those after it, costs more than
+        # the page the deeper or the shallower it is.
+        for ordering in ("price", "-time_minutes"):
+            params = {"ordering": ordering, "page_size": 100}
+            response = self.client.get(RECIPES_URL, params)
+            while response.data["next"]:
+                response = self.assertPlansUseIndexes(
+                    response.data["next"], library=200
+                )
+
+        print("Test recipe range and ordering query plans: OK")
+
+    def test_recipe_detail_plans(self):
+        """Test reading one recipe uses indexes."""
+        print("Testing recipe detail query plans...")
+        recipe = Recipe.objects.filter(user=self.user).first()
+
+        self.assertPlansUseIndexes(reverse("recipe:recipe-detail", args=[recipe.id]))
+
+        print("Test recipe detail query plans: OK")
+
+    def test_pantry_plans(self):
+        """Test ranking recipes by pantry coverage uses indexes."""
+        print("Testing pantry query plans...")
+        have = ",".join(map(str, self.ingredients[:20]))
+
+        response = self.assertPlansUseIndexes(
+            PANTRY_URL, {"have": have, "page_size": 10}
+        )
+        self.assertPlansUseIndexes(response.data["next"])
+
+        print("Test pantry query plans: OK")
+
+    def test_similar_plans(self):
+        """Test finding similar recipes through their band hashes uses indexes."""
+        print("Testing similar query plans...")
+        recipe = Recipe.objects.filter(user=self.user).first()
+
+        self.assertPlansUseIndexes(reverse("recipe:recipe-similar", args=[recipe.id]))
+
+        print("Test similar query plans: OK")
+
+    def test_tag_and_ingredient_list_plans(self):
+        """Test the tag and ingredient lists, orderings and typeahead."""
+        print("Testing tag and ingredient list query plans...")
+        for url, library in (
+            (TAGS_URL, TAGS_PER_USER),
+            (INGREDIENTS_URL, INGREDIENTS_PER_USER),
+        ):
+            for params in (
+                {},
+                {"page_size": 10},
+                {"assigned_only": 1},
+                {"with_counts": 1},
+                {"ordering": "name"},
+                {"ordering": "-recipe_count"},
+                {"ordering": "recipe_count"},
+                {"q": "12"},
+            ):
+                self.assertPlansUseIndexes(url, params, library)
+
+            response = self.assertPlansUseIndexes(url, {"page_size": 10}, library)
+            self.assertPlansUseIndexes(response.data["next"], library=library)
+
+        print("Test tag and ingredient list query plans: OK")
@@ -8,7 +8,10 @@ import os
 from PIL import Image
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from rest_framework import status
@@ -20,12 +23,24 @@ from recipe.serializers import RecipeSerializer, RecipeDetailSerializer
 
 RECIPES_URL = reverse("recipe:recipe-list")
 
+# Query budgets per endpoint: the ETag version lookup, the recipes query and
+# one prefetch per relation.
+LIST_QUERY_BUDGET = 4
+DETAIL_QUERY_BUDGET = 4
+# Creating a recipe: savepoint, insert, version bump, three queries per relation
+# (select, insert missing, reselect), one link insert each, release and the two
+# relations rendered back.
+CREATE_QUERY_BUDGET = 14
+
 
 def detail_url(recipe_id):
     """Create and return a recipe detail URL."""
     return reverse("recipe:recipe-detail", args=[recipe_id])
 
 
+BULK_URL = reverse("recipe:recipe-bulk")
+
+
 def image_upload_url(recipe_id):
     """Create and return an image upload URL."""
     return reverse("recipe:recipe-upload-image", args=[recipe_id])
@@ -89,7 +104,7 @@ class PrivateRecipeApiTests(TestCase):
         serializer = RecipeSerializer(recipes, many=True)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data, serializer.data)
+        self.assertEqual(response.data["results"], serializer.data)
 
         print("Test retrieving recipes: OK")
 
@@ -107,9 +122,11 @@ class PrivateRecipeApiTests(TestCase):
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(
-            len(response.data), 1
+            len(response.data["results"]), 1
         )  # only one recipe for the authenticated user
-        self.assertEqual(response.data, serializer.data)  # the recipe is the same
+        self.assertEqual(
+            response.data["results"], serializer.data
+        )  # the recipe is the same
 
         print("Test that recipes is limited to authenticated user: OK")
 
@@ -360,6 +377,36 @@ class PrivateRecipeApiTests(TestCase):
 
         print("Test clearing a recipes tags: OK")
 
+    def test_update_recipe_tags_keeps_unchanged_links(self):
+        """Test swapping one tag only rewrites the link that changed"""
+
+        print("Testing updating recipe tags keeps unchanged links...")
+        recipe = create_recipe(user=self.user)
+        tags = [Tag.objects.create(user=self.user, name=f"Tag {i}") for i in range(3)]
+        recipe.tags.add(*tags)
+        links = Recipe.tags.through.objects.filter(recipe=recipe)
+        kept = set(links.filter(tag__in=tags[:2]).values_list("id", flat=True))
+
+        payload = {"tags": [{"name": "Tag 0"}, {"name": "Tag 1"}, {"name": "Tag 3"}]}
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.patch(detail_url(recipe.id), payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(kept <= set(links.values_list("id", flat=True)))
+        self.assertEqual(
+            set(recipe.tags.values_list("name", flat=True)),
+            {"Tag 0", "Tag 1", "Tag 3"},
+        )
+        through_writes = [
+            query["sql"]
+            for query in queries.captured_queries
+            if query["sql"].startswith(("INSERT", "DELETE"))
+            and "core_recipe_tags" in query["sql"]
+        ]
+        self.assertEqual(len(through_writes), 2)  # one delete, one insert.
+
+        print("Test updating recipe tags keeps unchanged links: OK")
+
     # ----------------------------------------INGREDIENTS----------------------------------------
 
     def test_create_recipe_with_new_ingredients(self):
@@ -494,9 +541,9 @@ class PrivateRecipeApiTests(TestCase):
         serializer2 = RecipeSerializer(recipe2)
         serializer3 = RecipeSerializer(recipe3)
 
-        self.assertIn(serializer1.data, response.data)
-        self.assertIn(serializer2.data, response.data)
-        self.assertNotIn(serializer3.data, response.data)
+        self.assertIn(serializer1.data, response.data["results"])
+        self.assertIn(serializer2.data, response.data["results"])
+        self.assertNotIn(serializer3.data, response.data["results"])
 
         print("Test returning recipes with specific tags: OK")
 
@@ -521,12 +568,814 @@ class PrivateRecipeApiTests(TestCase):
         serializer2 = RecipeSerializer(recipe2)
         serializer3 = RecipeSerializer(recipe3)
 
-        self.assertIn(serializer1.data, response.data)
-        self.assertIn(serializer2.data, response.data)
-        self.assertNotIn(serializer3.data, response.data)
+        self.assertIn(serializer1.data, response.data["results"])
+        self.assertIn(serializer2.data, response.data["results"])
+        self.assertNotIn(serializer3.data, response.data["results"])
 
         print("Test returning recipes with specific ingredients: OK")
 
+    def test_filter_recipes_by_tags_returns_each_recipe_once(self):
+        """Test a recipe matching several tags is returned only once"""
+        print("Testing filter recipes by tags returns each recipe once...")
+
+        recipe = create_recipe(user=self.user, title="Thai curry")
+        tag1 = Tag.objects.create(user=self.user, name="Thai")
+        tag2 = Tag.objects.create(user=self.user, name="Spicy")
+        recipe.tags.add(tag1, tag2)
+
+        params = {"tags": f"{tag1.id},{tag2.id}"}
+        response = self.client.get(RECIPES_URL, params)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["results"]), 1)
+
+        print("Test filter recipes by tags returns each recipe once: OK")
+
+    def test_filter_recipes_matching_all_tags(self):
+        """Test match=all returns only recipes carrying every tag"""
+        print("Testing filter recipes matching all tags...")
+
+        recipe1 = create_recipe(user=self.user, title="Thai curry")
+        recipe2 = create_recipe(user=self.user, title="Pad thai")
+        tag1 = Tag.objects.create(user=self.user, name="Thai")
+        tag2 = Tag.objects.create(user=self.user, name="Spicy")
+        recipe1.tags.add(tag1, tag2)
+        recipe2.tags.add(tag1)
+
+        params = {"tags": f"{tag1.id},{tag2.id}", "match": "all"}
+        response = self.client.get(RECIPES_URL, params)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([r["id"] for r in response.data["results"]], [recipe1.id])
+        self.assertEqual(
+            {t["id"] for t in response.data["results"][0]["tags"]},
+            {tag1.id, tag2.id},
+        )  # nested order is not part of the contract.
+
+        print("Test filter recipes matching all tags: OK")
+
+    def test_filter_recipes_matching_all_ingredients(self):
+        """Test match=all applies to ingredients too"""
+        print("Testing filter recipes matching all ingredients...")
+
+        recipe1 = create_recipe(user=self.user, title="Garlic prawns")
+        recipe2 = create_recipe(user=self.user, title="Garlic bread")
+        ingredient1 = Ingredient.objects.create(user=self.user, name="Garlic")
+        ingredient2 = Ingredient.objects.create(user=self.user, name="Prawns")
+        recipe1.ingredients.add(ingredient1, ingredient2)
+        recipe2.ingredients.add(ingredient1)
+
+        params = {
+            "ingredients": f"{ingredient1.id},{ingredient2.id},{ingredient2.id}",
+            "match": "all",
+        }
+        response = self.client.get(RECIPES_URL, params)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([r["id"] for r in response.data["results"]], [recipe1.id])
+        self.assertEqual(
+            {i["id"] for i in response.data["results"][0]["ingredients"]},
+            {ingredient1.id, ingredient2.id},
+        )  # nested order is not part of the contract.
+
+        print("Test filter recipes matching all ingredients: OK")
+
+    def test_filter_recipes_invalid_match_returns_error(self):
+        """Test an unknown match mode is rejected"""
+        print("Testing filter recipes invalid match returns error...")
+
+        response = self.client.get(RECIPES_URL, {"tags": "1", "match": "some"})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        print("Test filter recipes invalid match returns error: OK")
+
+    # ----------------------------------------SEARCH----------------------------------------
+
+    def test_search_recipes_by_title_and_description(self):
+        """Test searching recipes matches title and description words."""
+        print("Testing search recipes by title and description...")
+        recipe1 = create_recipe(user=self.user, title="Lemon cheesecake")
+        recipe2 = create_recipe(
+            user=self.user, title="Tart", description="Tangy lemons and cream"
+        )
+        create_recipe(user=self.user, title="Beef stew", description="Slow cooked")
+
+        response = self.client.get(RECIPES_URL, {"search": "lemon"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        ids = [recipe["id"] for recipe in response.data["results"]]
+        self.assertEqual(ids, [recipe1.id, recipe2.id])  # title ranks higher.
+
+        print("Test search recipes by title and description: OK")
+
+    def test_search_recipes_sees_updates(self):
+        """Test the search index follows updates to the recipe."""
+        print("Testing search recipes sees updates...")
+        recipe = create_recipe(user=self.user, title="Pancakes")
+
+        self.client.patch(detail_url(recipe.id), {"title": "Waffles"})
+
+        self.assertEqual(
+            self.client.get(RECIPES_URL, {"search": "pancakes"}).data["results"], []
+        )
+        response = self.client.get(RECIPES_URL, {"search": "waffle"})
+        self.assertEqual(response.data["results"][0]["id"], recipe.id)
+
+        print("Test search recipes sees updates: OK")
+
+    def test_search_recipes_paginated_by_rank(self):
+        """Test search results page through every match exactly once."""
+        print("Testing search recipes paginated by rank...")
+        for i in range(5):
+            create_recipe(
+                user=self.user, title="Soup " * (i % 3 + 1), description="Soup"
+            )
+
+        response = self.client.get(RECIPES_URL, {"search": "soup", "page_size": 2})
+        seen_ids = [recipe["id"] for recipe in response.data["results"]]
+        while response.data["next"]:
+            response = self.client.get(response.data["next"])
+            seen_ids += [recipe["id"] for recipe in response.data["results"]]
+
+        self.assertEqual(len(seen_ids), 5)
+        self.assertEqual(len(set(seen_ids)), 5)
+
+        print("Test search recipes paginated by rank: OK")
+
+    # ----------------------------------------QUERY BUDGETS----------------------------------------
+
+    def _create_recipes_with_relations(self, count):
+        """Create recipes that carry a couple of tags and ingredients each."""
+        recipes = []
+        for i in range(count):
+            recipe = create_recipe(user=self.user, title=f"Recipe {i}")
+            recipe.tags.add(
+                Tag.objects.create(user=self.user, name=f"Tag {i}"),
+                Tag.objects.create(user=self.user, name=f"Other tag {i}"),
+            )
+            recipe.ingredients.add(
+                Ingredient.objects.create(user=self.user, name=f"Ingredient {i}"),
+                Ingredient.objects.create(user=self.user, name=f"Other {i}"),
+            )
+            recipes.append(recipe)
+
+        return recipes
+
+    def test_list_recipes_query_budget(self):
+        """Test listing recipes runs a constant number of queries."""
+        print("Testing listing recipes query budget...")
+        self._create_recipes_with_relations(10)
+
+        with self.assertNumQueries(LIST_QUERY_BUDGET):
+            response = self.client.get(RECIPES_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["results"]), 10)
+        self.assertEqual(len(response.data["results"][0]["tags"]), 2)
+        self.assertEqual(len(response.data["results"][0]["ingredients"]), 2)
+
+        print("Test listing recipes query budget: OK")
+
+    def test_filtered_list_recipes_query_budget(self):
+        """Test filtering recipes stays within the list query budget."""
+        print("Testing filtered list recipes query budget...")
+        recipes = self._create_recipes_with_relations(5)
+        tag_ids = ",".join(str(recipe.tags.first().id) for recipe in recipes)
+
+        with self.assertNumQueries(LIST_QUERY_BUDGET):
+            response = self.client.get(RECIPES_URL, {"tags": tag_ids})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["results"]), 5)
+
+        print("Test filtered list recipes query budget: OK")
+
+    def test_get_recipe_detail_query_budget(self):
+        """Test retrieving a recipe runs a constant number of queries."""
+        print("Testing recipe detail query budget...")
+        recipe = self._create_recipes_with_relations(1)[0]
+
+        with self.assertNumQueries(DETAIL_QUERY_BUDGET):
+            response = self.client.get(detail_url(recipe.id))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, RecipeDetailSerializer(recipe).data)
+
+        print("Test recipe detail query budget: OK")
+
+    def test_create_recipe_query_budget(self):
+        """Test creating a recipe costs the same however many names it carries."""
+        print("Testing create recipe query budget...")
+        Ingredient.objects.create(user=self.user, name="Ingredient 0")
+        payload = {
+            "title": "Big stew",
+            "time_minutes": 90,
+            "price": Decimal("12.00"),
+            "tags": [{"name": f"Tag {i}"} for i in range(10)],
+            "ingredients": [{"name": f"Ingredient {i}"} for i in range(30)],
+        }
+
+        with self.assertNumQueries(CREATE_QUERY_BUDGET):
+            response = self.client.post(RECIPES_URL, payload, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        recipe = Recipe.objects.get(id=response.data["id"])
+        self.assertEqual(recipe.tags.count(), 10)
+        self.assertEqual(recipe.ingredients.count(), 30)
+        self.assertEqual(Ingredient.objects.filter(user=self.user).count(), 30)
+
+        print("Test create recipe query budget: OK")
+
+    def test_create_recipe_duplicate_names_linked_once(self):
+        """Test names repeated in a payload create and link one object."""
+        print("Testing create recipe with duplicate names...")
+        payload = {
+            "title": "Salt and more salt",
+            "time_minutes": 5,
+            "price": Decimal("1.00"),
+            "ingredients": [{"name": "Salt"}, {"name": "Salt"}],
+        }
+
+        response = self.client.post(RECIPES_URL, payload, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        recipe = Recipe.objects.get(id=response.data["id"])
+        self.assertEqual(recipe.ingredients.count(), 1)
+        self.assertEqual(Ingredient.objects.filter(user=self.user).count(), 1)
+
+        print("Test create recipe with duplicate names: OK")
+
+    def test_list_recipes_defers_unused_columns(self):
+        """Test the list view doesn't load columns its serializer never emits."""
+        print("Testing list recipes defers unused columns...")
+        create_recipe(user=self.user)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(RECIPES_URL)
+
+        recipes_sql = queries.captured_queries[1]["sql"]  # after the version.
+        self.assertNotIn('"core_recipe"."description"', recipes_sql)
+        self.assertNotIn('"core_recipe"."image"', recipes_sql)
+        self.assertIn('"core_recipe"."title"', recipes_sql)
+
+        print("Test list recipes defers unused columns: OK")
+
+    # ----------------------------------------SPARSE FIELDSETS----------------------------------------
+
+    def test_list_recipes_selected_fields(self):
+        """Test ?fields= renders only the requested fields in one query."""
+        print("Testing list recipes selected fields...")
+        self._create_recipes_with_relations(3)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(RECIPES_URL, {"fields": "id,title"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        for recipe in response.data["results"]:
+            self.assertEqual(set(recipe), {"id", "title"})
+
+        self.assertEqual(len(queries), 2)  # no tags/ingredients prefetch.
+        self.assertNotIn('"core_recipe"."price"', queries[1]["sql"])
+
+        print("Test list recipes selected fields: OK")
+
+    def test_list_recipes_excluded_fields(self):
+        """Test ?exclude= leaves fields and their prefetches out."""
+        print("Testing list recipes excluded fields...")
+        self._create_recipes_with_relations(2)
+
+        with self.assertNumQueries(3):  # version + recipes + tags.
+            response = self.client.get(RECIPES_URL, {"exclude": "ingredients,link"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            set(response.data["results"][0]),
+            {"id", "title", "time_minutes", "price", "tags"},
+        )
+
+        print("Test list recipes excluded fields: OK")
+
+    def test_get_recipe_detail_selected_fields(self):
+        """Test ?fields= applies to the detail view fields."""
+        print("Testing get recipe detail selected fields...")
+        recipe = create_recipe(user=self.user, description="Long description")
+
+        response = self.client.get(detail_url(recipe.id), {"fields": "description"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {"description": "Long description"})
+
+        print("Test get recipe detail selected fields: OK")
+
+    def test_list_recipes_unknown_field_returns_error(self):
+        """Test asking for a field the serializer doesn't have is rejected."""
+        print("Testing list recipes unknown field returns error...")
+
+        response = self.client.get(RECIPES_URL, {"fields": "id,description"})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        print("Test list recipes unknown field returns error: OK")
+
+    # ----------------------------------------CONDITIONAL GET----------------------------------------
+
+    def test_list_recipes_not_modified(self):
+        """Test a current If-None-Match returns 304 in a single query."""
+        print("Testing list recipes not modified...")
+        self._create_recipes_with_relations(3)
+        response = self.client.get(RECIPES_URL)
+        etag = response["ETag"]
+
+        with self.assertNumQueries(1):
+            response = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], etag)
+        self.assertEqual(response.content, b"")
+
+        print("Test list recipes not modified: OK")
+
+    def test_get_recipe_detail_not_modified(self):
+        """Test the detail view answers 304 to a current ETag."""
+        print("Testing get recipe detail not modified...")
+        recipe = create_recipe(user=self.user)
+        etag = self.client.get(detail_url(recipe.id))["ETag"]
+
+        with self.assertNumQueries(1):
+            response = self.client.get(detail_url(recipe.id), HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        print("Test get recipe detail not modified: OK")
+
+    def test_recipe_etag_changes_on_writes(self):
+        """Test updates and tag changes invalidate the ETag."""
+        print("Testing recipe etag changes on writes...")
+        recipe = create_recipe(user=self.user)
+        etag = self.client.get(RECIPES_URL)["ETag"]
+
+        self.client.patch(detail_url(recipe.id), {"title": "New title"})
+        response = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+
+        etag = response["ETag"]
+        recipe.tags.add(Tag.objects.create(user=self.user, name="Dinner"))
+        response = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        print("Test recipe etag changes on writes: OK")
+
+    def test_recipe_etag_depends_on_query(self):
+        """Test different query params get different ETags."""
+        print("Testing recipe etag depends on query...")
+        create_recipe(user=self.user)
+
+        etag = self.client.get(RECIPES_URL)["ETag"]
+        response = self.client.get(
+            RECIPES_URL, {"fields": "id"}, HTTP_IF_NONE_MATCH=etag
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+
+        print("Test recipe etag depends on query: OK")
+
+    def test_recipe_etag_other_user_writes(self):
+        """Test another user's writes don't invalidate the ETag."""
+        print("Testing recipe etag other user writes...")
+        create_recipe(user=self.user)
+        etag = self.client.get(RECIPES_URL)["ETag"]
+
+        create_recipe(user=create_user(email="user2@example.com", password="pass123"))
+        response = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        print("Test recipe etag other user writes: OK")
+
+    def test_recipe_etag_wildcard_needs_visible_recipe(self):
+        """Test If-None-Match: * is 304 only for a recipe the user can see."""
+        print("Testing recipe etag wildcard needs visible recipe...")
+        mine = create_recipe(user=self.user)
+        theirs = create_recipe(
+            user=create_user(email="user2@example.com", password="pass123")
+        )
+
+        found = self.client.get(detail_url(mine.id), HTTP_IF_NONE_MATCH="*")
+        foreign = self.client.get(detail_url(theirs.id), HTTP_IF_NONE_MATCH="*")
+        missing = self.client.get(detail_url(theirs.id + 1), HTTP_IF_NONE_MATCH="*")
+
+        self.assertEqual(found.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(foreign.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(missing.status_code, status.HTTP_404_NOT_FOUND)
+
+        print("Test recipe etag wildcard needs visible recipe: OK")
+
+    # ----------------------------------------RANGES AND ORDERING----------------------------------------
+
+    def test_filter_recipes_by_price_and_time(self):
+        """Test price and cooking time bounds keep the recipes within them."""
+        print("Testing filter recipes by price and time...")
+        cheap = create_recipe(user=self.user, price=Decimal("4.00"), time_minutes=20)
+        quick = create_recipe(user=self.user, price=Decimal("9.50"), time_minutes=5)
+        create_recipe(user=self.user, price=Decimal("12.00"), time_minutes=10)
+        create_recipe(user=self.user, price=Decimal("3.00"), time_minutes=None)
+
+        response = self.client.get(
+            RECIPES_URL, {"price_min": "4", "price_max": "10", "time_max": 30}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        ids = [recipe["id"] for recipe in response.data["results"]]
+        self.assertEqual(ids, [quick.id, cheap.id])
+
+        print("Test filter recipes by price and time: OK")
+
+    def test_filter_recipes_invalid_range_returns_error(self):
+        """Test bounds that are not numbers are rejected."""
+        print("Testing filter recipes invalid range returns error...")
+
+        for params in (
+            {"price_min": "cheap"},
+            {"price_min": "NaN"},
+            {"price_max": "Infinity"},
+            {"time_max": "1.5"},
+        ):
+            response = self.client.get(RECIPES_URL, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        print("Test filter recipes invalid range returns error: OK")
+
+    def test_order_recipes_by_price_and_time(self):
+        """Test recipes sort by several fields, each in its own direction."""
+        print("Testing order recipes by price and time...")
+        slow = create_recipe(user=self.user, price=Decimal("2.00"), time_minutes=40)
+        fast = create_recipe(user=self.user, price=Decimal("2.00"), time_minutes=10)
+        fast_too = create_recipe(user=self.user, price=Decimal("2.00"), time_minutes=10)
+        dear = create_recipe(user=self.user, price=Decimal("8.00"), time_minutes=5)
+
+        response = self.client.get(RECIPES_URL, {"ordering": "price,time_minutes,-id"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        ids = [recipe["id"] for recipe in response.data["results"]]
+        self.assertEqual(ids, [fast_too.id, fast.id, slow.id, dear.id])
+
+        print("Test order recipes by price and time: OK")
+
+    def test_ordered_recipes_paginated_by_cursor(self):
+        """Test cursors walk an ordering both ways, recipes without a time last."""
+        print("Testing ordered recipes paginated by cursor...")
+        times = [30, None, 10, 30, None, 20, 10]
+        recipes = [create_recipe(user=self.user, time_minutes=t) for t in times]
+        expected = sorted(
+            recipes, key=lambda r: (r.time_minutes is None, r.time_minutes, r.id)
+        )
+
+        for ordering, expected_ids in (
+            ("time_minutes", [recipe.id for recipe in expected]),
+            ("-time_minutes", [recipe.id for recipe in reversed(expected)]),
+        ):
+            params = {"ordering": ordering, "page_size": 2}
+            response = self.client.get(RECIPES_URL, params)
+            seen_ids = [recipe["id"] for recipe in response.data["results"]]
+            while response.data["next"]:
+                response = self.client.get(response.data["next"])
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                seen_ids += [recipe["id"] for recipe in response.data["results"]]
+            self.assertEqual(seen_ids, expected_ids)
+
+            previous = self.client.get(response.data["previous"])
+            previous_ids = [recipe["id"] for recipe in previous.data["results"]]
+            self.assertEqual(previous_ids, expected_ids[4:6])
+
+        print("Test ordered recipes paginated by cursor: OK")
+
+    def test_order_recipes_invalid_field_returns_error(self):
+        """Test unknown or repeated ordering fields are rejected."""
+        print("Testing order recipes invalid field returns error...")
+
+        for ordering in ("title", "price,-price", "--price"):
+            response = self.client.get(RECIPES_URL, {"ordering": ordering})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        print("Test order recipes invalid field returns error: OK")
+
+    # ----------------------------------------PAGINATION----------------------------------------
+
+    def test_recipes_paginated_by_cursor(self):
+        """Test walking the recipe list page by page with cursors."""
+        print("Testing recipes paginated by cursor...")
+        recipes = [create_recipe(user=self.user, title=f"R{i}") for i in range(5)]
+        expected_ids = [recipe.id for recipe in reversed(recipes)]
+
+        response = self.client.get(RECIPES_URL, {"page_size": 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(response.data["previous"])
+
+        seen_ids = [recipe["id"] for recipe in response.data["results"]]
+        while response.data["next"]:
+            response = self.client.get(response.data["next"])
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            seen_ids += [recipe["id"] for recipe in response.data["results"]]
+
+        self.assertEqual(seen_ids, expected_ids)
+
+        previous = self.client.get(response.data["previous"])
+        previous_ids = [recipe["id"] for recipe in previous.data["results"]]
+        self.assertEqual(previous_ids, expected_ids[2:4])
+
+        print("Test recipes paginated by cursor: OK")
+
+    def test_recipes_page_does_not_count(self):
+        """Test fetching a page never counts the user's recipes."""
+        print("Testing recipes page does not count...")
+        for i in range(3):
+            create_recipe(user=self.user, title=f"R{i}")
+        first_page = self.client.get(RECIPES_URL, {"page_size": 1})
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(first_page.data["next"])
+
+        for query in queries.captured_queries:
+            self.assertNotIn("COUNT(", query["sql"].upper())
+
+        print("Test recipes page does not count: OK")
+
+    def test_recipes_invalid_cursor_returns_error(self):
+        """Test a tampered cursor returns not found."""
+        print("Testing recipes invalid cursor returns error...")
+        create_recipe(user=self.user)
+
+        response = self.client.get(RECIPES_URL, {"cursor": "not-a-cursor"})
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        print("Test recipes invalid cursor returns error: OK")
+
+    # ----------------------------------------BULK----------------------------------------
+
+    def test_bulk_create_recipes(self):
+        """Test creating a list of recipes with shared tags and ingredients."""
+        print("Testing bulk create recipes...")
+        Tag.objects.create(user=self.user, name="Dinner")
+        payload = [
+            {
+                "title": f"Recipe {i}",
+                "time_minutes": i,
+                "price": Decimal("2.50"),
+                "tags": [{"name": "Dinner"}, {"name": f"Tag {i}"}],
+                "ingredients": [{"name": "Salt"}],
+            }
+            for i in range(20)
+        ]
+
+        response = self.client.post(BULK_URL, payload, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        recipes = Recipe.objects.filter(user=self.user).order_by("id")
+        self.assertEqual(
+            list(recipes.values_list("id", flat=True)), response.data["ids"]
+        )
+        self.assertEqual(recipes[5].title, "Recipe 5")
+        self.assertEqual(
+            set(recipes[5].tags.values_list("name", flat=True)), {"Dinner", "Tag 5"}
+        )
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 21)
+        self.assertEqual(Ingredient.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(Recipe.ingredients.through.objects.count(), 20)
+
+        print("Test bulk create recipes: OK")
+
+    def test_bulk_create_recipes_query_count_constant(self):
+        """Test bulk creating costs the same queries for 2 or 200 recipes."""
+        print("Testing bulk create recipes query count...")
+        counts = []
+        for size in (2, 200):
+            payload = [
+                {
+                    "title": f"Recipe {size} {i}",
+                    "time_minutes": 5,
+                    "price": Decimal("1.00"),
+                    "tags": [{"name": f"Tag {size} {i}"}],
+                    "ingredients": [{"name": f"Ingredient {i % 7}"}],
+                }
+                for i in range(size)
+            ]
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(BULK_URL, payload, format="json")
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            counts.append(len(queries))
+
+        self.assertEqual(counts[0], counts[1])
+
+        print("Test bulk create recipes query count: OK")
+
+    def test_bulk_create_recipes_reports_item_errors(self):
+        """Test an invalid item rejects the batch with errors per item."""
+        print("Testing bulk create recipes item errors...")
+        payload = [
+            {"title": "Soup", "time_minutes": 10, "price": Decimal("3.00")},
+            {"title": "Stew", "time_minutes": 10},
+        ]
+
+        response = self.client.post(BULK_URL, payload, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(len(response.data), 2)
+        self.assertEqual(response.data[0], {})
+        self.assertIn("price", response.data[1])
+        self.assertFalse(Recipe.objects.filter(user=self.user).exists())
+
+        print("Test bulk create recipes item errors: OK")
+
+    def test_bulk_create_recipes_requires_list(self):
+        """Test bulk creating from a single object is rejected."""
+        print("Testing bulk create recipes requires a list...")
+        payload = {"title": "Soup", "time_minutes": 10, "price": Decimal("3.00")}
+
+        response = self.client.post(BULK_URL, payload, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Recipe.objects.filter(user=self.user).exists())
+
+        print("Test bulk create recipes requires a list: OK")
+
+    def test_bulk_create_recipes_changes_etag(self):
+        """Test bulk created recipes invalidate the cached list."""
+        print("Testing bulk create recipes changes the ETag...")
+        etag = self.client.get(RECIPES_URL)["ETag"]
+        payload = [{"title": "Soup", "time_minutes": 10, "price": Decimal("3.00")}]
+
+        self.client.post(BULK_URL, payload, format="json")
+
+        response = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["results"]), 1)
+
+        print("Test bulk create recipes changes the ETag: OK")
+
+    def test_bulk_update_recipes(self):
+        """Test partially updating a list of recipes, each its own fields."""
+        print("Testing bulk update recipes...")
+        soup = create_recipe(user=self.user, title="Soup", price=Decimal("3.00"))
+        stew = create_recipe(user=self.user, title="Stew", time_minutes=40)
+        payload = [
+            {"id": soup.id, "price": "3.50"},
+            {"id": stew.id, "title": "Lamb stew", "time_minutes": 90},
+        ]
+
+        response = self.client.patch(BULK_URL, payload, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["ids"], [soup.id, stew.id])
+        soup.refresh_from_db()
+        stew.refresh_from_db()
+        self.assertEqual((soup.title, soup.price), ("Soup", Decimal("3.50")))
+        self.assertEqual((stew.title, stew.time_minutes), ("Lamb stew", 90))
+        self.assertIn(stew, Recipe.objects.filter(search_vector="lamb"))
+
+        print("Test bulk update recipes: OK")
+
+    def test_bulk_update_recipes_query_count_constant(self):
+        """Test bulk updating costs the same queries for 2 or 100 recipes."""
+        print("Testing bulk update recipes query count...")
+        counts = []
+        for size in (2, 100):
+            recipes = [create_recipe(user=self.user) for _ in range(size)]
+            payload = [{"id": recipe.id, "price": "9.99"} for recipe in recipes]
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.patch(BULK_URL, payload, format="json")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            counts.append(len(queries))
+
+        self.assertEqual(counts[0], counts[1])
+        self.assertFalse(Recipe.objects.exclude(price=Decimal("9.99")).exists())
+
+        print("Test bulk update recipes query count: OK")
+
+    def test_bulk_update_other_users_recipe_error(self):
+        """Test a bulk update naming another user's recipe changes nothing."""
+        print("Testing bulk update other users recipe error...")
+        other_user = create_user(email="user2@example.com", password="test123")
+        mine = create_recipe(user=self.user, title="Mine")
+        theirs = create_recipe(user=other_user, title="Theirs")
+        payload = [
+            {"id": mine.id, "title": "Changed"},
+            {"id": theirs.id, "title": "Changed"},
+        ]
+
+        response = self.client.patch(BULK_URL, payload, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, [{}, {"id": ["Recipe not found."]}])
+
+        response = self.client.patch(BULK_URL, [{"title": "No id"}], format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("id", response.data[0])
+        mine.refresh_from_db()
+        theirs.refresh_from_db()
+        self.assertEqual((mine.title, theirs.title), ("Mine", "Theirs"))
+
+        print("Test bulk update other users recipe error: OK")
+
+    def test_bulk_delete_recipes(self):
+        """Test deleting a list of recipes and their links, not their tags."""
+        print("Testing bulk delete recipes...")
+        other_user = create_user(email="user2@example.com", password="test123")
+        recipes = self._create_recipes_with_relations(3)
+        theirs = create_recipe(user=other_user)
+        ids = [recipes[0].id, recipes[1].id, theirs.id]
+
+        response = self.client.delete(
+            f"{BULK_URL}?ids={','.join(map(str, ids))}", format="json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(sorted(response.data["ids"]), sorted(ids[:2]))
+        remaining = Recipe.objects.values_list("id", flat=True)
+        self.assertEqual(sorted(remaining), sorted([recipes[2].id, theirs.id]))
+        self.assertEqual(Recipe.tags.through.objects.count(), 2)
+        self.assertEqual(Recipe.ingredients.through.objects.count(), 2)
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 6)
+
+        print("Test bulk delete recipes: OK")
+
+    def test_bulk_delete_recipes_query_count_constant(self):
+        """Test bulk deleting costs the same queries for 2 or 50 recipes."""
+        print("Testing bulk delete recipes query count...")
+        counts = []
+        for size in (2, 50):
+            recipes = self._create_recipes_with_relations(size)
+            ids = ",".join(str(recipe.id) for recipe in recipes)
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.delete(f"{BULK_URL}?ids={ids}")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            counts.append(len(queries))
+            self.assertFalse(Recipe.objects.exists())
+            Tag.objects.all().delete()  # free the names for the next size.
+            Ingredient.objects.all().delete()
+
+        self.assertEqual(counts[0], counts[1])
+
+        print("Test bulk delete recipes query count: OK")
+
+    def test_bulk_delete_recipes_invalid_ids_error(self):
+        """Test bulk deleting without valid ids is rejected."""
+        print("Testing bulk delete recipes invalid ids...")
+        recipe = create_recipe(user=self.user)
+
+        for url in (BULK_URL, f"{BULK_URL}?ids=1,two"):
+            response = self.client.delete(url)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.assertTrue(Recipe.objects.filter(id=recipe.id).exists())
+
+        print("Test bulk delete recipes invalid ids: OK")
+
+
+@override_settings(RECIPE_LIST_FAST_PATH=True)
+class FastPathPrivateRecipeApiTests(PrivateRecipeApiTests):
+    """Run the private recipe API tests through the fast list path."""
+
+    def test_list_recipes_fast_path_same_bytes(self):
+        """Test the fast path renders the same JSON as the serializers."""
+        print("Testing list recipes fast path same bytes...")
+        self._create_recipes_with_relations(3)
+        create_recipe(
+            user=self.user, price=Decimal("0.50"), time_minutes=None, link=None
+        )
+
+        fast = self.client.get(RECIPES_URL, {"page_size": 2})
+        cache.clear()  # the same URL, so the slow path would get a cache hit.
+        with override_settings(RECIPE_LIST_FAST_PATH=False):
+            slow = self.client.get(RECIPES_URL, {"page_size": 2})
+
+        self.assertEqual((fast["X-Cache"], slow["X-Cache"]), ("MISS", "MISS"))
+        self.assertEqual(fast.content, slow.content)
+
+        print("Test list recipes fast path same bytes: OK")
+
+    def test_fast_path_fields_with_ordering(self):
+        """Test the cursor reads ordering keys that ?fields= leaves out."""
+        print("Testing fast path fields with ordering...")
+        for price in ("3.00", "1.00", "2.00"):
+            create_recipe(user=self.user, title=f"R{price}", price=Decimal(price))
+
+        params = {"fields": "title", "ordering": "-price", "page_size": 2}
+        response = self.client.get(RECIPES_URL, params)
+        following = self.client.get(response.data["next"])
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data["results"], [{"title": "R3.00"}, {"title": "R2.00"}]
+        )
+        self.assertEqual(following.data["results"], [{"title": "R1.00"}])
+
+        print("Test fast path fields with ordering: OK")
+
 
 # ----------------------------------------IMAGE----------------------------------------
 
@@ -567,6 +1416,25 @@ class ImageUploadTests(TestCase):
         self.assertIn("image", res.data)
         self.assertTrue(os.path.exists(self.recipe.image.path))
 
+    def test_upload_image_bumps_data_version(self):
+        """Test uploading an image invalidates cached reads of the user"""
+
+        print("Testing uploading an image bumps data version...")
+        url = image_upload_url(self.recipe.id)
+        version = get_user_model().objects.get_data_version(self.user.pk)
+
+        with tempfile.NamedTemporaryFile(suffix=".jpg") as image_file:
+            Image.new("RGB", (10, 10)).save(image_file, format="JPEG")
+            image_file.seek(0)
+            self.client.post(url, {"image": image_file}, format="multipart")
+
+        self.recipe.refresh_from_db()  # so tearDown removes the file.
+        self.assertGreater(
+            get_user_model().objects.get_data_version(self.user.pk), version
+        )
+
+        print("Test uploading an image bumps data version: OK")
+
     def test_upload_image_bad_request(self):
         """Test uploading an invalid image"""
 
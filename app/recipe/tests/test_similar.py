@@ -0,0 +1,166 @@
+"""
+Tests for the similar recipes API.
+"""
+import io
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from recipe.tests.helpers import create_recipe
+
+BULK_URL = reverse("recipe:recipe-bulk")
+
+
+def similar_url(recipe_id):
+    """Create and return a similar recipes URL."""
+    return reverse("recipe:recipe-similar", args=[recipe_id])
+
+
+def detail_url(recipe_id):
+    """Create and return a recipe detail URL."""
+    return reverse("recipe:recipe-detail", args=[recipe_id])
+
+
+def create_user(email="user@example.com", password="testpass123"):
+    """Create and return a new user."""
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+class PrivateSimilarApiTests(TestCase):
+    """Test the authenticated similar recipes API."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        self.soup = create_recipe(
+            self.user, "Soup", ["Dinner"], ["Leek", "Potato", "Salt", "Butter"]
+        )
+
+    def similar(self, recipe):
+        """Return the (title, similarity) pairs listed for the recipe."""
+        response = self.client.get(similar_url(recipe.id))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        return [(r["title"], r["similarity"]) for r in response.data]
+
+    def test_similar_ranks_by_jaccard(self):
+        """Test recipes rank by the share of tags and ingredients in common."""
+        print("Testing similar ranks by jaccard...")
+        create_recipe(
+            self.user, "Twin", ["Dinner"], ["Leek", "Potato", "Salt", "Butter"]
+        )
+        create_recipe(
+            self.user, "Cousin", ["Dinner"], ["Leek", "Potato", "Salt", "Cream"]
+        )
+
+        with self.assertNumQueries(3):  # data version, recipe and ranking.
+            response = self.client.get(similar_url(self.soup.id))
+
+        self.assertEqual(
+            [(r["title"], r["similarity"]) for r in response.data],
+            [("Twin", 1.0), ("Cousin", 4 / 6)],
+        )
+
+        print("Test similar ranks by jaccard: OK")
+
+    def test_similar_follows_link_changes(self):
+        """Test the signature follows tags and ingredients being rewritten."""
+        print("Testing similar follows link changes...")
+        stew = create_recipe(self.user, "Stew", ["Lunch"], ["Beef", "Carrot"])
+        self.assertEqual(self.similar(self.soup), [])
+
+        response = self.client.patch(
+            detail_url(stew.id),
+            {
+                "tags": [{"name": "Dinner"}],
+                "ingredients": [{"name": n} for n in ("Leek", "Potato", "Salt")],
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.similar(self.soup), [("Stew", 4 / 5)])
+
+        stew.tags.clear()
+        stew.ingredients.clear()
+        stew.refresh_from_db()
+
+        self.assertIsNone(stew.minhash)
+        self.assertIsNone(stew.lsh_bands)
+        self.assertEqual(self.similar(self.soup), [])
+        self.assertEqual(self.similar(stew), [])
+
+        print("Test similar follows link changes: OK")
+
+    def test_similar_follows_bulk_create_and_import(self):
+        """Test links written by the bulk endpoint and the importer are hashed."""
+        print("Testing similar follows bulk create and import...")
+        payload = [
+            {
+                "title": "Bulk soup",
+                "time_minutes": 10,
+                "price": "1.00",
+                "tags": [{"name": "Dinner"}],
+                "ingredients": [{"name": n} for n in ("Leek", "Potato", "Salt")],
+            }
+        ]
+        response = self.client.post(BULK_URL, payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        stdin = io.StringIO(
+            '{"title": "Imported soup", "price": "1.00", "tags": ["Dinner"],'
+            ' "ingredients": ["Leek", "Potato", "Salt", "Butter"]}\n'
+        )
+
+        with patch("sys.stdin", stdin):
+            call_command(
+                "import_recipes",
+                self.user.email,
+                "-",
+                "--format=ndjson",
+                stdout=io.StringIO(),
+            )
+
+        self.assertEqual(
+            self.similar(self.soup), [("Imported soup", 1.0), ("Bulk soup", 4 / 5)]
+        )
+
+        print("Test similar follows bulk create and import: OK")
+
+    def test_similar_limit(self):
+        """Test `limit` caps the recipes returned."""
+        print("Testing similar limit...")
+        for i in range(3):
+            create_recipe(self.user, f"Soup {i}", ["Dinner"], ["Leek", "Potato"])
+
+        response = self.client.get(similar_url(self.soup.id), {"limit": 2})
+        malformed = self.client.get(similar_url(self.soup.id), {"limit": "two"})
+
+        self.assertEqual(len(response.data), 2)
+        self.assertEqual(malformed.status_code, status.HTTP_400_BAD_REQUEST)
+
+        print("Test similar limit: OK")
+
+    def test_similar_limited_to_user(self):
+        """Test other users' recipes are neither listed nor looked up."""
+        print("Testing similar limited to user...")
+        other_user = create_user(email="other@example.com")
+        other_soup = create_recipe(
+            other_user, "Other soup", ["Dinner"], ["Leek", "Potato", "Salt", "Butter"]
+        )
+
+        listed = self.client.get(similar_url(self.soup.id))
+        looked_up = self.client.get(similar_url(other_soup.id))
+
+        self.assertEqual(listed.data, [])
+        self.assertEqual(looked_up.status_code, status.HTTP_404_NOT_FOUND)
+
+        print("Test similar limited to user: OK")
@@ -3,7 +3,9 @@ Tests for the tags API.
 """
 from decimal import Decimal
 from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from rest_framework import status
@@ -64,7 +66,7 @@ class PrivateTagsApiTests(TestCase):
         serializer = TagSerializer(tags, many=True)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data, serializer.data)
+        self.assertEqual(response.data["results"], serializer.data)
 
         print("Test retrieving tags: OK")
 
@@ -81,9 +83,9 @@ class PrivateTagsApiTests(TestCase):
         response = self.client.get(TAGS_URL)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]["name"], tag.name)
-        self.assertEqual(response.data[0]["id"], tag.id)
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertEqual(response.data["results"][0]["name"], tag.name)
+        self.assertEqual(response.data["results"][0]["id"], tag.id)
 
         print("Test that tags returned are for the authenticated user: OK")
 
@@ -104,6 +106,21 @@ class PrivateTagsApiTests(TestCase):
 
         print("Test updating a tag: OK")
 
+    def test_update_tag_to_existing_name_error(self):
+        """Test renaming a tag to a name the user already has fails."""
+
+        print("Test renaming a tag to an existing name.")
+        Tag.objects.create(user=self.user, name="Vegan")
+        tag = Tag.objects.create(user=self.user, name="Dessert")
+
+        res = self.client.patch(tag_detail_url(tag.id), {"name": "Vegan"})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        tag.refresh_from_db()
+        self.assertEqual(tag.name, "Dessert")
+
+        print("Test renaming a tag to an existing name: OK")
+
     def test_delete_tag(self):
         """Test deleting a tag."""
 
@@ -139,8 +156,8 @@ class PrivateTagsApiTests(TestCase):
         serializer1 = TagSerializer(tag1)
         serializer2 = TagSerializer(tag2)
 
-        self.assertIn(serializer1.data, response.data)
-        self.assertNotIn(serializer2.data, response.data)
+        self.assertIn(serializer1.data, response.data["results"])
+        self.assertNotIn(serializer2.data, response.data["results"])
 
         print("Test filtering tags by those assigned to recipes: OK")
 
@@ -161,6 +178,127 @@ class PrivateTagsApiTests(TestCase):
 
         response = self.client.get(TAGS_URL, {"assigned_only": 1})
 
-        self.assertEqual(len(response.data), 1)
+        self.assertEqual(len(response.data["results"]), 1)
 
         print("Test filtered tags by assigned returns unique items: OK")
+
+    def _create_tags_used(self, usage):
+        """Create a tag per {name: count} used by that many recipes."""
+        tags = {}
+        for name, count in usage.items():
+            tags[name] = Tag.objects.create(user=self.user, name=name)
+            for i in range(count):
+                recipe = Recipe.objects.create(
+                    title=f"{name} {i}", price=Decimal("1.00"), user=self.user
+                )
+                recipe.tags.add(tags[name])
+
+        return tags
+
+    def test_tags_with_counts(self):
+        """Test listing tags with the number of recipes using each one."""
+
+        print("Test tags with counts.")
+        self._create_tags_used({"Breakfast": 2, "Lunch": 0, "Dinner": 1})
+
+        with self.assertNumQueries(2):  # the cache version and the page.
+            response = self.client.get(TAGS_URL, {"with_counts": 1})
+
+        counts = {tag["name"]: tag["recipe_count"] for tag in response.data["results"]}
+        self.assertEqual(counts, {"Breakfast": 2, "Lunch": 0, "Dinner": 1})
+
+        print("Test tags with counts: OK")
+
+    def test_tags_ordered_by_recipe_count(self):
+        """Test paging tags by usage, most used first, ties by name."""
+
+        print("Test tags ordered by recipe count.")
+        self._create_tags_used({"Breakfast": 1, "Lunch": 3, "Dinner": 1, "Snack": 0})
+
+        response = self.client.get(
+            TAGS_URL, {"ordering": "-recipe_count", "page_size": 1}
+        )
+        names = [tag["name"] for tag in response.data["results"]]
+        while response.data["next"]:
+            response = self.client.get(response.data["next"])
+            names += [tag["name"] for tag in response.data["results"]]
+
+        self.assertEqual(names, ["Lunch", "Breakfast", "Dinner", "Snack"])
+
+        print("Test tags ordered by recipe count: OK")
+
+    def test_tags_assigned_only_uses_exists(self):
+        """Test assigned_only is a semi-join, with no DISTINCT over a join."""
+
+        print("Test tags assigned only uses EXISTS.")
+        self._create_tags_used({"Breakfast": 2})
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(TAGS_URL, {"assigned_only": 1})
+
+        sql = queries.captured_queries[-1]["sql"]
+        self.assertIn("EXISTS", sql)
+        self.assertNotIn("DISTINCT", sql)
+
+        print("Test tags assigned only uses EXISTS: OK")
+
+    def test_tags_invalid_ordering_error(self):
+        """Test an unknown ordering is rejected."""
+
+        print("Test tags invalid ordering.")
+
+        response = self.client.get(TAGS_URL, {"ordering": "user"})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        print("Test tags invalid ordering: OK")
+
+    def test_tags_invalid_flags_error(self):
+        """Test flags other than 0 or 1 are rejected."""
+
+        print("Test tags invalid flags.")
+
+        for params in (
+            {"with_counts": "yes"},
+            {"with_counts": "-1"},
+            {"assigned_only": "true"},
+            {"assigned_only": "2"},
+        ):
+            response = self.client.get(TAGS_URL, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        print("Test tags invalid flags: OK")
+
+    def test_tags_paginated_by_name_and_id(self):
+        """Test tag pages walk the names in order without skipping rows."""
+
+        print("Test tags paginated by name and id.")
+        tags = [
+            Tag.objects.create(user=self.user, name=name)
+            for name in ["Dinner", "Dinner party", "Lunch", "Brunch"]
+        ]
+        expected_ids = [tag.id for tag in sorted(tags, key=lambda tag: tag.name)][::-1]
+
+        response = self.client.get(TAGS_URL, {"page_size": 1})
+        seen_ids = [tag["id"] for tag in response.data["results"]]
+        while response.data["next"]:
+            response = self.client.get(response.data["next"])
+            seen_ids += [tag["id"] for tag in response.data["results"]]
+
+        self.assertEqual(seen_ids, expected_ids)
+
+        print("Test tags paginated by name and id: OK")
+
+    def test_typeahead_tags(self):
+        """Test typeahead returns tags starting with the query first."""
+
+        print("Test typeahead tags.")
+        dinner = Tag.objects.create(user=self.user, name="Dinner")
+        Tag.objects.create(user=self.user, name="Breakfast")
+
+        response = self.client.get(TAGS_URL, {"q": "din"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, [TagSerializer(dinner).data])
+
+        print("Test typeahead tags: OK")
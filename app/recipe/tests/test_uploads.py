@@ -0,0 +1,313 @@
+"""
+Tests for the resumable recipe image upload API.
+"""
+import io
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest.mock import patch
+
+from PIL import Image
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import ImageBlob, ImageUpload, Recipe
+
+CHUNK_TYPE = "application/offset+octet-stream"
+
+
+def uploads_url(recipe_id):
+    """Create and return the URL starting uploads to a recipe."""
+    return reverse("recipe:recipe-image-uploads", args=[recipe_id])
+
+
+def upload_url(upload):
+    """Create and return the URL of an upload."""
+    return reverse("recipe:recipe-image-upload", args=[upload.recipe_id, upload.id])
+
+
+def bulk_delete_url(*recipe_ids):
+    """Create and return the URL bulk deleting recipes."""
+    ids = ",".join(str(recipe_id) for recipe_id in recipe_ids)
+    return f"{reverse('recipe:recipe-bulk')}?ids={ids}"
+
+
+def finalize_url(upload):
+    """Create and return the URL finalizing an upload."""
+    return reverse(
+        "recipe:recipe-finalize-image-upload", args=[upload.recipe_id, upload.id]
+    )
+
+
+def create_user(email="user@example.com", password="testpass123"):
+    """Create and return a new user."""
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+def png_bytes(size=(64, 48)):
+    """Return the bytes of a PNG of noise, too random to compress much."""
+    image = Image.effect_noise(size, 64)
+    data = io.BytesIO()
+    image.save(data, format="PNG")
+    return data.getvalue()
+
+
+@override_settings(RECIPE_IMAGE_WORKERS=0)
+class PrivateImageUploadApiTests(TestCase):
+    """Test the authenticated resumable upload API."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        media = override_settings(MEDIA_ROOT=self.media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.addCleanup(shutil.rmtree, self.media_root)
+
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user, title="Soup", price=Decimal("1.00")
+        )
+        self.image = png_bytes()
+
+    def start(self, size=None, filename="photo.png"):
+        """Start an upload of the image and return it."""
+        response = self.client.post(
+            uploads_url(self.recipe.id),
+            {"filename": filename, "size": size or len(self.image)},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        return ImageUpload.objects.get(id=response.data["id"])
+
+    def put(self, upload, offset, data):
+        """Send the chunk starting at `offset` and return the response."""
+        return self.client.put(
+            upload_url(upload),
+            data,
+            content_type=CHUNK_TYPE,
+            HTTP_UPLOAD_OFFSET=str(offset),
+        )
+
+    def test_upload_in_chunks(self):
+        """Test an image sent in chunks becomes the recipe's image by rename."""
+        print("Testing upload in chunks...")
+        upload = self.start()
+        partial = os.path.join(self.media_root, upload.partial_name)
+        half = len(self.image) // 2
+
+        first = self.put(upload, 0, self.image[:half])
+        resumed = self.client.get(upload_url(upload))
+        self.put(upload, half, self.image[half:])
+        with self.captureOnCommitCallbacks(execute=True):
+            finalized = self.client.post(finalize_url(upload))
+        self.recipe.refresh_from_db()
+
+        self.assertEqual(first["Upload-Offset"], str(half))
+        self.assertEqual(resumed.data["offset"], half)
+        self.assertEqual(finalized.status_code, status.HTTP_200_OK)
+        self.assertEqual(finalized.data["id"], self.recipe.id)
+        with open(self.recipe.image.path, "rb") as image:
+            self.assertEqual(image.read(), self.image)
+        self.assertTrue(self.recipe.image.name.endswith(".png"))
+        self.assertIn("jpeg", self.recipe.image_derivatives)
+        self.assertFalse(os.path.exists(partial))
+        self.assertFalse(ImageUpload.objects.exists())
+
+        print("Test upload in chunks: OK")
+
+    def test_duplicate_upload_dropped_for_stored_image(self):
+        """Test an upload of a stored image references it instead of moving in."""
+        print("Testing duplicate upload dropped for stored image...")
+        other = Recipe.objects.create(user=self.user, title="Stew", price=1)
+        other.image.save("photo.png", io.BytesIO(self.image))
+        upload = self.start()
+        self.put(upload, 0, self.image)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(finalize_url(upload))
+        self.recipe.refresh_from_db()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.recipe.image.name, other.image.name)
+        self.assertEqual(ImageBlob.objects.get(name=other.image.name).ref_count, 2)
+        self.assertFalse(
+            os.path.exists(os.path.join(self.media_root, upload.partial_name))
+        )
+
+        print("Test duplicate upload dropped for stored image: OK")
+
+    def test_failed_finalize_keeps_upload_resumable(self):
+        """Test a finalize rolled back leaves the received file to retry with."""
+        print("Testing failed finalize keeps upload resumable...")
+        upload = self.start()
+        self.put(upload, 0, self.image)
+
+        with patch("recipe.uploads.replace_image", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.client.post(finalize_url(upload))
+        kept = os.path.exists(os.path.join(self.media_root, upload.partial_name))
+        with self.captureOnCommitCallbacks(execute=True):
+            retried = self.client.post(finalize_url(upload))
+        self.recipe.refresh_from_db()
+
+        self.assertTrue(kept)
+        self.assertEqual(retried.status_code, status.HTTP_200_OK)
+        with open(self.recipe.image.path, "rb") as image:
+            self.assertEqual(image.read(), self.image)
+
+        print("Test failed finalize keeps upload resumable: OK")
+
+    def test_chunk_at_wrong_offset_conflicts(self):
+        """Test a chunk not starting at the received offset is refused."""
+        print("Testing chunk at wrong offset conflicts...")
+        upload = self.start()
+        self.put(upload, 0, self.image[:10])
+
+        repeated = self.put(upload, 0, self.image[:10])
+        skipped = self.put(upload, 20, self.image[20:30])
+        malformed = self.put(upload, "ten", self.image[10:20])
+
+        self.assertEqual(repeated.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(repeated["Upload-Offset"], "10")
+        self.assertEqual(skipped.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(malformed.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(ImageUpload.objects.get(id=upload.id).offset, 10)
+
+        print("Test chunk at wrong offset conflicts: OK")
+
+    @override_settings(RECIPE_UPLOAD_CHUNK_SIZE=16)
+    def test_chunk_size_limits(self):
+        """Test chunks over the chunk size or past the image size are refused."""
+        print("Testing chunk size limits...")
+        upload = self.start(size=20)
+
+        too_large = self.put(upload, 0, b"x" * 17)
+        self.put(upload, 0, b"x" * 16)
+        past_end = self.put(upload, 16, b"x" * 5)
+
+        self.assertEqual(
+            too_large.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        )
+        self.assertEqual(past_end.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(ImageUpload.objects.get(id=upload.id).offset, 16)
+
+        print("Test chunk size limits: OK")
+
+    def test_invalid_session_error(self):
+        """Test uploads of unknown extensions or sizes are not started."""
+        print("Testing invalid session...")
+        url = uploads_url(self.recipe.id)
+
+        with override_settings(RECIPE_UPLOAD_MAX_SIZE=100):
+            too_large = self.client.post(
+                url, {"filename": "a.png", "size": 101}, format="json"
+            )
+        not_image = self.client.post(
+            url, {"filename": "a.exe", "size": 10}, format="json"
+        )
+        empty = self.client.post(url, {"filename": "a.png", "size": 0}, format="json")
+
+        self.assertEqual(too_large.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(not_image.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(empty.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(ImageUpload.objects.exists())
+
+        print("Test invalid session: OK")
+
+    def test_finalize_incomplete_or_invalid_error(self):
+        """Test finalizing waits for every byte and drops non-images."""
+        print("Testing finalize incomplete or invalid...")
+        upload = self.start()
+        self.put(upload, 0, self.image[:10])
+
+        incomplete = self.client.post(finalize_url(upload))
+        self.put(upload, 10, b"x" * (len(self.image) - 10))
+        with self.captureOnCommitCallbacks(execute=True):
+            invalid = self.client.post(finalize_url(upload))
+
+        self.assertEqual(incomplete.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(invalid.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(ImageUpload.objects.exists())
+        self.assertFalse(
+            os.path.exists(os.path.join(self.media_root, upload.partial_name))
+        )
+        self.recipe.refresh_from_db()
+        self.assertFalse(self.recipe.image)
+
+        print("Test finalize incomplete or invalid: OK")
+
+    def test_cancel_and_expire_remove_chunks(self):
+        """Test cancelled and expired uploads leave no files behind."""
+        print("Testing cancel and expire remove chunks...")
+        cancelled = self.start()
+        expired = self.start()
+        ImageUpload.objects.filter(id=expired.id).update(
+            created_at=timezone.now() - timedelta(days=2)
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(upload_url(cancelled))
+            self.start()
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(ImageUpload.objects.count(), 1)
+        for upload in (cancelled, expired):
+            self.assertFalse(
+                os.path.exists(os.path.join(self.media_root, upload.partial_name))
+            )
+
+        print("Test cancel and expire remove chunks: OK")
+
+    def test_bulk_delete_removes_pending_upload(self):
+        """Test bulk deleting a recipe drops its pending upload and chunks."""
+        print("Testing bulk delete removes pending upload...")
+        upload = self.start()
+        self.put(upload, 0, self.image[:10])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(bulk_delete_url(self.recipe.id))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["ids"], [self.recipe.id])
+        self.assertFalse(ImageUpload.objects.exists())
+        self.assertFalse(
+            os.path.exists(os.path.join(self.media_root, upload.partial_name))
+        )
+
+        print("Test bulk delete removes pending upload: OK")
+
+    def test_uploads_limited_to_user(self):
+        """Test other users' recipes and uploads can't be written to."""
+        print("Testing uploads limited to user...")
+        other_user = create_user(email="other@example.com")
+        other_recipe = Recipe.objects.create(
+            user=other_user, title="Stew", price=Decimal("1.00")
+        )
+        other_upload = ImageUpload.objects.create(
+            recipe=other_recipe, filename="a.png", size=10
+        )
+
+        started = self.client.post(
+            uploads_url(other_recipe.id),
+            {"filename": "a.png", "size": 10},
+            format="json",
+        )
+        written = self.put(other_upload, 0, b"x" * 10)
+        finalized = self.client.post(finalize_url(other_upload))
+
+        self.assertEqual(started.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(written.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(finalized.status_code, status.HTTP_404_NOT_FOUND)
+
+        print("Test uploads limited to user: OK")
@@ -0,0 +1,202 @@
+"""
+Tests for the tag and ingredient usage counters.
+"""
+import io
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe, Tag
+
+RECIPES_URL = reverse("recipe:recipe-list")
+BULK_URL = reverse("recipe:recipe-bulk")
+
+
+def detail_url(recipe_id):
+    """Create and return a recipe detail URL."""
+    return reverse("recipe:recipe-detail", args=[recipe_id])
+
+
+def create_user(email="user@example.com", password="testpass123"):
+    """Create and return a new user."""
+    return get_user_model().objects.create_user(email=email, password=password)
+
+
+def recipe_payload(title, tags=(), ingredients=()):
+    """Return a recipe payload linking tags and ingredients by name."""
+    return {
+        "title": title,
+        "time_minutes": 10,
+        "price": Decimal("2.50"),
+        "tags": [{"name": name} for name in tags],
+        "ingredients": [{"name": name} for name in ingredients],
+    }
+
+
+class UsageCountTests(TestCase):
+    """Test recipe_count follows every way links are written."""
+
+    def setUp(self):
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assertCounts(self, model, expected):
+        """Assert the user's {name: recipe_count} for tags or ingredients."""
+        counts = dict(
+            model.objects.filter(user=self.user).values_list("name", "recipe_count")
+        )
+        self.assertEqual(counts, expected)
+
+    def test_counts_follow_create_and_update(self):
+        """Test creating and updating recipes keeps the counters exact."""
+        print("Testing usage counts follow create and update...")
+        for title in ("Soup", "Stew"):
+            self.client.post(
+                RECIPES_URL,
+                recipe_payload(title, ["Dinner", "Warm"], ["Salt"]),
+                format="json",
+            )
+        self.assertCounts(Tag, {"Dinner": 2, "Warm": 2})
+        self.assertCounts(Ingredient, {"Salt": 2})
+        self.assertEqual(Recipe.objects.get(title="Soup").ingredient_count, 1)
+
+        soup = Recipe.objects.get(title="Soup")
+        response = self.client.patch(
+            detail_url(soup.id),
+            {"tags": [{"name": "Dinner"}, {"name": "Quick"}], "ingredients": []},
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertCounts(Tag, {"Dinner": 2, "Warm": 1, "Quick": 1})
+        self.assertCounts(Ingredient, {"Salt": 1})
+        soup.refresh_from_db()
+        self.assertEqual(soup.ingredient_count, 0)
+
+        print("Test usage counts follow create and update: OK")
+
+    def test_counts_follow_bulk_create_and_delete(self):
+        """Test the bulk endpoints, which write links in raw SQL, keep counts."""
+        print("Testing usage counts follow bulk create and delete...")
+        payload = [
+            recipe_payload(f"Recipe {i}", ["Dinner", f"Tag {i % 2}"], ["Salt"])
+            for i in range(6)
+        ]
+        response = self.client.post(BULK_URL, payload, format="json")
+        self.assertCounts(Tag, {"Dinner": 6, "Tag 0": 3, "Tag 1": 3})
+
+        ids = response.data["ids"][:4]  # two of "Tag 0" and two of "Tag 1".
+        self.client.delete(f"{BULK_URL}?ids={','.join(map(str, ids))}")
+
+        self.assertCounts(Tag, {"Dinner": 2, "Tag 0": 1, "Tag 1": 1})
+        self.assertCounts(Ingredient, {"Salt": 2})
+
+        print("Test usage counts follow bulk create and delete: OK")
+
+    def test_counts_follow_import(self):
+        """Test links copied in by the importer are counted."""
+        print("Testing usage counts follow import...")
+        Tag.objects.create(user=self.user, name="Dinner")
+        stdin = io.StringIO(
+            '{"title": "Soup", "price": "1.00", "tags": ["Dinner", "Warm"]}\n'
+            '{"title": "Stew", "price": "1.00", "tags": ["Dinner"]}\n'
+        )
+
+        with patch("sys.stdin", stdin):
+            call_command(
+                "import_recipes",
+                self.user.email,
+                "-",
+                "--format=ndjson",
+                stdout=io.StringIO(),
+            )
+
+        self.assertCounts(Tag, {"Dinner": 2, "Warm": 1})
+
+        print("Test usage counts follow import: OK")
+
+    def test_counts_follow_cascading_deletes(self):
+        """Test deleting a recipe or a whole user leaves other counts exact."""
+        print("Testing usage counts follow cascading deletes...")
+        other_user = create_user(email="other@example.com")
+        for user in (self.user, other_user):
+            tag = Tag.objects.create(user=user, name="Dinner")
+            for title in ("Soup", "Stew"):
+                Recipe.objects.create(
+                    user=user, title=title, price=Decimal("1.00")
+                ).tags.add(tag)
+
+        Recipe.objects.filter(user=self.user, title="Soup").delete()
+        self.assertCounts(Tag, {"Dinner": 1})
+
+        self.user.delete()
+
+        self.assertEqual(Tag.objects.get(user=other_user).recipe_count, 2)
+
+        print("Test usage counts follow cascading deletes: OK")
+
+    def test_tag_rename_keeps_count(self):
+        """Test saving a stale tag does not write its old count back."""
+        print("Testing tag rename keeps the count...")
+        tag = Tag.objects.create(user=self.user, name="Dinner")
+        Recipe.objects.create(
+            user=self.user, title="Soup", price=Decimal("1.00")
+        ).tags.add(tag)
+
+        tag.name = "Supper"  # tag.recipe_count is still the 0 it was read with.
+        tag.save()
+
+        self.assertCounts(Tag, {"Supper": 1})
+
+        print("Test tag rename keeps the count: OK")
+
+
+class RecountUsageCommandTests(TestCase):
+    """Test the recount_usage command."""
+
+    def test_recount_usage_fixes_drift(self):
+        """Test drifted counters are recounted, in batches."""
+        print("Testing recount usage fixes drift...")
+        user = create_user()
+        tags = [Tag.objects.create(user=user, name=f"Tag {i}") for i in range(5)]
+        recipe = Recipe.objects.create(user=user, title="Soup", price=Decimal("1.00"))
+        recipe.tags.add(*tags[:3])
+        Tag.objects.filter(id__in=[tags[0].id, tags[4].id]).update(recipe_count=7)
+        out = io.StringIO()
+
+        call_command("recount_usage", "--batch-size=2", stdout=out)
+
+        counts = list(Tag.objects.order_by("id").values_list("recipe_count", flat=True))
+        self.assertEqual(counts, [1, 1, 1, 0, 0])
+        self.assertIn("tags: checked 5, fixed 2", out.getvalue())
+        self.assertIn("ingredients: checked 0, fixed 0", out.getvalue())
+        self.assertIn("recipes: checked 1, fixed 0", out.getvalue())
+
+        print("Test recount usage fixes drift: OK")
+
+    def test_recount_usage_fixes_recipe_ingredient_counts(self):
+        """Test drifted ingredient counts of recipes are recounted."""
+        print("Testing recount usage fixes recipe ingredient counts...")
+        user = create_user()
+        recipe = Recipe.objects.create(user=user, title="Soup", price=Decimal("1.00"))
+        recipe.ingredients.add(Ingredient.objects.create(user=user, name="Salt"))
+        Recipe.objects.filter(id=recipe.id).update(ingredient_count=0)
+        version = get_user_model().objects.get_data_version(user.id)
+        out = io.StringIO()
+
+        call_command("recount_usage", "--only=recipes", stdout=out)
+
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.ingredient_count, 1)
+        self.assertEqual(out.getvalue().strip(), "recipes: checked 1, fixed 1")
+        self.assertGreater(get_user_model().objects.get_data_version(user.id), version)
+
+        print("Test recount usage fixes recipe ingredient counts: OK")
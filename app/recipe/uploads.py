@@ -0,0 +1,102 @@
+"""
+Resumable image uploads for recipe APIs
+"""
+import os
+from datetime import timedelta
+
+from PIL import Image
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from core.models import ImageUpload, recipe_image_file_path
+from core.storage import recipe_image_storage
+from recipe.images import replace_image
+
+UPLOAD_READ_SIZE = 64 * 1024  # bytes read from the request and written at once.
+
+
+class UploadBusy(APIException):
+    """The upload is locked by a request writing a chunk to it."""
+
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "Another request is writing to this upload."
+    default_code = "upload_busy"
+
+
+class ChunkTooLarge(APIException):
+    """A chunk larger than RECIPE_UPLOAD_CHUNK_SIZE."""
+
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = "Send the image in smaller chunks."
+    default_code = "chunk_too_large"
+
+
+def start_upload(recipe, filename, size):
+    """Open an upload of an image of `size` bytes, dropping the expired ones."""
+    expired = timezone.now() - timedelta(seconds=settings.RECIPE_UPLOAD_EXPIRY)
+    ImageUpload.objects.filter(created_at__lt=expired).delete()
+
+    upload = ImageUpload.objects.create(recipe=recipe, filename=filename, size=size)
+    path = default_storage.path(upload.partial_name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, "xb").close()
+
+    return upload
+
+
+def write_chunk(upload, stream, length):
+    """Append up to `length` bytes of `stream` at the upload's offset.
+
+    The bytes go from the request to the file a buffer at a time, so memory
+    stays flat whatever the chunk size. A client dropping mid-chunk keeps
+    what arrived: the offset records every byte written, ready to resume.
+    """
+    written = 0
+    with open(default_storage.path(upload.partial_name), "r+b") as partial:
+        partial.seek(upload.offset)
+        while written < length:
+            try:
+                data = stream.read(min(UPLOAD_READ_SIZE, length - written))
+            except OSError:  # the client went away.
+                break
+            if not data:
+                break
+            partial.write(data)
+            written += len(data)
+        partial.flush()
+        os.fsync(partial.fileno())  # on disk before the offset says so.
+
+    upload.offset += written
+    upload.save(update_fields=["offset"])
+    return written
+
+
+def is_image(upload):
+    """Return whether the received file is an image Pillow can read."""
+    try:
+        with Image.open(default_storage.path(upload.partial_name)) as image:
+            image.verify()
+    except Exception:
+        return False
+
+    return True
+
+
+def finish_upload(upload):
+    """Move the received file in as the recipe's image and close the upload."""
+    recipe = upload.recipe
+    # the chunks were written in place, so the whole file moves by a rename,
+    # or is dropped for the stored copy of the same image. Both wait for the
+    # commit, before the derivatives replace_image() schedules for it.
+    name = recipe_image_storage.adopt(
+        default_storage.path(upload.partial_name),
+        recipe_image_file_path(recipe, upload.filename),
+    )
+
+    replace_image(recipe, name)
+    upload.delete()
+    return recipe
@@ -1,6 +1,8 @@
 """
 Views for recipe APIs
 """
+from decimal import Decimal
+from functools import partial
 from math import e
 from drf_spectacular.utils import (
     extend_schema,
@@ -8,35 +10,127 @@ from drf_spectacular.utils import (
     OpenApiParameter,
     OpenApiTypes,
 )
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    TrigramWordSimilarity,
+)
+from django.db import OperationalError, connection, transaction
+from django.db.models import Count, Exists, F, FloatField, OuterRef
+from django.db.models.functions import Cast
+from django.http import StreamingHttpResponse
 from rest_framework import viewsets, mixins, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
 from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 
-from core.models import Recipe, Tag, Ingredient
+from core.models import ImageUpload, Recipe, Tag, Ingredient
+from core.storage import recipe_image_storage
 from recipe import serializers
+from recipe.export import EXPORT_CONTENT_TYPES, export_recipes
+from recipe.facets import FACET_LIMIT, recipe_facets
+from recipe.mixins import CachedListMixin, ConditionalGetMixin
+from recipe.pagination import RankedPagination
+from recipe.pantry import PANTRY_ORDERING, pantry_matches
+from recipe.similar import similar_recipes
+from recipe.uploads import (
+    ChunkTooLarge,
+    UploadBusy,
+    finish_upload,
+    is_image,
+    start_upload,
+    write_chunk,
+)
 
 # NOTE: this is a decorator that we use to add extra information to our schema.
 
 
+FIELDS_PARAMETERS = [
+    OpenApiParameter(
+        "fields",
+        OpenApiTypes.STR,
+        description="Comma separated list of fields to return",
+    ),
+    OpenApiParameter(
+        "exclude",
+        OpenApiTypes.STR,
+        description="Comma separated list of fields to leave out",
+    ),
+]
+
+
+FILTER_PARAMETERS = [
+    OpenApiParameter(
+        "tags",
+        OpenApiTypes.STR,  # We use string because it will be transformed to a list of integers.
+        description="Comma separated list of tags to filter by",
+    ),
+    OpenApiParameter(
+        "ingredients",
+        OpenApiTypes.STR,
+        description="Comma separated list of ingredients to filter by",
+    ),
+    OpenApiParameter(
+        "search",
+        OpenApiTypes.STR,
+        description="Search title and description, best matches first",
+    ),
+    OpenApiParameter(
+        "match",
+        OpenApiTypes.STR,
+        enum=["any", "all"],
+        description="Return recipes matching any (default) or all ids",
+    ),
+    OpenApiParameter(
+        "price_min",
+        OpenApiTypes.NUMBER,
+        description="Return recipes costing at least this much",
+    ),
+    OpenApiParameter(
+        "price_max",
+        OpenApiTypes.NUMBER,
+        description="Return recipes costing at most this much",
+    ),
+    OpenApiParameter(
+        "time_max",
+        OpenApiTypes.INT,
+        description="Return recipes taking at most this many minutes",
+    ),
+]
+
+
+ORDERING_PARAMETERS = [
+    OpenApiParameter(
+        "ordering",
+        OpenApiTypes.STR,
+        description="Comma separated list of price, time_minutes and id, each"
+        " prefixed with - to sort descending (default -id, or by search rank)",
+    ),
+]
+
+
+UPLOAD_PARAMETERS = [
+    OpenApiParameter(
+        "upload_id",
+        OpenApiTypes.UUID,
+        OpenApiParameter.PATH,
+        description="Id of the upload, as returned when it was started",
+    ),
+]
+
+
 @extend_schema_view(
+    retrieve=extend_schema(parameters=FIELDS_PARAMETERS),
     list=extend_schema(
-        parameters=[
-            OpenApiParameter(
-                "tags",
-                OpenApiTypes.STR,  # We use string because it will be transformed to a list of integers.
-                description="Comma separated list of tags to filter by",
-            ),
-            OpenApiParameter(
-                "ingredients",
-                OpenApiTypes.STR,
-                description="Comma separated list of ingredients to filter by",
-            ),
-        ]
-    )
+        parameters=FIELDS_PARAMETERS + FILTER_PARAMETERS + ORDERING_PARAMETERS
+    ),
 )
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(ConditionalGetMixin, CachedListMixin, viewsets.ModelViewSet):
     """View for manage recipe APIs"""
 
     serializer_class = (
@@ -48,37 +142,201 @@ class RecipeViewSet(viewsets.ModelViewSet):
     authentication_classes = [TokenAuthentication]
     permission_classes = [IsAuthenticated]
 
+    NESTED_RELATIONS = ("tags", "ingredients")  # rendered by nested serializers.
+    MATCH_MODES = ("any", "all")
+    FILTERS = ("tags", "ingredients", "search", "price_min", "price_max", "time_max")
+    ORDERING_FIELDS = ("price", "time_minutes", "id")
+    BULK_MAX_ITEMS = 10_000
+    MAX_FACET_LIMIT = 100
+    MAX_PANTRY_ITEMS = 200
+    SIMILAR_LIMIT = 10
+    MAX_SIMILAR_LIMIT = 50
+    UPLOAD_PATH = r"image-uploads/(?P<upload_id>[^/.]+)"
+
     def _params_to_ints(self, qs):
         """Convert a list of strings to integers."""
         return [int(str_id) for str_id in qs.split(",")]
 
     def get_queryset(self):
         """Return recipes for authenticated user."""
+        queryset = self._filter_recipes(self.queryset)
+        queryset = queryset.filter(user=self.request.user).order_by("-id")
+
+        ordering = self._ordering()
+        search = self.request.query_params.get("search")
+        if ordering:
+            queryset = queryset.order_by(*ordering)
+        elif search:
+            rank = SearchRank(F("search_vector"), self._search_query(search))
+            queryset = queryset.annotate(
+                rank=Cast(rank, FloatField())  # float8 round-trips in cursors.
+            ).order_by(
+                "-rank", "-id"
+            )  # best matches first.
+
+        return self._apply_fetch_plan(queryset)
+
+    def _filter_recipes(self, queryset):
+        """Apply the tags, ingredients and search filters of the request."""
         tags = self.request.query_params.get("tags")
         ingredients = self.request.query_params.get("ingredients")
-        queryset = self.queryset
+        search = self.request.query_params.get("search")
+        match = self.request.query_params.get("match", "any")
+
+        if match not in self.MATCH_MODES:
+            raise ValidationError({"match": f"Must be one of {self.MATCH_MODES}."})
 
         if tags:
             tags_ids = self._params_to_ints(tags)  # convert to list of integers
-            queryset = queryset.filter(tags__id__in=tags_ids)  # filter by tags
+            queryset = self._filter_by_relation(queryset, Recipe.tags, tags_ids, match)
 
         if ingredients:
-            ingredients_ids = self._params_to_ints(
-                ingredients
-            )  # convert to list of integers
+            ingredients_ids = self._params_to_ints(ingredients)
+            queryset = self._filter_by_relation(
+                queryset, Recipe.ingredients, ingredients_ids, match
+            )
+
+        if search:
             queryset = queryset.filter(
-                ingredients__id__in=ingredients_ids
-            )  # filter by ingredients
+                search_vector=self._search_query(search)
+            )  # served by the GIN index on the stored vector.
+
+        bounds = {
+            "price__gte": self._param(Decimal, "price_min", "Must be a number."),
+            "price__lte": self._param(Decimal, "price_max", "Must be a number."),
+            "time_minutes__lte": self._param(int, "time_max", "Must be an integer."),
+        }
+        queryset = queryset.filter(
+            **{lookup: value for lookup, value in bounds.items() if value is not None}
+        )  # ranges of the (user, price, id) and (user, time_minutes, id) indexes.
+
+        return queryset
+
+    def _param(self, convert, name, message):
+        """Return the query parameter converted, or None when it is absent."""
+        value = self.request.query_params.get(name)
+        if not value:
+            return None
+        try:
+            value = convert(value)
+        except (ArithmeticError, ValueError):  # Decimal raises InvalidOperation.
+            raise ValidationError({name: message})
+        if isinstance(value, Decimal) and not value.is_finite():  # NaN, Infinity.
+            raise ValidationError({name: message})
+
+        return value
+
+    def _ordering(self):
+        """Return the fields of ?ordering=, made total by a trailing id.
+
+        The id follows the direction of the leading field, so a single
+        field ordering walks its (user, field, id) index, one way or back.
+        """
+        ordering = self.request.query_params.get("ordering")
+        if not ordering:
+            return None
+
+        fields = ordering.split(",")
+        names = [field.lstrip("-") for field in fields]
+        allowed = {
+            *self.ORDERING_FIELDS,
+            *(f"-{name}" for name in self.ORDERING_FIELDS),
+        }
+        if not set(fields) <= allowed or len(set(names)) != len(names):
+            raise ValidationError(
+                {"ordering": f"Must be a list of {self.ORDERING_FIELDS}."}
+            )
+        if "id" not in names:
+            fields.append("-id" if fields[0].startswith("-") else "id")
+
+        return fields
+
+    def _search_query(self, search):
+        """Parse the search terms the way web search boxes do."""
+        return SearchQuery(search, search_type="websearch", config="english")
+
+    def _filter_by_relation(self, queryset, relation, ids, match):
+        """Keep recipes linked to any or all of the ids, each recipe once.
+
+        The filter is a semi-join against the through table, so a recipe
+        matching several ids is never repeated the way a plain join would.
+        """
+        target = relation.field.m2m_reverse_field_name()  # "tag" or "ingredient"
+        links = relation.through.objects.filter(**{f"{target}_id__in": ids})
+
+        if match == "all":
+            matched = (
+                links.values("recipe_id")
+                .annotate(matches=Count(target))
+                .filter(matches=len(set(ids)))  # HAVING COUNT(...) = n
+                .values("recipe_id")
+            )
+            return queryset.filter(id__in=matched)
+
+        return queryset.filter(Exists(links.filter(recipe_id=OuterRef("pk"))))
 
-        return queryset.filter(user=self.request.user).order_by("-id")
+    def _apply_fetch_plan(self, queryset):
+        """Shape the queryset to what the serializer of this action renders."""
+        if self.action not in ("list", "retrieve"):
+            return queryset
+
+        fields = self._requested_fields()
+        relations = [name for name in fields if name in self.NESTED_RELATIONS]
+        columns = [name for name in fields if name not in self.NESTED_RELATIONS]
+
+        if self._use_fast_path():
+            # plain rows; the ordering keys are kept for the cursor, and the
+            # serializer renders only the requested fields of them.
+            ordering = [field.lstrip("-") for field in queryset.query.order_by]
+            return queryset.values(
+                *dict.fromkeys(["id", *columns, *ordering, *queryset.query.annotations])
+            )
+
+        # prefetch the nested serializers in one query per relation, instead
+        # of one query per recipe, and leave unused columns in the database.
+        return queryset.prefetch_related(*relations).only(*columns)
+
+    def _requested_fields(self):
+        """Return the serializer fields selected by ?fields= and ?exclude=."""
+        declared = self.get_serializer_class().Meta.fields
+        fields = self.request.query_params.get("fields")
+        exclude = self.request.query_params.get("exclude")
+
+        selected = fields.split(",") if fields else list(declared)
+        excluded = exclude.split(",") if exclude else []
+        unknown = set(selected + excluded) - set(declared)
+        if unknown:
+            raise ValidationError(
+                {"fields": f"Unknown fields: {', '.join(sorted(unknown))}."}
+            )
+
+        return [name for name in declared if name in selected and name not in excluded]
+
+    def _use_fast_path(self):
+        """Return whether this request renders through RecipeRowsSerializer."""
+        return self.action == "list" and settings.RECIPE_LIST_FAST_PATH
+
+    def get_serializer(self, *args, **kwargs):
+        """Render only the requested fields on reads, fast when enabled."""
+        if self.action in ("list", "retrieve"):
+            kwargs["fields"] = self._requested_fields()
+
+        if self._use_fast_path():
+            return serializers.RecipeRowsSerializer(args[0], kwargs["fields"])
+
+        return super().get_serializer(*args, **kwargs)
 
     # this method is used to determine which serializer class to use for the request.
     def get_serializer_class(self):
         """Return appropriate serializer class."""
-        if self.action == "list":
+        if self.action in ("list", "bulk"):
             return serializers.RecipeSerializer
-        elif self.action == "upload_image":
+        elif self.action == "bulk_update":
+            return serializers.RecipeBulkUpdateSerializer
+        elif self.action in ("upload_image", "finalize_image_upload"):
             return serializers.RecipeImageSerializer
+        elif self.action in ("image_uploads", "image_upload"):
+            return serializers.ImageUploadSerializer
 
         return self.serializer_class
 
@@ -86,6 +344,244 @@ class RecipeViewSet(viewsets.ModelViewSet):
         """Create a new recipe."""
         serializer.save(user=self.request.user)
 
+    @extend_schema(
+        request=serializers.RecipeSerializer(many=True),
+        responses={status.HTTP_201_CREATED: OpenApiTypes.OBJECT},
+    )
+    @action(methods=["POST"], detail=False)
+    def bulk(self, request):
+        """Create a list of recipes at once, or none if any item is invalid.
+
+        Errors come back as a list aligned with the payload, empty for the
+        items that were valid.
+        """
+        serializer = self.get_serializer(
+            data=request.data, many=True, max_length=self.BULK_MAX_ITEMS
+        )
+        serializer.is_valid(raise_exception=True)
+        recipes = serializer.save(user=self.request.user)
+
+        return Response(
+            {"ids": [recipe.id for recipe in recipes]}, status=status.HTTP_201_CREATED
+        )
+
+    @extend_schema(
+        request=serializers.RecipeBulkUpdateSerializer(many=True),
+        responses={status.HTTP_200_OK: OpenApiTypes.OBJECT},
+    )
+    @bulk.mapping.patch
+    def bulk_update(self, request):
+        """Partially update a list of `{id, ...fields}`, or none if any is invalid."""
+        serializer = self.get_serializer(
+            self.get_queryset(),
+            data=request.data,
+            many=True,
+            partial=True,
+            max_length=self.BULK_MAX_ITEMS,
+        )
+        serializer.is_valid(raise_exception=True)
+
+        return Response({"ids": serializer.save()}, status=status.HTTP_200_OK)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "ids",
+                OpenApiTypes.STR,
+                required=True,
+                description="Comma separated list of recipe ids to delete",
+            )
+        ],
+        responses={status.HTTP_200_OK: OpenApiTypes.OBJECT},
+    )
+    @bulk.mapping.delete
+    def bulk_destroy(self, request):
+        """Delete the listed recipes of the user with set-based statements."""
+        try:
+            ids = self._params_to_ints(request.query_params["ids"])
+        except (KeyError, ValueError):
+            raise ValidationError({"ids": "Comma separated recipe ids are required."})
+        if len(ids) > self.BULK_MAX_ITEMS:
+            raise ValidationError({"ids": f"At most {self.BULK_MAX_ITEMS} ids."})
+
+        table = connection.ops.quote_name(Recipe._meta.db_table)
+        with transaction.atomic(), connection.cursor() as cursor:
+            # one delete for the recipes and one per through table, instead of
+            # the collector loading every recipe to send its delete signals.
+            # The link foreign keys are deferred, so the order is safe.
+            # Pending uploads go through the ORM, whose signal removes their
+            # chunks on commit; there are few of them, if any.
+            ImageUpload.objects.filter(
+                recipe__user=request.user, recipe_id__in=ids
+            ).delete()
+            cursor.execute(
+                f"DELETE FROM {table} WHERE user_id = %s AND id = ANY(%s)"
+                " RETURNING id, image",
+                [request.user.id, ids],
+            )
+            rows = cursor.fetchall()
+            deleted = [pk for pk, _ in rows]
+            for relation in (Recipe.tags, Recipe.ingredients):
+                relation.through.objects.filter(recipe_id__in=deleted).delete()
+            # the blobs are shared, so release() deletes only unused ones.
+            for name in {name for _, name in rows if name}:
+                transaction.on_commit(partial(recipe_image_storage.release, name))
+
+            if deleted:
+                get_user_model().objects.bump_data_version(request.user.id)
+
+        return Response({"ids": deleted}, status=status.HTTP_200_OK)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "as",
+                OpenApiTypes.STR,
+                enum=list(EXPORT_CONTENT_TYPES),
+                description="Export format, ndjson (default) or csv",
+            )
+        ],
+        responses={(status.HTTP_200_OK, "application/x-ndjson"): OpenApiTypes.STR},
+    )
+    @action(methods=["GET"], detail=False)
+    def export(self, request):
+        """Stream the user's recipes, filtered like the list, as NDJSON or CSV."""
+        output_format = request.query_params.get("as", "ndjson")
+        if output_format not in EXPORT_CONTENT_TYPES:
+            formats = list(EXPORT_CONTENT_TYPES)
+            raise ValidationError({"as": f"Must be one of {formats}."})
+
+        response = StreamingHttpResponse(
+            export_recipes(self.get_queryset(), output_format),
+            content_type=EXPORT_CONTENT_TYPES[output_format],
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="recipes.{output_format}"'
+        )
+        return response
+
+    @extend_schema(
+        parameters=FILTER_PARAMETERS
+        + [
+            OpenApiParameter(
+                "limit",
+                OpenApiTypes.INT,
+                description=f"Tags and ingredients to return, {FACET_LIMIT} by default",
+            )
+        ],
+        responses={status.HTTP_200_OK: OpenApiTypes.OBJECT},
+    )
+    @action(methods=["GET"], detail=False)
+    def facets(self, request):
+        """Count the filtered recipes and their most used tags and ingredients.
+
+        Takes the filters of the list, so a filter sidebar costs one request
+        rather than a list request per option.
+        """
+        return self._conditional_get(
+            self.cached_response, request, "facets", self._facets
+        )
+
+    def _facets(self, request):
+        """Compute the facets of the filtered recipes."""
+        try:
+            limit = int(request.query_params.get("limit", FACET_LIMIT))
+        except ValueError:
+            raise ValidationError({"limit": "Must be an integer."})
+        limit = max(1, min(limit, self.MAX_FACET_LIMIT))
+
+        matched = self._filter_recipes(self.queryset).filter(user=request.user)
+        filtered = any(request.query_params.get(name) for name in self.FILTERS)
+
+        return Response(recipe_facets(request.user, matched, limit, filtered))
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "have",
+                OpenApiTypes.STR,
+                required=True,
+                description="Comma separated list of ingredients on hand",
+            ),
+            OpenApiParameter(
+                "page_size", OpenApiTypes.INT, description="Recipes per page"
+            ),
+        ],
+        responses=serializers.PantryRecipeSerializer(many=True),
+    )
+    @action(methods=["GET"], detail=False)
+    def pantry(self, request):
+        """Rank recipes by the share of their ingredients on hand.
+
+        Every recipe using at least one of them is listed, best covered
+        first, with the ingredients it still misses.
+        """
+        return self._conditional_get(
+            self.cached_response, request, "pantry", self._pantry
+        )
+
+    def _pantry(self, request):
+        """Compute the page of pantry matches the request's cursor points at."""
+        have = request.query_params.get("have")
+        try:
+            have = set(self._params_to_ints(have)) if have else set()
+        except ValueError:
+            raise ValidationError({"have": "Must be a comma separated list of ids."})
+        if not have:
+            raise ValidationError({"have": "This field is required."})
+        if len(have) > self.MAX_PANTRY_ITEMS:
+            raise ValidationError(
+                {"have": f"At most {self.MAX_PANTRY_ITEMS} ingredients."}
+            )
+
+        paginator = RankedPagination()
+        page = paginator.paginate_rows(
+            lambda position, limit: pantry_matches(request.user, have, limit, position),
+            PANTRY_ORDERING,
+            request,
+        )
+        serializer = serializers.PantryRecipeSerializer(page, many=True)
+
+        return paginator.get_paginated_response(serializer.data)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "limit",
+                OpenApiTypes.INT,
+                description=f"Recipes to return, {SIMILAR_LIMIT} by default",
+            )
+        ],
+        responses=serializers.SimilarRecipeSerializer(many=True),
+    )
+    @action(methods=["GET"], detail=True)
+    def similar(self, request, pk=None):
+        """List the recipes sharing the most tags and ingredients with this one.
+
+        Ranked by Jaccard similarity of the tag and ingredient sets, among
+        the recipes the recipe's signature buckets with.
+        """
+        return self._conditional_get(
+            self.cached_response, request, "similar", self._similar, pk=pk
+        )
+
+    def _similar(self, request, pk=None):
+        """Compute the recipes most similar to the requested one."""
+        try:
+            limit = int(request.query_params.get("limit", self.SIMILAR_LIMIT))
+        except ValueError:
+            raise ValidationError({"limit": "Must be an integer."})
+        limit = max(1, min(limit, self.MAX_SIMILAR_LIMIT))
+
+        recipe = get_object_or_404(
+            self.queryset.filter(user=request.user).only("id", "lsh_bands"), pk=pk
+        )
+        serializer = serializers.SimilarRecipeSerializer(
+            similar_recipes(request.user, recipe, limit), many=True
+        )
+
+        return Response(serializer.data)
+
     @action(methods=["POST"], detail=True, url_path="upload-image")
     def upload_image(self, request, pk=None):
         """Upload an image to a recipe."""
@@ -97,6 +593,126 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return Response(serializer.data, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(methods=["POST"], detail=True, url_path="image-uploads")
+    def image_uploads(self, request, pk=None):
+        """Start a resumable upload of an image to a recipe.
+
+        The image is then sent in chunks of at most RECIPE_UPLOAD_CHUNK_SIZE
+        bytes, each a PUT to the upload, and finalized once all are in.
+        """
+        recipe = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        upload = start_upload(recipe, **serializer.validated_data)
+
+        return self._upload_response(upload, status.HTTP_201_CREATED)
+
+    @extend_schema(parameters=UPLOAD_PARAMETERS)
+    @extend_schema(
+        methods=["PUT"],
+        request={"application/offset+octet-stream": OpenApiTypes.BINARY},
+        parameters=UPLOAD_PARAMETERS
+        + [
+            OpenApiParameter(
+                "Upload-Offset",
+                OpenApiTypes.INT,
+                OpenApiParameter.HEADER,
+                required=True,
+                description="Offset of the chunk in the image, the upload's offset",
+            )
+        ],
+    )
+    @action(methods=["GET", "PUT", "DELETE"], detail=True, url_path=UPLOAD_PATH)
+    def image_upload(self, request, pk=None, upload_id=None):
+        """Show, continue or cancel a resumable upload of a recipe image.
+
+        PUT writes the raw body as the chunk starting at Upload-Offset, which
+        must be the offset received so far; after a dropped connection, GET
+        tells where to resume from.
+        """
+        if request.method == "GET":
+            return self._upload_response(self._image_upload(pk, upload_id))
+
+        with transaction.atomic():
+            upload = self._image_upload(pk, upload_id, lock=True)
+            if request.method == "DELETE":
+                upload.delete()
+                return Response(status=status.HTTP_204_NO_CONTENT)
+
+            length = self._chunk_length(upload)
+            if length is None:  # the client is at another offset.
+                return self._upload_response(upload, status.HTTP_409_CONFLICT)
+            write_chunk(upload, request.stream, length)
+
+        return self._upload_response(upload)
+
+    @extend_schema(request=None, parameters=UPLOAD_PARAMETERS)
+    @action(methods=["POST"], detail=True, url_path=f"{UPLOAD_PATH}/finalize")
+    def finalize_image_upload(self, request, pk=None, upload_id=None):
+        """Make a fully received upload the recipe's image."""
+        with transaction.atomic():
+            upload = self._image_upload(pk, upload_id, lock=True)
+            if upload.offset < upload.size:
+                raise ValidationError(
+                    {"offset": f"Received {upload.offset} of {upload.size} bytes."}
+                )
+            if not is_image(upload):
+                upload.delete()  # nothing in it is worth resuming.
+                return Response(
+                    {"image": ["Upload a valid image."]},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            recipe = finish_upload(upload)
+
+        return Response(self.get_serializer(recipe).data)
+
+    def _image_upload(self, pk, upload_id, lock=False):
+        """Return the user's upload to the recipe, locked for this transaction.
+
+        A request holding the lock is writing to it, so others get a 409
+        instead of waiting on it.
+        """
+        uploads = ImageUpload.objects.filter(
+            recipe_id=pk, recipe__user=self.request.user
+        ).select_related("recipe")
+        if not lock:
+            return get_object_or_404(uploads, pk=upload_id)
+
+        try:
+            with transaction.atomic():  # a savepoint to fail back to.
+                return get_object_or_404(
+                    uploads.select_for_update(nowait=True, of=("self",)),
+                    pk=upload_id,
+                )
+        except OperationalError:
+            raise UploadBusy()
+
+    def _chunk_length(self, upload):
+        """Return the length of the chunk sent, or None if it is out of place."""
+        try:
+            offset = int(self.request.headers["Upload-Offset"])
+            length = int(self.request.headers.get("Content-Length") or 0)
+        except (KeyError, ValueError):
+            raise ValidationError(
+                {"Upload-Offset": "Send the integer offset of the chunk."}
+            )
+        if offset != upload.offset:
+            return None
+        if length > settings.RECIPE_UPLOAD_CHUNK_SIZE:
+            raise ChunkTooLarge()
+        if length > upload.size - upload.offset:
+            raise ValidationError({"size": "The chunk runs past the image size."})
+
+        return length
+
+    def _upload_response(self, upload, status_code=status.HTTP_200_OK):
+        """Render the upload with its offset, as the Upload-Offset header too."""
+        return Response(
+            serializers.ImageUploadSerializer(upload).data,
+            status=status_code,
+            headers={"Upload-Offset": str(upload.offset)},
+        )
+
 
 @extend_schema_view(
     list=extend_schema(
@@ -107,10 +723,33 @@ class RecipeViewSet(viewsets.ModelViewSet):
                 enum=[0, 1],
                 description="Include assigned only",
             ),
+            OpenApiParameter(
+                "with_counts",
+                OpenApiTypes.INT,
+                enum=[0, 1],
+                description="Include the number of recipes using each item",
+            ),
+            OpenApiParameter(
+                "ordering",
+                OpenApiTypes.STR,
+                enum=["-name", "name", "-recipe_count", "recipe_count"],
+                description="Sort by name (default -name) or by usage",
+            ),
+            OpenApiParameter(
+                "q",
+                OpenApiTypes.STR,
+                description="Typeahead: best prefix or fuzzy name matches",
+            ),
+            OpenApiParameter(
+                "limit",
+                OpenApiTypes.INT,
+                description="Number of typeahead matches to return",
+            ),
         ]
     )
 )
 class BaseRecipeAttrViewSet(
+    CachedListMixin,
     mixins.DestroyModelMixin,
     mixins.UpdateModelMixin,
     mixins.ListModelMixin,
@@ -121,30 +760,102 @@ class BaseRecipeAttrViewSet(
     authentication_classes = [TokenAuthentication]
     permission_classes = [IsAuthenticated]
 
+    TYPEAHEAD_LIMIT = 10
+    MAX_TYPEAHEAD_LIMIT = 50
+    ORDERINGS = {  # ?ordering= value: the total order it pages through.
+        "-name": ("-name", "id"),
+        "name": ("name", "id"),
+        "-recipe_count": ("-recipe_count", "name", "id"),
+        # the exact reverse, so both walk the usage index, one of them backwards.
+        "recipe_count": ("recipe_count", "-name", "-id"),
+    }
+
     def get_queryset(self):
         """Filter queryset to authenticated user"""
-        assigned_only = bool(
-            int(self.request.query_params.get("assigned_only", 0))
-        )  # convert to boolean
-        queryset = self.queryset
+        assigned_only = self._flag("assigned_only")
+        ordering = self._ordering()
+
+        queryset = self.queryset.filter(user=self.request.user)  # current user only.
+
+        relation = getattr(Recipe, self.relation_name)
+        target = relation.field.m2m_reverse_field_name()  # "tag" or "ingredient"
+        links = relation.through.objects.filter(**{f"{target}_id": OuterRef("pk")})
 
         if assigned_only:
-            queryset = queryset.filter(recipe__isnull=False)  # filter by recipe
+            # a semi-join stops at the first link, so nothing needs deduping.
+            queryset = queryset.filter(Exists(links))
+
+        queryset = queryset.order_by(*self.ORDERINGS[ordering])
+
+        search = self.request.query_params.get("q")
+        if search and self.action == "list":
+            queryset = self._typeahead(queryset, search)
+
+        return queryset
+
+    def _ordering(self):
+        """Return the requested ?ordering=, rejecting unknown values."""
+        ordering = self.request.query_params.get("ordering", "-name")
+        if ordering not in self.ORDERINGS:
+            orderings = list(self.ORDERINGS)
+            raise ValidationError({"ordering": f"Must be one of {orderings}."})
+
+        return ordering
 
+    def _flag(self, name):
+        """Return the 0 or 1 query parameter as a boolean, False when absent."""
+        value = self.request.query_params.get(name, "0")
+        if value not in ("0", "1"):
+            raise ValidationError({name: "Must be 0 or 1."})
+
+        return value == "1"
+
+    def get_serializer_class(self):
+        """Render `recipe_count` when asked for it or sorting by it."""
+        if self.action == "list" and (
+            self._flag("with_counts") or self._ordering().lstrip("-") == "recipe_count"
+        ):
+            return self.usage_serializer_class
+
+        return self.serializer_class
+
+    def _typeahead(self, queryset, search):
+        """Return the top names starting with, or close to, the search."""
+        try:
+            limit = int(self.request.query_params.get("limit", self.TYPEAHEAD_LIMIT))
+        except ValueError:
+            raise ValidationError({"limit": "Must be an integer."})
+        limit = max(1, min(limit, self.MAX_TYPEAHEAD_LIMIT))
+
+        # `%>` is served by the trigram index on name, and a typed prefix of a
+        # word shares most of its trigrams, so prefixes match as well as typos.
         return (
-            queryset.filter(user=self.request.user).order_by("-name").distinct()
-        )  # filter to the current user. distinct() removes duplicates.
+            queryset.filter(name__trigram_word_similar=search)
+            .annotate(similarity=TrigramWordSimilarity(search, "name"))
+            .order_by("-similarity", "name", "id")[:limit]
+        )
+
+    def paginate_queryset(self, queryset):
+        """Typeahead answers with a single top-N list rather than pages."""
+        if self.request.query_params.get("q"):
+            return None
+
+        return super().paginate_queryset(queryset)
 
 
 class TagViewSet(BaseRecipeAttrViewSet):
     """Manage tags in the database."""
 
     serializer_class = serializers.TagSerializer
+    usage_serializer_class = serializers.TagUsageSerializer
     queryset = Tag.objects.all()
+    relation_name = "tags"  # the Recipe field linking to tags.
 
 
 class IngredientViewSet(BaseRecipeAttrViewSet):
     """Manage ingredients in db"""
 
     serializer_class = serializers.IngredientSerializer
+    usage_serializer_class = serializers.IngredientUsageSerializer
     queryset = Ingredient.objects.all()  # sets our queryset to the Ingredient model
+    relation_name = "ingredients"
@@ -5,6 +5,15 @@ server {
         alias /vol/static;
     }
 
+    # resumable upload chunks stream through to the app as they arrive, so
+    # the bytes of a dropped chunk are kept rather than buffered and lost.
+    location ~ ^/api/recipe/recipes/[0-9]+/image-uploads/ {
+        uwsgi_pass      ${APP_HOST}:${APP_PORT};
+        include         /etc/nginx/uwsgi_params;
+        client_max_body_size 10M;
+        uwsgi_request_buffering off;
+    }
+
     location / {
         uwsgi_pass      ${APP_HOST}:${APP_PORT};
         include         /etc/nginx/uwsgi_params;